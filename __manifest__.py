@@ -30,17 +30,42 @@ Fonctionnalités :
   "data" : [
   'security/is_tableau_de_bord_security.xml',
   'security/ir.model.access.csv',
+  'data/ir_cron_data.xml',
+  'data/ir_config_parameter_data.xml',
   'views/ir_filters_views.xml',
   'views/is_tableau_de_bord_views.xml',
+  'views/is_tableau_de_bord_rollup_views.xml',
+  'views/is_tableau_de_bord_perf_stat_views.xml',
+  'views/is_tableau_de_bord_index_advice_views.xml',
+  'views/is_tableau_de_bord_kiosk_views.xml',
+  'views/is_tableau_de_bord_kiosk_templates.xml',
   ],   
    'assets': {
         'web.assets_backend': [
             'is_tableau_de_bord18/static/src/css/dashboard.css',
             'is_tableau_de_bord18/static/src/scss/kanban_view.scss',
             'web/static/lib/Chart/Chart.js',
+            'is_tableau_de_bord18/static/src/js/dashboard_render.js',
             'is_tableau_de_bord18/static/src/js/dashboard_view.js',
             'is_tableau_de_bord18/static/src/js/custom_favorite_item.js',
         ],
+        # Écrans kiosque : Bootstrap, icônes, Chart.js et rendu des éléments, sans client web
+        'is_tableau_de_bord18.assets_kiosk': [
+            ('include', 'web._assets_helpers'),
+            ('include', 'web._assets_backend_helpers'),
+            'web/static/src/scss/pre_variables.scss',
+            'web/static/lib/bootstrap/scss/_variables.scss',
+            'web/static/lib/bootstrap/scss/_variables-dark.scss',
+            'web/static/lib/bootstrap/scss/_maps.scss',
+            ('include', 'web._assets_bootstrap_backend'),
+            'web/static/src/libs/fontawesome/css/font-awesome.css',
+            'web/static/src/module_loader.js',
+            'web/static/lib/Chart/Chart.js',
+            'is_tableau_de_bord18/static/src/css/dashboard.css',
+            'is_tableau_de_bord18/static/src/css/kiosk.css',
+            'is_tableau_de_bord18/static/src/js/dashboard_render.js',
+            'is_tableau_de_bord18/static/src/js/kiosk.js',
+        ],
     },
   "installable": True,         
   "active": False,            
@@ -1,19 +1,146 @@
 # -*- coding: utf-8 -*-
 
+import hashlib
 import json
 import ast
+import atexit
+import cProfile
+import csv
+import io
 import logging
 import re
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
 from datetime import datetime, timedelta, date
+import babel.dates
+import pytz
+import xlsxwriter
 from dateutil.relativedelta import relativedelta
-from odoo import http
-from odoo.http import request
+from odoo import api, fields, http, SUPERUSER_ID
+from odoo.http import request, content_disposition
+from odoo.modules.registry import Registry
+from odoo.models import BaseModel, READ_GROUP_DISPLAY_FORMAT
+from odoo.tools import SQL
+from odoo.tools.misc import get_lang
 from odoo.tools.safe_eval import safe_eval, datetime as safe_datetime, time as safe_time
 from lxml import etree
+from psycopg2.errors import QueryCanceled
+from werkzeug.exceptions import BadRequest
 
 
 _logger = logging.getLogger(__name__)
 
+# Libellés français des agrégateurs
+AGGREGATOR_LABELS = {
+    'sum': 'Somme',
+    'avg': 'Moyenne',
+    'max': 'Maximum',
+    'min': 'Minimum',
+    'count': 'Nombre',
+    'count_distinct': 'Nombre distinct',
+    'median': 'Médiane',
+    'p90': '90e centile',
+    'p95': '95e centile',
+}
+
+# Agrégateurs calculés par percentile_cont (fraction du centile)
+PERCENTILE_AGGREGATORS = {
+    'median': 0.5,
+    'p90': 0.9,
+    'p95': 0.95,
+}
+
+# Échantillonnage : nombre minimum de lignes attendues dans l'échantillon, sinon calcul exact
+SAMPLING_MIN_ROWS = 10000
+
+# Agrégateurs dont la valeur sur l'échantillon est extrapolée (les autres sont estimés tels quels)
+SAMPLING_SCALED_AGGREGATORS = ('sum', 'count')
+
+# Agrégateurs non estimables sur un échantillon : calcul exact
+SAMPLING_EXACT_AGGREGATORS = ('count_distinct', 'min', 'max')
+
+# Cube client : nombre maximum d'agrégats au grain le plus fin et agrégateurs ré-agrégeables
+CUBE_MAX_ROWS = 5000
+CUBE_AGGREGATORS = ('sum', 'count', 'min', 'max')
+
+# Courbes : nombre de points par défaut (sans largeur transmise) et minimum après simplification
+GRAPH_MAX_POINTS = 1024
+GRAPH_MIN_POINTS = 256
+
+# Export : taille des paquets lus par le curseur côté serveur, formats et limite d'une feuille XLSX
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_CONTENT_TYPES = {
+    'csv': 'text/csv;charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+XLSX_MAX_ROWS = 1048576
+
+# Chargement initial : champs des lignes nécessaires à la mise en page et aux overrides,
+# hauteur ajoutée à chaque élément (en-tête et marge) pour estimer les éléments visibles
+BOOTSTRAP_LINE_FIELDS = [
+    'name', 'width', 'height', 'display_mode', 'filter_id', 'refresh_interval', 'model_name',
+    'graph_chart_type', 'graph_aggregator', 'graph_show_legend', 'show_data_title', 'show_record_count',
+    'graph_measure', 'graph_groupbys', 'graph_series_mode', 'graph_moving_periods',
+    'pivot_row_groupby', 'pivot_col_groupby', 'pivot_measure', 'pivot_sort_by', 'pivot_sort_order',
+    'list_groupby',
+]
+BOOTSTRAP_TILE_CHROME_PX = 70
+
+# Moyenne mobile : étendue d'une période par granularité de regroupement date (nombre, unité SQL interval)
+WINDOW_INTERVALS = {
+    'day': (1, 'days'),
+    'week': (1, 'weeks'),
+    'month': (1, 'months'),
+    'quarter': (3, 'months'),
+    'year': (1, 'years'),
+}
+
+# Durée d'une période (KPI, comparaisons)
+PERIOD_STEPS = {
+    'day': relativedelta(days=1),
+    'week': relativedelta(weeks=1),
+    'month': relativedelta(months=1),
+    'quarter': relativedelta(months=3),
+    'year': relativedelta(years=1),
+}
+
+# Mesures des lignes en attente d'écriture dans is.tableau.de.bord.perf.stat (par processus et par base)
+PERF_BUFFERS = {}
+PERF_TIMERS = {}
+PERF_BUFFER_LOCK = threading.Lock()
+PERF_FLUSH_SIZE = 50        # Écriture dès que le lot atteint ce nombre de mesures
+PERF_FLUSH_DELAY = 60       # ... ou au plus N secondes après la première mesure en attente
+
+
+def flush_perf_samples(dbname=None):
+    """Écrit les mesures en attente d'une base (de toutes si dbname est None)
+
+    Appelée par la minuterie armée à la première mesure en attente, y compris sur un
+    processus qui ne reçoit plus de requêtes, et à l'arrêt du processus.
+    """
+    with PERF_BUFFER_LOCK:
+        dbnames = list(PERF_BUFFERS) if dbname is None else [dbname]
+        pending = {name: PERF_BUFFERS.pop(name, []) for name in dbnames}
+        for name in dbnames:
+            timer = PERF_TIMERS.pop(name, None)
+            if timer and timer is not threading.current_thread():
+                timer.cancel()
+    for name, samples in pending.items():
+        if not samples:
+            continue
+        try:
+            with Registry(name).cursor() as cr:
+                env = api.Environment(cr, SUPERUSER_ID, {})
+                env['is.tableau.de.bord.perf.stat']._record_samples(samples)
+        except Exception:
+            _logger.warning("Écriture de %s mesures de performance impossible", len(samples), exc_info=True)
+
+
+atexit.register(flush_perf_samples)
+
 
 def clean_for_json(obj):
     """Convertit récursivement les frozendict et autres objets non-sérialisables en objets JSON-compatibles"""
@@ -297,6 +424,136 @@ class TableauDeBordController(http.Controller):
         filters_dict = request.env['is.tableau.de.bord.mem.filter'].get_filters(dashboard_id)
         return {'filters': filters_dict}
 
+    @http.route('/tableau_de_bord/bootstrap/<int:dashboard_id>', type='json', auth='user')
+    def bootstrap(self, dashboard_id, viewport_width=None, viewport_height=None):
+        """Chargement initial d'un tableau de bord, en un seul appel
+
+        Renvoie uniquement ce dont la mise en page a besoin (lignes lues en une requête,
+        définitions et valeurs mémorisées des filtres) et les résultats des éléments
+        visibles sans défilement, calculés dans la même réponse.
+
+        Args:
+            viewport_width, viewport_height: taille de la zone d'affichage du client (px)
+        """
+        env = request.env
+        dashboard = env['is.tableau.de.bord'].browse(dashboard_id).exists()
+        if not dashboard:
+            return {'error': 'Tableau de bord introuvable'}
+        dashboard.check_access('read')
+        filter_defs = env['is.tableau.de.bord.filter.def'].search_fetch(
+            [('tableau_id', '=', dashboard.id)], ['name', 'filter_type'],
+        )
+        filters_values = env['is.tableau.de.bord.mem.filter'].get_filters(dashboard.id)
+        lines = env['is.tableau.de.bord.line'].search_fetch([('tableau_id', '=', dashboard.id)], BOOTSTRAP_LINE_FIELDS)
+
+        try:
+            viewport_width = max(int(viewport_width or 0), 0)
+            viewport_height = max(int(viewport_height or 0), 0)
+        except (TypeError, ValueError):
+            viewport_width = viewport_height = 0
+        line_values = []
+        for line in lines:
+            overrides = self._line_overrides(line)
+            if line.display_mode == 'graph' and line.graph_chart_type == 'line' and viewport_width:
+                # Courbes : pas plus de points que de pixels en largeur (estimée d'après la colonne)
+                overrides['graph_max_points'] = int(viewport_width * self._line_width_ratio(line))
+            line_values.append({
+                'id': line.id,
+                'name': line.name,
+                'width': line.width,
+                'height': line.height,
+                'display_mode': line.display_mode,
+                'filter_id': line.filter_id.id,
+                'refresh_interval': line.refresh_interval,
+                'model_name': line.model_name,
+                'overrides': overrides,
+            })
+
+        # Éléments visibles : calculés ici, sauf profilage demandé (chaque ligne est alors mesurée à part)
+        tiles = {}
+        if viewport_height and not self._profile_dashboard(dashboard.id):
+            visible = self._visible_lines(lines, viewport_height)
+            for values in line_values:
+                if values['id'] in visible and values['filter_id']:
+                    tiles[values['id']] = self._bootstrap_tile(
+                        env, values['filter_id'], values['id'], values['overrides'], filters_values,
+                    )
+        return {
+            'id': dashboard.id,
+            'name': dashboard.name,
+            'refresh_interval': dashboard.refresh_interval,
+            'is_manager': dashboard.check_is_manager(),
+            'filter_defs': [
+                {'id': filter_def.id, 'name': filter_def.name, 'filter_type': filter_def.filter_type}
+                for filter_def in filter_defs
+            ],
+            'filters_values': filters_values,
+            'lines': line_values,
+            'tiles': tiles,
+        }
+
+    def _line_overrides(self, line):
+        """Paramètres d'affichage de la ligne transmis à chaque calcul (get_filter_data, empreintes)"""
+        return {
+            'display_mode': line.display_mode,
+            'graph_chart_type': line.graph_chart_type,
+            'graph_aggregator': line.graph_aggregator,
+            'graph_show_legend': line.graph_show_legend,
+            'show_data_title': line.show_data_title,
+            'show_record_count': line.show_record_count,
+            'graph_measure': line.graph_measure,
+            'graph_groupbys': line.graph_groupbys,
+            'graph_series_mode': line.graph_series_mode,
+            'graph_moving_periods': line.graph_moving_periods,
+            'pivot_row_groupby': line.pivot_row_groupby,
+            'pivot_column_groupby': line.pivot_col_groupby,
+            'pivot_measures': line.pivot_measure,
+            'pivot_sort_by': line.pivot_sort_by,
+            'pivot_sort_order': line.pivot_sort_order,
+            'list_groupby': line.list_groupby,
+        }
+
+    def _line_width_ratio(self, line):
+        """Part de la largeur du tableau de bord occupée par la ligne (colonnes sur 12, '20' = cinquième)"""
+        if line.width == '20':
+            return 0.2
+        try:
+            return min(int(line.width or 6), 12) / 12
+        except ValueError:
+            return 0.5
+
+    def _visible_lines(self, lines, viewport_height):
+        """Ids des lignes dont la rangée commence dans la hauteur affichée, selon le retour à la ligne de la grille"""
+        visible = set()
+        top = row_width = row_height = 0
+        for line in lines:
+            ratio = self._line_width_ratio(line)
+            if row_width and row_width + ratio > 1.0001:
+                top += row_height
+                row_width = row_height = 0
+            if top >= viewport_height:
+                break
+            visible.add(line.id)
+            row_width += ratio
+            row_height = max(row_height, int(line.height or 400) + BOOTSTRAP_TILE_CHROME_PX)
+        return visible
+
+    def _bootstrap_tile(self, env, filter_id, line_id, overrides, filters_values):
+        """Résultat d'un élément visible pour le chargement initial, comme get_filter_data sans empreinte connue"""
+        try:
+            with env.cr.savepoint():
+                result, _duration_ms = self._cached_filter_data(env, filter_id, line_id, overrides, filters_values)
+                fingerprint = self._result_fingerprint(env, filter_id, line_id, overrides, filters_values, result)
+        except Exception:
+            _logger.exception("Erreur lors du calcul de la ligne %s (filtre %s)", line_id, filter_id)
+            self._record_perf(line_id, None, error=True)
+            return {'error': 'Une erreur s\'est produite'}
+        self._record_perf(line_id, result.get('_perf'), error=bool(result.get('error')))
+        if not result.get('error'):
+            result['_hash'] = self._payload_hash(result)
+            result['_fingerprint'] = fingerprint
+        return result
+
     @http.route('/tableau_de_bord/get_filter_data/<int:filter_id>', type='json', auth='user')
     def get_filter_data(self, filter_id, line_id=None, **kwargs):
         """Récupère les données d'un filtre pour l'afficher dans le tableau de bord"""
@@ -307,160 +564,1005 @@ class TableauDeBordController(http.Controller):
             overrides = kwargs.get('overrides') or {}
             dashboard_id = kwargs.get('dashboard_id')
             filters_values = kwargs.get('filters_values') or {}
+            # Empreintes du résultat déjà affiché par le client (réponse conditionnelle)
+            known_hash = kwargs.get('known_hash')
+            known_fingerprint = kwargs.get('known_fingerprint')
+            # Filtre croisé (clic sur un autre élément du même modèle), sans cache
+            cross_filter = kwargs.get('cross_filter') or None
             
-            filter_obj = request.env['ir.filters'].browse(filter_id)
-            if not filter_obj.exists():
-                return {'error': 'Filtre non trouvé'}
+            dashboard = self._profile_dashboard(dashboard_id)
+            if dashboard and line_id:
+                result = self._profiled_filter_data(dashboard, filter_id, line_id, overrides, filters_values)
+                fingerprint = None
+            elif cross_filter:
+                start = time.perf_counter()
+                result = self._compute_filter_data(request.env, filter_id, line_id, overrides, filters_values, cross_filter)
+                if '_perf' in result:
+                    result['_perf'].update({'cache_hit': False, 'total_ms': round((time.perf_counter() - start) * 1000, 1)})
+                fingerprint = known_hash = None
+            else:
+                start = time.perf_counter()
+                queries_before, _sql_time = self._sql_counters()
+                data_fingerprint = fingerprint = None
+                if known_hash and line_id:
+                    # Réponse conditionnelle possible : empreinte des données de même origine que le
+                    # résultat affiché. Sans résultat connu, seul le cache l'établit (_result_fingerprint)
+                    data_fingerprint = self._data_fingerprint(
+                        request.env, filter_id, line_id, filters_values, self._fingerprint_source(known_fingerprint),
+                    )
+                    fingerprint = self._line_fingerprint(
+                        request.env, filter_id, line_id, overrides, filters_values, data_fingerprint,
+                    ) if data_fingerprint else None
+                if fingerprint and known_fingerprint == fingerprint:
+                    # Rien n'a changé depuis le résultat affiché : le calcul est évité
+                    queries_after, _sql_time = self._sql_counters()
+                    perf = {
+                        'cache_hit': True,
+                        'not_modified': True,
+                        'total_ms': round((time.perf_counter() - start) * 1000, 1),
+                        'queries': queries_after - queries_before,
+                    }
+                    self._record_perf(line_id, perf)
+                    return self._not_modified(known_hash, fingerprint, perf)
+                result, _duration_ms = self._cached_filter_data(
+                    request.env, filter_id, line_id, overrides, filters_values, data_fingerprint=data_fingerprint,
+                )
+                fingerprint = self._result_fingerprint(
+                    request.env, filter_id, line_id, overrides, filters_values, result, fingerprint,
+                )
+            self._record_perf(line_id, result.get('_perf'), error=bool(result.get('error')))
+            if not result.get('error'):
+                result['_hash'] = self._payload_hash(result)
+                result['_fingerprint'] = fingerprint
+                if known_hash == result['_hash'] and not result.get('_profiled'):
+                    # Résultat identique à celui affiché : seules les empreintes sont renvoyées
+                    return self._not_modified(known_hash, fingerprint, result.get('_perf'))
+            return result
+        except Exception:
+            _logger.exception("Erreur lors du calcul de la ligne %s (filtre %s)", line_id, filter_id)
+            self._record_perf(line_id, None, error=True)
+            return {'error': 'Une erreur s\'est produite'}
 
-            model = request.env[filter_obj.model_id]
+    @http.route('/tableau_de_bord/fingerprints', type='json', auth='user')
+    def fingerprints(self, dashboard_id=None, tiles=None, filters_values=None):
+        """Empreintes des lignes affichées, pour l'actualisation automatique
 
-            # Récupérer le domaine du filtre
-            domain = []
-            if filter_obj.domain:
-                try:
-                    # Utiliser safe_eval pour supporter les expressions dynamiques
-                    # comme context_today(), datetime.timedelta, relativedelta, etc.
-                    eval_context = {
-                        'datetime': safe_datetime,
-                        'context_today': lambda: date.today(),
-                        'current_date': date.today().strftime('%Y-%m-%d'),
-                        'time': safe_time,
-                        'relativedelta': relativedelta,
-                        'timedelta': timedelta,
-                        'uid': request.env.uid,
-                        'user': request.env.user,
-                    }
-                    domain = safe_eval(filter_obj.domain, eval_context)
-                except Exception:
-                    domain = []
+        Seules les lignes dont l'empreinte a changé depuis leur dernier affichage sont
+        ensuite recalculées par le client.
 
-            # Appliquer les filtres dynamiques si définis
-            if filters_values and line_id:
-                try:
-                    line = request.env['is.tableau.de.bord.line'].browse(int(line_id))
-                    if line and line.exists() and line.line_filter_ids:
-                        for line_filter in line.line_filter_ids:
-                            filter_def_id = line_filter.filter_def_id.id
-                            # Convertir les clés du dictionnaire en int pour la comparaison
-                            filter_value = None
-                            for key, val in filters_values.items():
-                                if int(key) == filter_def_id:
-                                    filter_value = val
-                                    break
-                            
-                            if filter_value:
-                                field_name = line_filter.field_id.name
-                                field_type = line_filter.field_id.ttype
-                                filter_type = line_filter.filter_def_id.filter_type
-                                
-                                # Utiliser le parser avancé
-                                parsed_domain = self._parse_filter_value(field_name, field_type, filter_value, filter_type)
-                                if parsed_domain:
-                                    domain.extend(parsed_domain)
-                except Exception:
-                    import traceback
-                    traceback.print_exc()
+        Args:
+            tiles: liste de dict (line_id, filter_id, overrides)
+        """
+        result = {}
+        for tile in tiles or []:
+            line_id = tile.get('line_id')
+            if not line_id or not tile.get('filter_id'):
+                continue
+            try:
+                result[str(line_id)] = self._line_fingerprint(
+                    request.env, tile['filter_id'], line_id, tile.get('overrides') or {}, filters_values or {},
+                    source=self._fingerprint_source(tile.get('known_fingerprint')),
+                )
+            except Exception:
+                _logger.exception("Empreinte de la ligne %s impossible", line_id)
+                result[str(line_id)] = None
+        return {'fingerprints': result}
 
-            # Récupérer le contexte du filtre
-            context = {}
-            if filter_obj.context:
-                try:
-                    # Remplacer null par None pour que ast.literal_eval fonctionne
-                    context_str = filter_obj.context.replace('null', 'None').replace('true', 'True').replace('false', 'False')
-                    context = ast.literal_eval(context_str)
-                except Exception as e:
-                    context = {}
-
-            # Fusionner avec le contexte actuel
-            ctx = dict(request.env.context)
-            # Conserver les informations importantes du contexte du filtre AVANT d'ajouter celles de la ligne
-            if context:
-                ctx.update(context)
-            
-            # Ajouter le line_id au contexte pour qu'il soit accessible dans _get_list_data
-            if line_id:
-                ctx['line_id'] = line_id
+    @http.route('/tableau_de_bord/export/<int:line_id>/<string:file_format>', type='http', auth='user')
+    def export_line(self, line_id, file_format, filters_values=None, cross_filter=None, **kwargs):
+        """Exporte le résultat complet d'une ligne (sans la limite de l'élément) en CSV ou XLSX
 
-            # Récupérer la ligne pour accéder à ses paramètres (notamment limit)
-            line = None
-            # Appliquer overrides éventuels de la ligne (sur ctx)
-            # Ces overrides peuvent SURCHARGER le contexte du filtre si définis dans la ligne
-            if line_id:
-                try:
-                    line = request.env['is.tableau.de.bord.line'].browse(int(line_id))
-                    if line and line.exists():
-                        if line.display_mode and line.display_mode != 'auto':
-                            ctx['search_default_view_type'] = line.display_mode
-                        # Seulement surcharger si la ligne a des valeurs définies
-                        if line.graph_chart_type:
-                            ctx['graph_chart_type'] = line.graph_chart_type
-                        if line.graph_aggregator:
-                            ctx['graph_aggregator'] = line.graph_aggregator
-                        if line.graph_measure:
-                            ctx['graph_measure'] = line.graph_measure
-                        if line.graph_groupbys:
-                            ctx['graph_groupbys'] = line.graph_groupbys
-                        # Toujours passer graph_show_legend (avec valeur par défaut True)
-                        ctx['graph_show_legend'] = line.graph_show_legend if hasattr(line, 'graph_show_legend') else True
-                        if line.pivot_row_groupby:
-                            # Convertir la chaîne en liste si nécessaire
-                            ctx['pivot_row_groupby'] = [g.strip() for g in line.pivot_row_groupby.split(',')] if ',' in line.pivot_row_groupby else [line.pivot_row_groupby]
-                        if line.pivot_col_groupby:
-                            # Convertir la chaîne en liste si nécessaire
-                            col_groupby_list = [g.strip() for g in line.pivot_col_groupby.split(',')] if ',' in line.pivot_col_groupby else [line.pivot_col_groupby]
-                            ctx['pivot_column_groupby'] = col_groupby_list
-                            # Garder aussi la forme simple pour compatibilité
-                            ctx['pivot_col_groupby'] = col_groupby_list
-                        if line.pivot_measure:
-                            # Convertir la chaîne en liste si nécessaire
-                            ctx['pivot_measures'] = [g.strip() for g in line.pivot_measure.split(',')] if ',' in line.pivot_measure else [line.pivot_measure]
-                        # Ajouter les paramètres de tri
-                        if line.pivot_sort_by:
-                            ctx['pivot_sort_by'] = line.pivot_sort_by
-                        if line.pivot_sort_order:
-                            ctx['pivot_sort_order'] = line.pivot_sort_order
-                        # Ajouter les paramètres d'affichage des totaux
-                        if hasattr(line, 'pivot_show_row_totals'):
-                            ctx['pivot_show_row_totals'] = line.pivot_show_row_totals
-                        if hasattr(line, 'pivot_show_col_totals'):
-                            ctx['pivot_show_col_totals'] = line.pivot_show_col_totals
-                except Exception:
-                    pass
+        Le fichier est produit au fil de l'eau, dans un curseur dédié ouvert par le
+        générateur de la réponse : la liste plate est lue par paquets avec un curseur
+        SQL, le classeur XLSX est écrit ligne à ligne (constant_memory). Les listes
+        groupées, tableaux croisés et graphiques sont calculés en une fois puis écrits
+        au fil de l'eau : leur taille est celle du résultat groupé, pas de la table.
+        """
+        if file_format not in EXPORT_CONTENT_TYPES:
+            raise request.not_found()
+        line = request.env['is.tableau.de.bord.line'].browse(line_id).exists()
+        if not line or not line.filter_id:
+            raise request.not_found()
+        line.check_access('read')
+        try:
+            filters_values = json.loads(filters_values) if filters_values else {}
+            cross_filter = json.loads(cross_filter) if cross_filter else None
+        except ValueError:
+            raise BadRequest("Paramètres d'export invalides")
+
+        registry = request.env.registry
+        uid = request.env.uid
+        context = dict(request.env.context)
+        filter_id = line.filter_id.id
+        title = line.name or 'Export'
+
+        def generate():
+            try:
+                with registry.cursor() as cr:
+                    env = api.Environment(cr, uid, context)
+                    header, rows = self._export_table(env, filter_id, line_id, filters_values, cross_filter)
+                    if file_format == 'csv':
+                        yield from self._stream_csv(header, rows)
+                    else:
+                        yield from self._stream_xlsx(title, header, rows)
+            except Exception:
+                # L'en-tête HTTP est déjà parti : le fichier reçu est tronqué
+                _logger.exception("Erreur lors de l'export de la ligne %s", line_id)
 
-            # Appliquer aussi d'éventuels overrides envoyés côté client (sécurisé au scope utilisateur)
-            if isinstance(overrides, dict):
-                safe_keys = {
-                    'search_default_view_type', 'graph_chart_type', 'graph_aggregator', 'graph_show_legend', 'show_data_title', 'show_record_count',
-                    'pivot_row_groupby', 'pivot_column_groupby', 'pivot_measures',
-                    'pivot_sort_by', 'pivot_sort_order',
-                    'graph_groupbys', 'graph_measure', 'list_fields', 'measure', 'group_by',
-                    'list_groupby'
+        headers = [
+            ('Content-Type', EXPORT_CONTENT_TYPES[file_format]),
+            ('Content-Disposition', content_disposition(f"{title}.{file_format}")),
+            ('Cache-Control', 'no-store'),
+        ]
+        return request.make_response(generate(), headers=headers)
+
+    @http.route('/tableau_de_bord/kiosk/<string:token>', type='http', auth='public')
+    def kiosk(self, token):
+        """Page autonome d'un écran kiosque (lecture seule, sans connexion)"""
+        kiosk = self._kiosk_from_token(token)
+        if not kiosk:
+            raise request.not_found()
+        return request.render('is_tableau_de_bord18.kiosk_page', {'kiosk': kiosk, 'token': token})
+
+    @http.route('/tableau_de_bord/kiosk/<string:token>/data', type='json', auth='public')
+    def kiosk_data(self, token):
+        """Tableaux de bord d'un écran kiosque avec les résultats partagés de leurs lignes
+
+        Les résultats sont lus dans le cache de l'utilisateur technique de l'écran, alimenté
+        par la tâche planifiée : tous les écrans ouverts sur le même jeton les partagent.
+        Une ligne absente du cache (écran neuf, ligne modifiée) est calculée une fois puis
+        stockée pour les écrans suivants.
+        """
+        kiosk = self._kiosk_from_token(token)
+        if not kiosk:
+            return {'error': 'Écran inconnu ou désactivé'}
+        env = kiosk._kiosk_env()
+        slides = []
+        for slide in kiosk.slide_ids:
+            dashboard = slide.dashboard_id
+            filters_values = env['is.tableau.de.bord.mem.filter'].get_filters(dashboard.id)
+            tiles = []
+            for line in dashboard.line_ids:
+                tile = {'id': line.id, 'name': line.name, 'width': line.width, 'height': line.height}
+                if line.filter_id:
+                    try:
+                        with request.env.cr.savepoint():
+                            # Entrées écrites depuis le dernier calcul de l'écran : servies sans relire les données
+                            result, _duration_ms = self._cached_filter_data(
+                                env, line.filter_id.id, line.id, filters_values=filters_values, origin='kiosk',
+                                fresh_since=kiosk.compute_date,
+                            )
+                        tile['data'] = {key: value for key, value in result.items() if key != '_perf'}
+                    except Exception:
+                        _logger.exception("Erreur lors du calcul de la ligne %s pour l'écran %s", line.id, kiosk.name)
+                        tile['data'] = {'error': 'Une erreur s\'est produite'}
+                tiles.append(tile)
+            slides.append({
+                'name': dashboard.name,
+                'duration': slide.duration or kiosk.rotation_seconds,
+                'tiles': tiles,
+            })
+        return {
+            'name': kiosk.name,
+            'refresh_seconds': max(kiosk.refresh_interval, 1) * 60,
+            'computed_at': kiosk.compute_date,
+            'slides': slides,
+        }
+
+    def _kiosk_from_token(self, token):
+        """Écran kiosque actif correspondant au jeton, ou enregistrement vide"""
+        if not token:
+            return request.env['is.tableau.de.bord.kiosk'].sudo().browse()
+        return request.env['is.tableau.de.bord.kiosk'].sudo().search([('access_token', '=', token)], limit=1)
+
+    @http.route('/tableau_de_bord/profile_finish/<int:dashboard_id>', type='json', auth='user')
+    def profile_finish(self, dashboard_id):
+        """Termine le profilage d'un chargement et enregistre l'archive sur le tableau de bord"""
+        dashboard = self._profile_dashboard(dashboard_id)
+        if not dashboard:
+            return {'done': False}
+        done = dashboard._profile_finish()
+        return {'done': done, 'filename': dashboard.sudo().profile_filename if done else False}
+
+    def _profile_dashboard(self, dashboard_id):
+        """Tableau de bord dont le profilage est demandé par l'utilisateur courant, sinon None"""
+        try:
+            dashboard_id = int(dashboard_id or 0)
+        except (TypeError, ValueError):
+            return None
+        if not dashboard_id:
+            return None
+        dashboard = request.env['is.tableau.de.bord'].browse(dashboard_id).exists()
+        return dashboard if dashboard and dashboard._profile_pending() else None
+
+    def _profiled_filter_data(self, dashboard, filter_id, line_id, overrides, filters_values, explain_count=5):
+        """Calcule une ligne sous cProfile en relevant ses requêtes SQL et leur durée
+
+        Le cache est ignoré pour mesurer le calcul réel. Les explain_count requêtes
+        SELECT les plus lentes reçoivent leur plan EXPLAIN (sans ANALYZE, pour ne pas
+        les exécuter une seconde fois).
+        """
+        env = request.env
+        queries = []
+
+        def query_hook(cr, query, params, query_start, query_time):
+            try:
+                sql = cr.mogrify(query, params).decode()
+            except Exception:
+                sql = str(query)
+            queries.append({'sql': sql, 'ms': round(query_time * 1000, 3)})
+
+        thread = threading.current_thread()
+        if not hasattr(thread, 'query_hooks'):
+            thread.query_hooks = []
+        thread.query_hooks.append(query_hook)
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            result, _duration_ms = self._cached_filter_data(
+                env, filter_id, line_id, overrides, filters_values, force=True,
+            )
+        finally:
+            profiler.disable()
+            thread.query_hooks.remove(query_hook)
+        profiler.create_stats()
+
+        selects = [query for query in queries if query['sql'].lstrip().upper().startswith(('SELECT', 'WITH'))]
+        for query in sorted(selects, key=lambda query: query['ms'], reverse=True)[:explain_count]:
+            try:
+                with env.cr.savepoint():
+                    env.cr.execute('EXPLAIN ' + query['sql'])
+                    query['explain'] = [row[0] for row in env.cr.fetchall()]
+            except Exception as e:
+                query['explain'] = [f'EXPLAIN impossible : {e}']
+
+        dashboard._profile_store_part(int(line_id), profiler.stats, queries)
+        (result.get('_perf') or {}).pop('data_fingerprint', None)
+        result['_profiled'] = True
+        return result
+
+    def _cached_filter_data(self, env, filter_id, line_id=None, overrides=None, filters_values=None,
+                            origin='request', force=False, data_fingerprint=None, fresh_since=None):
+        """Résultat d'une ligne depuis le cache de l'utilisateur, ou calculé puis mis en cache
+
+        force=True ignore l'entrée existante (pré-calcul). La clé ne reprend pas les
+        overrides : ils reflètent la configuration enregistrée de la ligne, dont toute
+        modification invalide le cache.
+
+        Chaque entrée porte l'empreinte des données lues (_data_fingerprint), de la même
+        origine que le résultat (instantané, agrégat pré-calculé ou table) : une entrée
+        dont l'empreinte a changé est ignorée, même avant son expiration (voir
+        _entry_current). data_fingerprint : empreinte déjà établie par l'appelant, reprise
+        si elle est de la même origine. fresh_since : les entrées de l'écran kiosque
+        calculées depuis cette date sont servies sans vérification.
+
+        L'empreinte d'un nouveau résultat n'est établie que s'il est mis en cache, après
+        le calcul : la transaction (REPEATABLE READ) voit les mêmes données que lui.
+        L'empreinte établie est placée dans _perf['data_fingerprint'].
+
+        Returns:
+            (résultat, durée du calcul en ms, 0 si servi par le cache)
+        """
+        start = time.perf_counter()
+        queries_before, sql_time_before = self._sql_counters()
+        Cache = env['is.tableau.de.bord.cache']
+        line = env['is.tableau.de.bord.line'].browse(int(line_id)) if line_id else None
+        if line is not None and not line.exists():
+            line = None
+        variant = None
+        if line and line.display_mode == 'graph' and line.graph_chart_type == 'line':
+            variant = self._graph_max_points((overrides or {}).get('graph_max_points'))
+        cache_key = Cache._cache_key(filter_id, filters_values, variant)
+        if line and not force:
+            entry = Cache._get_entry(line, cache_key)
+            if entry and self._entry_current(env, entry, filter_id, line, filters_values, data_fingerprint, fresh_since):
+                cached = json.loads(entry.payload)
+                queries_after, sql_time_after = self._sql_counters()
+                # Lignes lues : aucune, le résultat vient du cache ; les groupes sont ceux affichés
+                groups = self._payload_counts(cached)[1]
+                cached['_perf'] = {
+                    'cache_hit': True,
+                    'total_ms': round((time.perf_counter() - start) * 1000, 1),
+                    'sql_ms': round((sql_time_after - sql_time_before) * 1000, 1),
+                    'queries': queries_after - queries_before,
+                    'rows': 0,
+                    'groups': groups,
+                    'mode': cached.get('type'),
                 }
-                for k, v in overrides.items():
-                    if k in ('display_mode',):
-                        ctx['search_default_view_type'] = v
-                    elif k in safe_keys:
-                        ctx[k] = v
-
-            # Déterminer le type de vue à utiliser
-            view_type = self._get_view_type_from_context(ctx)
-
-            model = model.with_context(ctx)
-            if view_type == 'graph':
-                return self._get_graph_data(model, filter_obj, domain, ctx, line)
-            elif view_type == 'pivot':
-                return self._get_pivot_data(model, filter_obj, domain, ctx, line)
+                self._log_perf(filter_id, line_id, cached['_perf'])
+                cached['_perf']['data_fingerprint'] = entry.data_fingerprint or None
+                return cached, 0
+
+        result = self._compute_filter_data(env, filter_id, line_id, overrides, filters_values)
+        duration_ms = int((time.perf_counter() - start) * 1000)
+        if line and Cache._is_stored(line, result, origin):
+            source = self._result_source(result)
+            if source != 'live' or self._fingerprint_source(data_fingerprint) != source:
+                # Instantané et agrégat : empreinte sans coût, relue après le calcul qui a pu les mettre à jour
+                data_fingerprint = self._data_fingerprint(env, filter_id, line.id, filters_values, source)
+            Cache._store_payload(line, cache_key, result, duration_ms, origin, data_fingerprint)
+            if '_perf' in result:
+                result['_perf']['data_fingerprint'] = data_fingerprint
+        if '_perf' in result:
+            result['_perf'].update({'cache_hit': False, 'total_ms': round((time.perf_counter() - start) * 1000, 1)})
+            self._log_perf(filter_id, line_id, result['_perf'])
+        return result, duration_ms
+
+    def _not_modified(self, payload_hash, fingerprint, perf=None):
+        """Réponse « non modifié » : le client garde le résultat qu'il affiche déjà"""
+        return {
+            'not_modified': True,
+            '_hash': payload_hash,
+            '_fingerprint': fingerprint,
+            '_perf': dict(perf or {}, not_modified=True),
+        }
+
+    def _payload_hash(self, result):
+        """Empreinte du contenu affiché d'un résultat (hors clés techniques préfixées par _)
+
+        Le client la compare à celle du résultat qu'il a déjà affiché pour ne redessiner
+        l'élément que si les données ont changé.
+        """
+        content = {key: value for key, value in result.items() if not key.startswith('_')}
+        return hashlib.sha1(json.dumps(clean_for_json(content), sort_keys=True, default=str).encode()).hexdigest()
+
+    def _log_perf(self, filter_id, line_id, perf):
+        """Trace structurée (clé=valeur) des performances d'une ligne"""
+        _logger.info(
+            "tile_perf line=%s filter=%s mode=%s cache_hit=%s total_ms=%s config_ms=%s domain_ms=%s "
+            "sql_ms=%s post_ms=%s queries=%s rows=%s groups=%s source=%s",
+            line_id, filter_id, perf.get('mode'), perf.get('cache_hit'), perf.get('total_ms'),
+            perf.get('config_ms', 0), perf.get('domain_ms', 0), perf.get('sql_ms', 0), perf.get('post_ms', 0),
+            perf.get('queries', 0), perf.get('rows', 0), perf.get('groups', 0), perf.get('source', 'live'),
+        )
+
+    def _record_perf(self, line_id, perf, error=False):
+        """Ajoute la mesure d'une ligne au lot en attente et l'écrit si nécessaire
+
+        Les mesures sont regroupées par processus et par base et écrites par lots dans
+        un curseur séparé, pour ne pas allonger ni faire échouer la transaction de la
+        requête : dès que le lot est plein, sinon PERF_FLUSH_DELAY secondes après sa
+        première mesure (minuterie, même sans autre requête), et à l'arrêt du processus.
+        """
+        try:
+            line_id = int(line_id or 0)
+        except (TypeError, ValueError):
+            return
+        if not line_id:
+            return
+        perf = perf or {}
+        sample = {
+            'line_id': line_id,
+            'date': fields.Date.to_string(fields.Date.today()),
+            'total_ms': float(perf.get('total_ms') or 0),
+            'cache_hit': bool(perf.get('cache_hit')),
+            'error': error,
+            'rows': perf.get('rows') or 0,
+            'queries': perf.get('queries') or 0,
+        }
+        dbname = request.env.cr.dbname
+        with PERF_BUFFER_LOCK:
+            buffer = PERF_BUFFERS.setdefault(dbname, [])
+            buffer.append(sample)
+            full = len(buffer) >= PERF_FLUSH_SIZE
+            if not full and dbname not in PERF_TIMERS:
+                timer = threading.Timer(PERF_FLUSH_DELAY, flush_perf_samples, args=(dbname,))
+                timer.daemon = True
+                PERF_TIMERS[dbname] = timer
+                timer.start()
+        if full:
+            flush_perf_samples(dbname)
+
+    def _compute_filter_data(self, env, filter_id, line_id=None, overrides=None, filters_values=None, cross_filter=None):
+        """Calcule les données d'une ligne de tableau de bord dans l'environnement env
+
+        Séparé de la route pour être réutilisé hors requête HTTP (tâches planifiées),
+        avec les droits de l'utilisateur de env.
+
+        Le résultat porte un bloc _perf : durées (ms) de résolution de la configuration,
+        d'évaluation du domaine, SQL et post-traitement, nombre de requêtes SQL, de
+        lignes lues et de groupes retournés.
+        """
+        overrides = overrides or {}
+        filters_values = filters_values or {}
+        start = time.perf_counter()
+        filter_obj = env['ir.filters'].browse(filter_id)
+        if not filter_obj.exists():
+            return {'error': 'Filtre non trouvé'}
+
+        model = env[filter_obj.model_id]
+        domain_start = time.perf_counter()
+
+        domain = self._line_domain(env, model, filter_obj, line_id, filters_values, cross_filter)
+        domain_end = time.perf_counter()
+
+        ctx, line = self._line_context(env, filter_obj, line_id, overrides)
+
+        # Déterminer le type de vue à utiliser
+        view_type = self._get_view_type_from_context(ctx)
+
+        model = model.with_context(ctx)
+        data_start = time.perf_counter()
+        queries_before, sql_time_before = self._sql_counters()
+        timeout = self._statement_timeout_seconds(env, line)
+        try:
+            with self._statement_timeout(env, timeout):
+                if view_type == 'kpi':
+                    result = self._get_kpi_data(model, filter_obj, domain, ctx, line)
+                elif view_type == 'graph':
+                    result = self._get_graph_data(model, filter_obj, domain, ctx, line)
+                elif view_type == 'pivot':
+                    result = self._get_pivot_data(model, filter_obj, domain, ctx, line)
+                else:
+                    result = self._get_list_data(model, filter_obj, domain, ctx, line)
+        except QueryCanceled:
+            _logger.warning("Ligne %s (filtre %s) interrompue après %s s", line_id, filter_id, timeout)
+            result = {
+                'type': view_type,
+                'timeout': True,
+                'timeout_seconds': timeout,
+                'error': f"Calcul interrompu : délai de {timeout} s dépassé",
+            }
+        queries_after, sql_time_after = self._sql_counters()
+        data_end = time.perf_counter()
+
+        sql_ms = (sql_time_after - sql_time_before) * 1000
+        rows, groups = self._payload_counts(result)
+        perf = result.setdefault('_perf', {})
+        perf.update({
+            'config_ms': round(((domain_start - start) + (data_start - domain_end)) * 1000, 1),
+            'domain_ms': round((domain_end - domain_start) * 1000, 1),
+            'sql_ms': round(sql_ms, 1),
+            'post_ms': round(max((data_end - data_start) * 1000 - sql_ms, 0), 1),
+            'queries': queries_after - queries_before,
+            'rows': perf.get('rows', rows),
+            'groups': groups,
+            'mode': view_type,
+        })
+        return result
+
+    def _line_context(self, env, filter_obj, line_id=None, overrides=None):
+        """Contexte de calcul d'une ligne : contexte du filtre, paramètres de la ligne et overrides du client
+
+        Returns:
+            (contexte, ligne ou None)
+        """
+        # Récupérer le contexte du filtre
+        context = {}
+        if filter_obj.context:
+            try:
+                # Remplacer null par None pour que ast.literal_eval fonctionne
+                context_str = filter_obj.context.replace('null', 'None').replace('true', 'True').replace('false', 'False')
+                context = ast.literal_eval(context_str)
+            except Exception as e:
+                context = {}
+
+        # Fusionner avec le contexte actuel
+        ctx = dict(env.context)
+        # Conserver les informations importantes du contexte du filtre AVANT d'ajouter celles de la ligne
+        if context:
+            ctx.update(context)
+        
+        # Ajouter le line_id au contexte pour qu'il soit accessible dans _get_list_data
+        if line_id:
+            ctx['line_id'] = line_id
+
+        # Récupérer la ligne pour accéder à ses paramètres (notamment limit)
+        line = None
+        # Appliquer overrides éventuels de la ligne (sur ctx)
+        # Ces overrides peuvent SURCHARGER le contexte du filtre si définis dans la ligne
+        if line_id:
+            try:
+                line = env['is.tableau.de.bord.line'].browse(int(line_id))
+                if line and line.exists():
+                    if line.display_mode and line.display_mode != 'auto':
+                        ctx['search_default_view_type'] = line.display_mode
+                    # Seulement surcharger si la ligne a des valeurs définies
+                    if line.graph_chart_type:
+                        ctx['graph_chart_type'] = line.graph_chart_type
+                    if line.graph_aggregator:
+                        ctx['graph_aggregator'] = line.graph_aggregator
+                    if line.graph_measure:
+                        ctx['graph_measure'] = line.graph_measure
+                    if line.graph_groupbys:
+                        ctx['graph_groupbys'] = line.graph_groupbys
+                    if line.graph_series_mode:
+                        ctx['graph_series_mode'] = line.graph_series_mode
+                        ctx['graph_moving_periods'] = line.graph_moving_periods
+                    # Toujours passer graph_show_legend (avec valeur par défaut True)
+                    ctx['graph_show_legend'] = line.graph_show_legend if hasattr(line, 'graph_show_legend') else True
+                    if line.pivot_row_groupby:
+                        # Convertir la chaîne en liste si nécessaire
+                        ctx['pivot_row_groupby'] = [g.strip() for g in line.pivot_row_groupby.split(',')] if ',' in line.pivot_row_groupby else [line.pivot_row_groupby]
+                    if line.pivot_col_groupby:
+                        # Convertir la chaîne en liste si nécessaire
+                        col_groupby_list = [g.strip() for g in line.pivot_col_groupby.split(',')] if ',' in line.pivot_col_groupby else [line.pivot_col_groupby]
+                        ctx['pivot_column_groupby'] = col_groupby_list
+                        # Garder aussi la forme simple pour compatibilité
+                        ctx['pivot_col_groupby'] = col_groupby_list
+                    if line.pivot_measure:
+                        # Convertir la chaîne en liste si nécessaire
+                        ctx['pivot_measures'] = [g.strip() for g in line.pivot_measure.split(',')] if ',' in line.pivot_measure else [line.pivot_measure]
+                    # Ajouter les paramètres de tri
+                    if line.pivot_sort_by:
+                        ctx['pivot_sort_by'] = line.pivot_sort_by
+                    if line.pivot_sort_order:
+                        ctx['pivot_sort_order'] = line.pivot_sort_order
+                    # Ajouter les paramètres d'affichage des totaux
+                    if hasattr(line, 'pivot_show_row_totals'):
+                        ctx['pivot_show_row_totals'] = line.pivot_show_row_totals
+                    if hasattr(line, 'pivot_show_col_totals'):
+                        ctx['pivot_show_col_totals'] = line.pivot_show_col_totals
+            except Exception:
+                pass
+
+        # Appliquer aussi d'éventuels overrides envoyés côté client (sécurisé au scope utilisateur)
+        if isinstance(overrides, dict):
+            safe_keys = {
+                'search_default_view_type', 'graph_chart_type', 'graph_aggregator', 'graph_show_legend', 'show_data_title', 'show_record_count',
+                'pivot_row_groupby', 'pivot_column_groupby', 'pivot_measures',
+                'pivot_sort_by', 'pivot_sort_order',
+                'graph_groupbys', 'graph_measure', 'list_fields', 'measure', 'group_by',
+                'list_groupby', 'graph_series_mode', 'graph_moving_periods', 'graph_max_points'
+            }
+            for k, v in overrides.items():
+                if k in ('display_mode',):
+                    ctx['search_default_view_type'] = v
+                elif k in safe_keys:
+                    ctx[k] = v
+        return ctx, line
+
+    def _line_domain(self, env, model, filter_obj, line_id=None, filters_values=None, cross_filter=None):
+        """Domaine d'une ligne : domaine du filtre, filtres du tableau de bord et filtre croisé"""
+        # Récupérer le domaine du filtre
+        domain = self._eval_filter_domain(env, filter_obj)
+
+        # Appliquer les filtres dynamiques si définis
+        self._apply_line_filters(env, line_id, filters_values, domain)
+        if cross_filter and cross_filter.get('model') == model._name:
+            domain.extend(self._cross_filter_domain(model, cross_filter.get('conditions')))
+        return domain
+
+    def _apply_line_filters(self, env, line_id, filters_values, domain):
+        """Ajoute au domaine les conditions des filtres du tableau de bord saisis pour la ligne"""
+        if not filters_values or not line_id:
+            return domain
+        try:
+            line = env['is.tableau.de.bord.line'].browse(int(line_id))
+            if line and line.exists() and line.line_filter_ids:
+                for line_filter in line.line_filter_ids:
+                    filter_def_id = line_filter.filter_def_id.id
+                    # Convertir les clés du dictionnaire en int pour la comparaison
+                    filter_value = None
+                    for key, val in filters_values.items():
+                        if int(key) == filter_def_id:
+                            filter_value = val
+                            break
+                    
+                    if filter_value:
+                        field_name = line_filter.field_id.name
+                        field_type = line_filter.field_id.ttype
+                        filter_type = line_filter.filter_def_id.filter_type
+                        
+                        # Utiliser le parser avancé
+                        parsed_domain = self._parse_filter_value(field_name, field_type, filter_value, filter_type)
+                        if parsed_domain:
+                            domain.extend(parsed_domain)
+        except Exception:
+            import traceback
+            traceback.print_exc()
+        return domain
+
+    def _cross_filter_domain(self, model, conditions):
+        """Domaine d'un filtre croisé : une condition (groupement, valeur brute du groupe) par niveau
+
+        Les groupements date/datetime filtrent la période du groupe (jour, semaine,
+        mois, trimestre, année) dans le fuseau de l'utilisateur.
+        """
+        domain = []
+        for condition in conditions or []:
+            fname, _sep, granularity = str(condition.get('groupby') or '').partition(':')
+            field = model._fields.get(fname)
+            if not field:
+                continue
+            key = condition.get('key')
+            if key is None or key is False:
+                domain.append((fname, '=', False))
+            elif field.type in ('date', 'datetime') and granularity in PERIOD_STEPS:
+                day = fields.Date.to_date(str(key)[:10])
+                domain.extend([
+                    (fname, '>=', self._date_bound(model, fname, day)),
+                    (fname, '<', self._date_bound(model, fname, day + PERIOD_STEPS[granularity])),
+                ])
             else:
-                return self._get_list_data(model, filter_obj, domain, ctx, line)
+                domain.append((fname, '=', key))
+        return domain
+
+    def _model_fingerprint(self, model, domain):
+        """Empreinte peu coûteuse des enregistrements du domaine (droits de l'utilisateur appliqués)
+
+        Nombre, plus grand id et dernière date de modification : toute création,
+        suppression ou modification d'un enregistrement du domaine la change.
+        """
+        model.check_access('read')
+        query = model._search(domain)
+        columns = [SQL("COUNT(*)"), SQL("MAX(%s)", SQL.identifier(query.table, 'id'))]
+        if model._log_access:
+            columns.append(SQL("MAX(%s)", SQL.identifier(query.table, 'write_date')))
+        model.env.cr.execute(query.select(*columns))
+        return [str(value) if value is not None else None for value in model.env.cr.fetchone()]
+
+    def _data_fingerprint(self, env, filter_id, line_id, filters_values=None, source=None):
+        """Empreinte des données lues par une ligne, indépendante de son affichage
+
+        source : origine des données du résultat à comparer (voir _result_source),
+        reprise en préfixe de l'empreinte :
+        - 'snapshot' : date de l'instantané de la ligne, sans requête ;
+        - 'rollup:<id>' : version et jours en attente de l'agrégat pré-calculé, sans
+          lire la table source (is.tableau.de.bord.rollup._rollup_stamp) ;
+        - 'live' (défaut) : empreinte des enregistrements du domaine (droits de
+          l'utilisateur et filtres du tableau de bord appliqués), lue sur la table.
+        Le jour courant (périodes glissantes) y entre toujours. Stockée avec chaque
+        résultat mis en cache : une empreinte différente à la lecture rend l'entrée
+        caduque. None si elle ne peut être établie.
+        """
+        try:
+            line = env['is.tableau.de.bord.line'].browse(int(line_id)).exists()
+            filter_obj = env['ir.filters'].browse(int(filter_id)).exists()
+        except (TypeError, ValueError):
+            return None
+        if not line or not filter_obj or filter_obj.model_id not in env:
+            return None
+        source = source or 'live'
+        if source == 'snapshot':
+            if line.data_source != 'snapshot' or not line.snapshot_date:
+                return None
+            data = line.snapshot_date
+        elif source.startswith('rollup:'):
+            try:
+                rollup = env['is.tableau.de.bord.rollup'].sudo().browse(int(source.partition(':')[2])).exists()
+                if not rollup or not rollup.active or rollup.model_name != filter_obj.model_id:
+                    return None
+                with env.cr.savepoint():
+                    data = rollup._rollup_stamp()
+            except Exception:
+                _logger.debug("Empreinte de l'agrégat %s impossible", source, exc_info=True)
+                return None
+        else:
+            source = 'live'
+            domain = self._apply_line_filters(env, line.id, filters_values, self._eval_filter_domain(env, filter_obj))
+            try:
+                with self._statement_timeout(env, self._statement_timeout_seconds(env, line)):
+                    data = self._model_fingerprint(env[filter_obj.model_id], domain)
+            except Exception:
+                _logger.debug("Empreinte de la ligne %s impossible", line.id, exc_info=True)
+                return None
+        key = [data, fields.Date.context_today(line)]
+        return f"{source}:{hashlib.sha1(json.dumps(key, default=str).encode()).hexdigest()}"
+
+    def _fingerprint_source(self, fingerprint):
+        """Origine des données d'une empreinte (_data_fingerprint ou _line_fingerprint), None si inconnue"""
+        if not fingerprint or not isinstance(fingerprint, str):
+            return None
+        return fingerprint.rpartition(':')[0] or None
+
+    def _result_source(self, result):
+        """Origine des données d'un résultat calculé : 'snapshot', 'rollup:<id>' ou 'live'"""
+        perf = result.get('_perf') or {}
+        if perf.get('source') == 'snapshot':
+            return 'snapshot'
+        if perf.get('rollup_id'):
+            return f"rollup:{perf['rollup_id']}"
+        return 'live'
+
+    def _entry_current(self, env, entry, filter_id, line, filters_values=None, data_fingerprint=None, fresh_since=None):
+        """Vrai si une entrée du cache a été calculée sur les données actuelles
+
+        L'empreinte actuelle est établie pour l'origine de celle de l'entrée ;
+        data_fingerprint est reprise si elle est de la même origine.
+        """
+        if fresh_since and entry.origin == 'kiosk' and entry.computed_at >= fresh_since:
+            return True
+        if not entry.data_fingerprint:
+            return False
+        source = self._fingerprint_source(entry.data_fingerprint)
+        if self._fingerprint_source(data_fingerprint) != source:
+            data_fingerprint = self._data_fingerprint(env, filter_id, line.id, filters_values, source)
+        return data_fingerprint == entry.data_fingerprint
+
+    def _line_fingerprint(self, env, filter_id, line_id, overrides=None, filters_values=None, data_fingerprint=None,
+                          source=None):
+        """Empreinte de tout ce dont dépend le résultat d'une ligne, sans la calculer
+
+        Reprend la clé du cache (filtre, valeurs des filtres, langue, fuseau, sociétés),
+        l'utilisateur, les overrides, les dates de modification de la ligne et de la
+        recherche enregistrée et l'empreinte des données (_data_fingerprint de l'origine
+        source, établie si elle n'est pas fournie), dont elle garde le préfixe. None si
+        elle ne peut être établie.
+        """
+        if not data_fingerprint:
+            data_fingerprint = self._data_fingerprint(env, filter_id, line_id, filters_values, source)
+        if not data_fingerprint:
+            return None
+        line = env['is.tableau.de.bord.line'].browse(int(line_id))
+        filter_obj = env['ir.filters'].browse(int(filter_id))
+        key = [
+            env['is.tableau.de.bord.cache']._cache_key(filter_obj.id, filters_values),
+            env.uid,
+            sorted((overrides or {}).items()),
+            line.write_date,
+            filter_obj.write_date,
+            data_fingerprint,
+        ]
+        digest = hashlib.sha1(json.dumps(key, default=str).encode()).hexdigest()
+        return f"{self._fingerprint_source(data_fingerprint)}:{digest}"
+
+    def _result_fingerprint(self, env, filter_id, line_id, overrides, filters_values, result, fingerprint=None):
+        """Empreinte de ligne renvoyée au client avec un résultat
 
+        Reprend l'empreinte des données établie par le cache (entrée servie ou
+        enregistrée), sinon fingerprint si elle porte sur l'origine des données du
+        résultat. Sans l'une ni l'autre (premier affichage sans cache), aucune : le
+        client l'obtient à sa requête conditionnelle suivante.
+        """
+        data_fingerprint = (result.get('_perf') or {}).pop('data_fingerprint', None)
+        if result.get('error'):
+            return None
+        if data_fingerprint:
+            return self._line_fingerprint(env, filter_id, line_id, overrides, filters_values, data_fingerprint)
+        source = self._result_source(result)
+        if fingerprint and self._fingerprint_source(fingerprint) != source:
+            return self._line_fingerprint(env, filter_id, line_id, overrides, filters_values, source=source)
+        return fingerprint
+
+    def _export_table(self, env, filter_id, line_id, filters_values=None, cross_filter=None):
+        """Résultat complet d'une ligne pour l'export
+
+        Même configuration que l'élément affiché, sans sa limite ni simplification des
+        courbes et sans délai maximum des requêtes.
+
+        Returns:
+            (en-tête, itérateur de (valeurs, niveau)) ; niveau 1 marque une ligne de
+            groupe ou de total
+        """
+        filter_obj = env['ir.filters'].browse(filter_id)
+        model = env[filter_obj.model_id]
+        domain = self._line_domain(env, model, filter_obj, line_id, filters_values, cross_filter)
+        ctx, line = self._line_context(env, filter_obj, line_id)
+        ctx.update(tdb_export=True, graph_max_points=0)
+        model = model.with_context(ctx)
+        view_type = self._get_view_type_from_context(ctx)
+
+        if view_type == 'list' and not (ctx.get('list_groupby') or (line and line.list_groupby)):
+            return self._export_list_rows(model, domain, ctx)
+        if view_type == 'list':
+            result = self._get_list_data(model, filter_obj, domain, ctx, line)
+            fields_meta = result['fields']
+            header = [meta['string'] for meta in fields_meta]
+            rows = (
+                ([row.get(meta['name']) for meta in fields_meta], 1 if row.get('_is_group_header') else 0)
+                for row in result['data']
+            )
+            return header, rows
+        if view_type == 'pivot':
+            return self._export_pivot_rows(self._get_pivot_data(model, filter_obj, domain, ctx, line)['data'])
+        if view_type == 'graph':
+            data = self._get_graph_data(model, filter_obj, domain, ctx, line)['data']
+            header = ['Libellé'] + [dataset['label'] for dataset in data['datasets']]
+            rows = (
+                ([label] + [dataset['data'][i] for dataset in data['datasets']], 0)
+                for i, label in enumerate(data['labels'])
+            )
+            return header, rows
+        result = self._get_kpi_data(model, filter_obj, domain, ctx, line)
+        header = [f"{result['label']} ({result['period_label']})" if result['period_label'] else result['label']]
+        values = [result['value']]
+        if 'compare' in result:
+            header.append(result['compare']['label'])
+            values.append(result['compare']['value'])
+        return header, iter([(values, 0)])
+
+    def _export_list_rows(self, model, domain, context):
+        """Liste plate complète lue par paquets avec un curseur SQL (DECLARE / FETCH)
+
+        Le curseur est déclaré dans la transaction de l'environnement : seuls
+        EXPORT_CHUNK_SIZE identifiants sont en mémoire à la fois ; le cache de
+        l'environnement est vidé après chaque paquet.
+        """
+        fields_to_display, field_labels, fields_def, order_string = self._list_columns(model, context)
+        header = [field_labels.get(fname, fname) for fname in fields_to_display]
+        tz = pytz.timezone(model.env.context.get('tz') or model.env.user.tz or 'UTC')
+
+        def rows():
+            model.env.flush_all()
+            query = model._search(domain, order=order_string)
+            cr = model.env.cr
+            cursor_name = SQL.identifier(f"tdb_export_{uuid.uuid4().hex}")
+            cr.execute(SQL("DECLARE %s NO SCROLL CURSOR FOR %s", cursor_name, query.select()))
+            try:
+                while True:
+                    cr.execute(SQL("FETCH FORWARD %s FROM %s", EXPORT_CHUNK_SIZE, cursor_name))
+                    ids = [row[0] for row in cr.fetchall()]
+                    if not ids:
+                        break
+                    for record in model.browse(ids).read(fields_to_display):
+                        yield [
+                            self._export_value(model, record.get(fname), fields_def.get(fname, {}), tz)
+                            for fname in fields_to_display
+                        ], 0
+                    model.env.invalidate_all()
+            finally:
+                cr.execute(SQL("CLOSE %s", cursor_name))
+
+        return header, rows()
+
+    def _export_value(self, model, value, field_info, tz):
+        """Valeur d'un champ lu par read() telle qu'affichée : libellés, noms, dates locales"""
+        ftype = field_info.get('type')
+        if ftype == 'boolean':
+            return bool(value)
+        if value is False or value is None:
+            return None
+        if ftype == 'many2one':
+            return value[1] if isinstance(value, (list, tuple)) else value
+        if ftype in ('many2many', 'one2many'):
+            return ', '.join(model.env[field_info['relation']].browse(value).mapped('display_name'))
+        if ftype == 'selection':
+            return dict(field_info.get('selection') or []).get(value, value)
+        if ftype == 'datetime':
+            return pytz.utc.localize(value).astimezone(tz).replace(tzinfo=None)
+        return value
+
+    def _export_pivot_rows(self, data):
+        """Matrice d'un tableau croisé : une colonne par colonne feuille et par mesure, puis les totaux"""
+        measures = [meta['label'] for meta in data['measures']]
+
+        def labels(prefix):
+            if len(measures) == 1:
+                return [prefix]
+            return [f"{prefix} - {measure}" for measure in measures]
+
+        header = [data['row_label']]
+        for column in data['columns']:
+            header.extend(labels(column['label']))
+        with_totals = bool(data['rows']) and 'row_total' in data['rows'][0]
+        if with_totals:
+            header.extend(labels('Total'))
+
+        def rows():
+            for row in data['rows']:
+                values = list(row['values']) + (list(row.get('row_total') or []) if with_totals else [])
+                yield ['    ' * (row['level'] - 1) + str(row['row'])] + values, 1 if row['is_group'] else 0
+            if 'col_totals' in data:
+                values = list(data['col_totals']) + (list(data['grand_total']) if with_totals else [])
+                yield ['Total'] + values, 1
+
+        return header, rows()
+
+    def _stream_csv(self, header, rows):
+        """CSV UTF-8 (avec BOM pour Excel) envoyé par paquets de EXPORT_CHUNK_SIZE lignes"""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, quoting=csv.QUOTE_ALL)
+        buffer.write('\ufeff')
+        writer.writerow(header)
+        for count, (values, _level) in enumerate(rows, 1):
+            writer.writerow(['' if value is None else value for value in values])
+            if count % EXPORT_CHUNK_SIZE == 0:
+                yield buffer.getvalue().encode()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue().encode()
+
+    def _stream_xlsx(self, title, header, rows):
+        """Classeur XLSX écrit ligne à ligne dans un fichier temporaire, puis envoyé par blocs"""
+        with tempfile.TemporaryFile() as output:
+            workbook = xlsxwriter.Workbook(output, {'constant_memory': True})
+            sheet = workbook.add_worksheet(re.sub(r'[\[\]:*?/\\]', ' ', title)[:31] or 'Export')
+            bold = workbook.add_format({'bold': True})
+            date_format = workbook.add_format({'num_format': 'dd/mm/yyyy'})
+            datetime_format = workbook.add_format({'num_format': 'dd/mm/yyyy hh:mm:ss'})
+            sheet.write_row(0, 0, header, bold)
+            for index, (values, level) in enumerate(rows, 1):
+                if index >= XLSX_MAX_ROWS:
+                    _logger.warning("Export XLSX tronqué à %s lignes", XLSX_MAX_ROWS - 1)
+                    break
+                for col, value in enumerate(values):
+                    if isinstance(value, datetime):
+                        sheet.write_datetime(index, col, value, datetime_format)
+                    elif isinstance(value, date):
+                        sheet.write_datetime(index, col, value, date_format)
+                    elif value is not None:
+                        sheet.write(index, col, value, bold if level else None)
+            workbook.close()
+            output.seek(0)
+            while chunk := output.read(65536):
+                yield chunk
+
+    def _eval_filter_domain(self, env, filter_obj):
+        """Domaine évalué d'une recherche enregistrée ([] si vide ou invalide)"""
+        if not filter_obj.domain:
+            return []
+        try:
+            # Utiliser safe_eval pour supporter les expressions dynamiques
+            # comme context_today(), datetime.timedelta, relativedelta, etc.
+            eval_context = {
+                'datetime': safe_datetime,
+                'context_today': lambda: date.today(),
+                'current_date': date.today().strftime('%Y-%m-%d'),
+                'time': safe_time,
+                'relativedelta': relativedelta,
+                'timedelta': timedelta,
+                'uid': env.uid,
+                'user': env.user,
+            }
+            return safe_eval(filter_obj.domain, eval_context)
         except Exception:
-            return {'error': 'Une erreur s\'est produite'}
+            return []
+
+    def _statement_timeout_seconds(self, env, line=None):
+        """Délai maximum (secondes) des requêtes d'une ligne : celui de la ligne, sinon le paramètre global"""
+        if line and line.exists() and line.statement_timeout:
+            return line.statement_timeout
+        param = env['ir.config_parameter'].sudo().get_param('is_tableau_de_bord18.statement_timeout', '0')
+        try:
+            return max(int(param), 0)
+        except ValueError:
+            return 0
+
+    @contextmanager
+    def _statement_timeout(self, env, seconds):
+        """Limite la durée de chaque requête du bloc (SET LOCAL statement_timeout dans un savepoint)
+
+        Une requête trop longue lève QueryCanceled ; le savepoint est alors annulé, ce
+        qui rétablit aussi le délai précédent, et la transaction reste utilisable pour
+        les autres lignes. Sans dépassement, le délai précédent est remis avant de
+        libérer le savepoint (SET LOCAL vaut sinon jusqu'à la fin de la transaction).
+        Pas de limite pour le rafraîchissement des instantanés.
+        """
+        if not seconds or env.context.get('tdb_snapshot_refresh'):
+            yield
+            return
+        cr = env.cr
+        cr.execute(SQL("SHOW statement_timeout"))
+        previous = cr.fetchone()[0]
+        with cr.savepoint():
+            cr.execute(SQL("SET LOCAL statement_timeout = %s", int(seconds * 1000)))
+            yield
+            cr.execute(SQL("SET LOCAL statement_timeout = %s", previous))
+
+    def _sql_counters(self):
+        """Compteurs SQL du thread courant (nombre de requêtes, temps cumulé en secondes)
+
+        Le curseur Odoo les incrémente à chaque requête lorsqu'ils existent ; ils sont
+        initialisés ici pour les threads qui ne les ont pas (tâches planifiées).
+        """
+        thread = threading.current_thread()
+        if not hasattr(thread, 'query_count'):
+            thread.query_count = 0
+            thread.query_time = 0
+        return thread.query_count, thread.query_time
+
+    def _payload_counts(self, result):
+        """(lignes lues, groupes retournés) déduits du résultat d'une ligne"""
+        data = result.get('data')
+        if result.get('type') == 'graph':
+            groups = len((data or {}).get('labels') or [])
+            return groups, groups
+        if result.get('type') == 'pivot':
+            groups = len((data or {}).get('rows') or [])
+            return groups, groups
+        if result.get('type') == 'kpi':
+            return 1, 1
+        rows = len(data or [])
+        return rows, rows if result.get('is_grouped') else 0
 
     def _get_view_type_from_context(self, context):
         """Détermine le type de vue à partir du contexte"""
         # Priorité 1: display_mode explicite (depuis la ligne du tableau de bord)
         if 'search_default_view_type' in context:
             view_type = context.get('search_default_view_type', '')
+            if 'kpi' in view_type:
+                return 'kpi'
             if 'graph' in view_type:
                 return 'graph'
             if 'pivot' in view_type:
@@ -496,84 +1598,14 @@ class TableauDeBordController(http.Controller):
         
         if line and hasattr(line, 'limit') and line.limit > 0:
             limit = line.limit
+        if context.get('tdb_export'):
+            limit = 0
         if line and hasattr(line, 'show_record_count'):
             show_record_count = line.show_record_count
         if not list_groupby and line and hasattr(line, 'list_groupby') and line.list_groupby:
             list_groupby = [g.strip() for g in line.list_groupby.split(',') if g.strip()]
         
-        # 1) Priorité 1: Champs configurés dans la ligne du tableau de bord (field_ids)
-        line_id = context.get('line_id')
-        explicit_fields = []
-        field_labels = {}
-        order_string = None  # Chaîne de tri pour search()
-        
-        if line_id:
-            try:
-                line = request.env['is.tableau.de.bord.line'].browse(int(line_id))
-                if line and line.exists() and line.field_ids:
-                    # Récupérer uniquement les champs visibles
-                    visible_fields = line.field_ids.filtered(lambda f: f.visible).sorted('sequence')
-                    
-                    # Récupérer les champs avec ordre de tri (sort_order > 0)
-                    sort_fields = line.field_ids.filtered(lambda f: f.sort_order > 0).sorted('sort_order')
-                    
-                    if sort_fields:
-                        # Construire la chaîne de tri : "field1 asc, field2 desc, ..."
-                        order_parts = []
-                        for field_config in sort_fields:
-                            field_name = field_config.field_name
-                            direction = field_config.sort_direction or 'asc'
-                            if field_name and field_name in model._fields:
-                                order_parts.append(f"{field_name} {direction}")
-                        if order_parts:
-                            order_string = ', '.join(order_parts)
-                    
-                    # Maintenant field_name contient le nom technique et field_label le libellé
-                    for field_config in visible_fields:
-                        field_name = field_config.field_name
-                        field_label = field_config.field_label or field_name
-                        
-                        # Vérifier que le champ existe dans le modèle
-                        if field_name and field_name in model._fields:
-                            explicit_fields.append(field_name)
-                            field_labels[field_name] = field_label
-                    
-            except Exception:
-                pass
-        
-        # 2) Champs explicitement définis dans le favori (list_fields)
-        if not explicit_fields and context.get('list_fields'):
-            lf = context.get('list_fields')
-            if isinstance(lf, str):
-                # accepter "a,b,c"
-                explicit_fields = [f.strip() for f in lf.split(',') if f.strip()]
-            elif isinstance(lf, (list, tuple)):
-                explicit_fields = [str(f).strip() for f in lf if str(f).strip()]
-            # ne garder que les champs existants
-            explicit_fields = [f for f in explicit_fields if f in model._fields]
-            if explicit_fields:
-                fields_def = model.fields_get(explicit_fields)
-                field_labels = {f: fields_def.get(f, {}).get('string', f) for f in explicit_fields}
-
-        view_id = None
-        xmlid = context.get('tree_view_ref') or context.get('list_view_ref')
-        if xmlid:
-            try:
-                view_id = request.env.ref(xmlid).id
-            except Exception:
-                view_id = None
-
-        if explicit_fields:
-            # libellés depuis fields_get
-            if not field_labels:
-                fields_def = model.fields_get(explicit_fields)
-                field_labels = {f: fields_def.get(f, {}).get('string', f) for f in explicit_fields}
-            fields_to_display = explicit_fields
-        else:
-            fields_to_display, field_labels = self._get_fields_from_view(model, 'list', view_id=view_id)
-
-        # Récupérer les métadonnées complètes des champs pour le formatage
-        fields_def = model.fields_get(fields_to_display)
+        fields_to_display, field_labels, fields_def, order_string = self._list_columns(model, context)
         
         # Si regroupement défini, utiliser read_group au lieu de search/read
         if list_groupby:
@@ -632,22 +1664,103 @@ class TableauDeBordController(http.Controller):
                     meta['digits'] = 2  # Par défaut 2 décimales
             fields_meta.append(meta)
 
-        result = {
-            'type': 'list',
-            'data': data,
-            'fields': fields_meta,
-            'model': filter_obj.model_id,
-        }
-        
-        # Ajouter le compteur seulement si show_record_count est True
-        if show_record_count:
-            result['count'] = model.search_count(domain)
-            result['show_record_count'] = True
+        result = {
+            'type': 'list',
+            'data': data,
+            'fields': fields_meta,
+            'model': filter_obj.model_id,
+        }
+        
+        # Ajouter le compteur seulement si show_record_count est True
+        if show_record_count:
+            result['count'] = model.search_count(domain)
+            result['show_record_count'] = True
+        else:
+            result['show_record_count'] = False
+        
+        return result
+    
+    def _list_columns(self, model, context):
+        """Colonnes et tri d'une vue liste : champs de la ligne, du favori ou de la vue liste
+
+        Returns:
+            (champs affichés, libellés, définitions des champs, chaîne de tri ou None)
+        """
+        # 1) Priorité 1: Champs configurés dans la ligne du tableau de bord (field_ids)
+        line_id = context.get('line_id')
+        explicit_fields = []
+        field_labels = {}
+        order_string = None  # Chaîne de tri pour search()
+        
+        if line_id:
+            try:
+                line = model.env['is.tableau.de.bord.line'].browse(int(line_id))
+                if line and line.exists() and line.field_ids:
+                    # Récupérer uniquement les champs visibles
+                    visible_fields = line.field_ids.filtered(lambda f: f.visible).sorted('sequence')
+                    
+                    # Récupérer les champs avec ordre de tri (sort_order > 0)
+                    sort_fields = line.field_ids.filtered(lambda f: f.sort_order > 0).sorted('sort_order')
+                    
+                    if sort_fields:
+                        # Construire la chaîne de tri : "field1 asc, field2 desc, ..."
+                        order_parts = []
+                        for field_config in sort_fields:
+                            field_name = field_config.field_name
+                            direction = field_config.sort_direction or 'asc'
+                            if field_name and field_name in model._fields:
+                                order_parts.append(f"{field_name} {direction}")
+                        if order_parts:
+                            order_string = ', '.join(order_parts)
+                    
+                    # Maintenant field_name contient le nom technique et field_label le libellé
+                    for field_config in visible_fields:
+                        field_name = field_config.field_name
+                        field_label = field_config.field_label or field_name
+                        
+                        # Vérifier que le champ existe dans le modèle
+                        if field_name and field_name in model._fields:
+                            explicit_fields.append(field_name)
+                            field_labels[field_name] = field_label
+                    
+            except Exception:
+                pass
+        
+        # 2) Champs explicitement définis dans le favori (list_fields)
+        if not explicit_fields and context.get('list_fields'):
+            lf = context.get('list_fields')
+            if isinstance(lf, str):
+                # accepter "a,b,c"
+                explicit_fields = [f.strip() for f in lf.split(',') if f.strip()]
+            elif isinstance(lf, (list, tuple)):
+                explicit_fields = [str(f).strip() for f in lf if str(f).strip()]
+            # ne garder que les champs existants
+            explicit_fields = [f for f in explicit_fields if f in model._fields]
+            if explicit_fields:
+                fields_def = model.fields_get(explicit_fields)
+                field_labels = {f: fields_def.get(f, {}).get('string', f) for f in explicit_fields}
+
+        view_id = None
+        xmlid = context.get('tree_view_ref') or context.get('list_view_ref')
+        if xmlid:
+            try:
+                view_id = model.env.ref(xmlid).id
+            except Exception:
+                view_id = None
+
+        if explicit_fields:
+            # libellés depuis fields_get
+            if not field_labels:
+                fields_def = model.fields_get(explicit_fields)
+                field_labels = {f: fields_def.get(f, {}).get('string', f) for f in explicit_fields}
+            fields_to_display = explicit_fields
         else:
-            result['show_record_count'] = False
-        
-        return result
-    
+            fields_to_display, field_labels = self._get_fields_from_view(model, 'list', view_id=view_id)
+
+        # Récupérer les métadonnées complètes des champs pour le formatage
+        fields_def = model.fields_get(fields_to_display)
+        return fields_to_display, field_labels, fields_def, order_string
+
     def _get_grouped_list_data(self, model, filter_obj, domain, context, line,
                                 list_groupby, fields_to_display, field_labels, fields_def,
                                 order_string, limit, show_record_count):
@@ -734,6 +1847,8 @@ class TableauDeBordController(http.Controller):
                     groupby=[first_gb],
                     lazy=False
                 )
+            except QueryCanceled:
+                raise
             except Exception as e:
                 level1_results = []
             
@@ -745,6 +1860,8 @@ class TableauDeBordController(http.Controller):
                     groupby=list_groupby,
                     lazy=False
                 )
+            except QueryCanceled:
+                raise
             except Exception as e:
                 level2_results = []
             
@@ -878,6 +1995,8 @@ class TableauDeBordController(http.Controller):
                     groupby=list_groupby,
                     lazy=False
                 )
+            except QueryCanceled:
+                raise
             except Exception:
                 results = []
             
@@ -996,27 +2115,25 @@ class TableauDeBordController(http.Controller):
         return result
 
     def _get_graph_data(self, model, filter_obj, domain, context, line=None):
-        """Génère les données pour un graphique simple"""
+        """Génère les données pour un graphique simple
+
+        En comparaison de périodes, renvoie deux séries appariées (période courante et
+        période de comparaison) calculées en un seul parcours, avec l'écart en pourcentage.
+        """
         # Déterminer la limite et le tri (depuis line ou contexte)
         limit = None
         sort_by = context.get('pivot_sort_by', 'row')  # Par défaut tri par libellé
         sort_order = context.get('pivot_sort_order', 'asc')
         
-        if line and hasattr(line, 'limit') and line.limit > 0:
+        if line and hasattr(line, 'limit') and line.limit > 0 and not context.get('tdb_export'):
             limit = line.limit
         if line and hasattr(line, 'pivot_sort_by') and line.pivot_sort_by:
             sort_by = line.pivot_sort_by  # 'row' = tri par libellé, 'total' = tri par valeur
         if line and hasattr(line, 'pivot_sort_order') and line.pivot_sort_order:
             sort_order = line.pivot_sort_order
         
-        groupbys = context.get('graph_groupbys') or context.get('group_by') or []
-        
-        if isinstance(groupbys, str):
-            # Si c'est une chaîne séparée par des virgules, on split
-            if ',' in groupbys:
-                groupbys = [g.strip() for g in groupbys.split(',')]
-            else:
-                groupbys = [groupbys]
+        groupbys = self._split_specs(context.get('graph_groupbys') or context.get('group_by'))
+        groupbys = [self._normalize_groupby(model, gb) for gb in groupbys if gb.split(':')[0] in model._fields]
         
         measure = context.get('graph_measure') or context.get('measure')
         aggregator = context.get('graph_aggregator') or 'sum'
@@ -1024,77 +2141,99 @@ class TableauDeBordController(http.Controller):
         show_legend = context.get('graph_show_legend', True)
         show_data_title = context.get('show_data_title', True)
 
-        agg_label = "Nombre d'enregistrements"
-        use_count = not measure or str(measure) in ('count', '__count')
-        fields = [] if use_count else [f"{measure}:{aggregator}"]
-        
-        if not use_count:
-            # Traduire l'agrégateur
-            agg_translations = {
-                'sum': 'Somme',
-                'avg': 'Moyenne',
-                'max': 'Maximum',
-                'min': 'Minimum',
-                'count': 'Nombre',
+        fname, aggregator = self._parse_measure(model, measure, aggregator)
+        if fname == '__count':
+            agg_label = "Nombre d'enregistrements"
+        else:
+            agg_label = self._measure_label(model, fname, aggregator, with_aggregator=True)
+
+        period = self._get_period_config(model, line)
+        compare = bool(period and period['compare'])
+
+        # Série cumulée ou moyenne mobile : fenêtre SQL ordonnée par le premier groupement date
+        window = None
+        series_mode = context.get('graph_series_mode') or 'none'
+        if series_mode in ('cumulative', 'moving_average') and groupbys:
+            date_indexes = [
+                i for i, gb in enumerate(groupbys)
+                if model._fields[gb.split(':')[0]].type in ('date', 'datetime')
+            ]
+            window = {
+                'mode': series_mode,
+                'periods': int(context.get('graph_moving_periods') or 3),
+                'order': date_indexes[0] if date_indexes else 0,
+                # Granularité de la série date (mois par défaut, comme read_group)
+                'granularity': (groupbys[date_indexes[0]].partition(':')[2] or 'month') if date_indexes else None,
             }
-            agg_french = agg_translations.get(aggregator, aggregator)
-            
-            # Récupérer le nom traduit du champ
-            measure_field_name = measure
-            try:
-                field_info = model.fields_get([measure])
-                measure_field_name = field_info.get(measure, {}).get('string', measure)
-            except Exception:
-                pass
-            
-            agg_label = f"{agg_french} de {measure_field_name}"
+            if series_mode == 'cumulative':
+                agg_label = f"{agg_label} (cumul)"
+            else:
+                agg_label = f"{agg_label} (moyenne mobile {window['periods']})"
 
+        info = {}
         try:
-            # NE PAS appliquer limit dans read_group (on le fera après le tri)
-            results = model.read_group(domain, fields=fields, groupby=groupbys, lazy=False)
+            # NE PAS appliquer limit dans la requête (on le fera après le tri)
+            results = self._read_grouped(
+                model, domain, groupbys, [(fname, aggregator)], period, window=window, line=line, info=info,
+            )
+        except QueryCanceled:
+            raise
         except Exception:
+            _logger.exception("Erreur lors du calcul du graphique")
             results = []
 
+        # Valeurs par clé de groupement : [période courante, période de comparaison]
+        ng = len(groupbys)
+        points = {}
+        for r in results:
+            key = tuple(r[:ng])
+            if not compare:
+                points[key] = [r[ng] or 0, 0]
+                continue
+            in_current, in_compare = r[ng + 2], r[ng + 3]
+            if in_current:
+                points.setdefault(key, [0, 0])[0] = r[ng] or 0
+            if in_compare:
+                points.setdefault(self._shift_group_key(groupbys, key, period), [0, 0])[1] = r[ng + 1] or 0
+
         # Construire les labels et valeurs
+        labels_by_gb = [
+            self._format_group_values(model, gb, [key[i] for key in points])
+            for i, gb in enumerate(groupbys)
+        ]
         data_list = []
-        if results:
-            for r in results:
-                label_parts = []
-                for gb in groupbys:
-                    base = gb.split(':')[0]
-                    val = r.get(gb) or r.get(base) or r.get(f"{gb}_name") or r.get(f"{base}_name")
-                    # Pour les many2one (tuple/list), prendre le display_name (2ème élément)
-                    if isinstance(val, (list, tuple)) and len(val) > 1:
-                        label_parts.append(str(val[1]) if val[1] is not None else '')
-                    elif val is not None:
-                        label_parts.append(str(val))
-                    else:
-                        label_parts.append('')
-                label = " / ".join([p for p in label_parts if p])
-                
-                if use_count:
-                    value = r.get("__count") or 0
-                else:
-                    value = r.get(f"{measure}_{aggregator}") or r.get(measure) or 0
-                
-                data_list.append({'label': label, 'value': value})
-        else:
-            total_count = model.search_count(domain)
-            data_list = [{'label': 'Total', 'value': total_count}]
+        for key, (value, previous) in points.items():
+            data_list.append({
+                'label': " / ".join(labels_by_gb[i][v][0] for i, v in enumerate(key)) or 'Total',
+                'sort': tuple(labels_by_gb[i][v][1] for i, v in enumerate(key)),
+                'value': value,
+                'compare': previous,
+            })
+        if not data_list:
+            data_list = [{'label': 'Total', 'sort': (), 'value': 0, 'compare': 0}]
 
         # Appliquer le tri et la limite
+        reverse = (sort_order == 'desc')
         if sort_by == 'total':
             # Tri par valeur
-            reverse = (sort_order == 'desc')
             data_list.sort(key=lambda x: x['value'], reverse=reverse)
         else:
-            # Tri par libellé (smart key)
-            reverse = (sort_order == 'desc')
-            data_list.sort(key=lambda x: self._sort_key_smart(x['label']), reverse=reverse)
+            # Tri par libellé (clé de tri du groupement : chronologique pour les dates)
+            data_list.sort(key=lambda x: x['sort'], reverse=reverse)
         
         # Appliquer la limite après le tri
         if limit and limit > 0:
             data_list = data_list[:limit]
+
+        # Courbe chronologique plus dense que la largeur du graphique : simplification LTTB
+        downsampled = None
+        max_points = self._graph_max_points(context.get('graph_max_points'))
+        if (chart_type == 'line' and max_points and len(data_list) > max_points
+                and len(groupbys) == 1 and sort_by != 'total'
+                and model._fields[groupbys[0].split(':')[0]].type in ('date', 'datetime')):
+            keep = self._lttb_indices([item['value'] for item in data_list], max_points)
+            downsampled = {'points': len(keep), 'total': len(data_list)}
+            data_list = [data_list[i] for i in keep]
         
         # Extraire les labels et valeurs triés/limités
         labels = [item['label'] for item in data_list]
@@ -1104,6 +2243,21 @@ class TableauDeBordController(http.Controller):
         palette = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd', '#8c564b', '#e377c2', '#7f7f7f', '#bcbd22', '#17becf']
         bg = [palette[i % len(palette)] for i in range(len(values))]
 
+        datasets = [{
+            'label': agg_label,
+            'data': values,
+            'backgroundColor': bg
+        }]
+        if compare:
+            datasets[0]['label'] = f"{agg_label} ({period['label']})"
+            datasets[0]['backgroundColor'] = palette[0]
+            datasets.append({
+                'label': f"{agg_label} ({period['compare_label']})",
+                'data': [item['compare'] for item in data_list],
+                'backgroundColor': '#aec7e8',
+                'delta_percent': [self._delta_percent(item['value'], item['compare']) for item in data_list],
+            })
+
         result = {
             'type': 'graph',
             'chart_type': chart_type,
@@ -1111,16 +2265,241 @@ class TableauDeBordController(http.Controller):
             'show_data_title': show_data_title,
             'data': {
                 'labels': labels,
-                'datasets': [{
-                    'label': agg_label,
-                    'data': values,
-                    'backgroundColor': bg
-                }]
+                'datasets': datasets,
             }
         }
+        if downsampled:
+            result['downsampled'] = downsampled
+        elif not compare and not window:
+            cube = self._build_cube(
+                model, groupbys, [(fname, aggregator)],
+                [(key, [value]) for key, (value, _previous) in points.items()],
+                labels_by_gb, line, [agg_label],
+            )
+            if cube:
+                cube.update({'sort_by': sort_by, 'sort_order': sort_order, 'limit': limit or 0})
+                result['cube'] = cube
+        if info.get('snapshot_date'):
+            result['snapshot_date'] = info['snapshot_date']
+        if info.get('sample'):
+            result['sample'] = info['sample']
+        result['_perf'] = {'rows': len(results), 'source': info.get('source', 'live')}
+        if info.get('rollup_id'):
+            result['_perf']['rollup_id'] = info['rollup_id']
+        if 'explain' in info:
+            result['_perf']['explain'] = info['explain']
         
         return result
 
+    def _graph_max_points(self, value):
+        """Nombre maximum de points d'une courbe, 0 pour la pleine résolution
+
+        La largeur en pixels envoyée par le client est arrondie à la puissance de 2
+        supérieure : quelques variantes seulement dans le cache du serveur.
+        """
+        if value in (None, '', False):
+            return GRAPH_MAX_POINTS
+        try:
+            value = int(value)
+        except (TypeError, ValueError):
+            return GRAPH_MAX_POINTS
+        if value <= 0:
+            return 0
+        return max(GRAPH_MIN_POINTS, 1 << (value - 1).bit_length())
+
+    def _lttb_indices(self, values, threshold):
+        """Indices conservés par Largest-Triangle-Three-Buckets
+
+        Le premier et le dernier point sont gardés ; les autres sont répartis en
+        threshold - 2 paquets dont on retient le point formant le plus grand triangle
+        avec le point retenu précédent et la moyenne du paquet suivant. Les abscisses
+        sont les rangs (périodes régulières d'un groupement date).
+        """
+        n = len(values)
+        if threshold >= n or threshold < 3:
+            return list(range(n))
+        values = [value or 0 for value in values]
+        every = (n - 2) / (threshold - 2)
+        keep = [0]
+        a = 0
+        for i in range(threshold - 2):
+            avg_start = int((i + 1) * every) + 1
+            avg_end = min(int((i + 2) * every) + 1, n)
+            avg_x = (avg_start + avg_end - 1) / 2
+            avg_y = sum(values[avg_start:avg_end]) / (avg_end - avg_start)
+            best, best_area = None, -1
+            for j in range(int(i * every) + 1, int((i + 1) * every) + 1):
+                area = abs((a - avg_x) * (values[j] - values[a]) - (a - j) * (avg_y - values[a]))
+                if area > best_area:
+                    best, best_area = j, area
+            keep.append(best)
+            a = best
+        keep.append(n - 1)
+        return keep
+
+    def _period_start(self, period, day):
+        """Premier jour de la période (jour, semaine, mois, trimestre, année) contenant day"""
+        if period == 'week':
+            return day - timedelta(days=day.weekday())
+        if period == 'month':
+            return day.replace(day=1)
+        if period == 'quarter':
+            return day.replace(month=3 * ((day.month - 1) // 3) + 1, day=1)
+        if period == 'year':
+            return day.replace(month=1, day=1)
+        return day
+
+    def _date_bound(self, model, date_field, day):
+        """Valeur de borne SQL pour un jour : date, ou datetime UTC minuit (fuseau de l'utilisateur)"""
+        if model._fields[date_field].type == 'datetime':
+            tz = pytz.timezone(model.env.context.get('tz') or model.env.user.tz or 'UTC')
+            local = tz.localize(datetime.combine(day, datetime.min.time()))
+            return local.astimezone(pytz.utc).replace(tzinfo=None)
+        return day
+
+    def _period_filter_sql(self, model, date_field, query, start, end):
+        """Condition SQL start <= champ date < end"""
+        date_sql = model._field_to_sql(query.table, date_field, query)
+        return SQL(
+            "(%s >= %s AND %s < %s)",
+            date_sql, self._date_bound(model, date_field, start),
+            date_sql, self._date_bound(model, date_field, end),
+        )
+
+    def _get_period_config(self, model, line):
+        """Période courante et période de comparaison d'une ligne
+
+        Returns:
+            None si la ligne n'a pas de champ date ou de période, sinon un dict avec
+            date_field, period, current (début, fin exclue), compare (idem ou None),
+            shift (décalage de la comparaison) et les libellés des deux périodes
+        """
+        if not line or not line.date_field or not line.period_type or line.period_type == 'none':
+            return None
+        field = model._fields.get(line.date_field)
+        if not field or field.type not in ('date', 'datetime'):
+            return None
+
+        period = line.period_type
+        step = PERIOD_STEPS[period]
+        start = self._period_start(period, fields.Date.context_today(model))
+        config = {
+            'date_field': line.date_field,
+            'period': period,
+            'current': (start, start + step),
+            'label': dict(line._fields['period_type'].selection)[period],
+            'compare': None,
+            'compare_label': None,
+            'shift': None,
+        }
+
+        shift = None
+        compare_label = dict(line._fields['compare_mode'].selection).get(line.compare_mode)
+        if line.compare_mode == 'previous_period':
+            shift = step
+        elif line.compare_mode == 'previous_year':
+            shift = relativedelta(years=1)
+        elif line.compare_mode == 'custom' and line.compare_offset > 0 and line.compare_offset_unit:
+            shift = PERIOD_STEPS[line.compare_offset_unit] * line.compare_offset
+            unit_label = dict(line._fields['compare_offset_unit'].selection)[line.compare_offset_unit]
+            compare_label = f"{line.compare_offset} {unit_label.lower()} avant"
+        if shift:
+            config.update({
+                'compare': (start - shift, start + step - shift),
+                'compare_label': compare_label,
+                'shift': shift,
+            })
+        return config
+
+    def _shift_group_key(self, groupbys, key, period):
+        """Ramène une clé de groupement de la période de comparaison sur la période courante
+
+        Seuls les groupements temporels du champ date de la période sont décalés ; la
+        date décalée est recalée sur le début de son intervalle (ex: lundi pour :week).
+        """
+        shifted = list(key)
+        for i, gb in enumerate(groupbys[:len(key)]):
+            fname, _sep, granularity = gb.partition(':')
+            if fname == period['date_field'] and granularity in PERIOD_STEPS and shifted[i]:
+                shifted[i] = self._period_start(granularity, shifted[i] + period['shift'])
+        return tuple(shifted)
+
+    def _delta_percent(self, value, previous):
+        """Écart en pourcentage entre deux valeurs (None si la référence est nulle)"""
+        if not previous:
+            return None
+        return (value - previous) / abs(previous) * 100
+
+    def _get_kpi_data(self, model, filter_obj, domain, context, line=None):
+        """Génère les données d'un indicateur (KPI) : une valeur, une comparaison et une mini-courbe
+
+        Tout est calculé en une seule requête : la valeur de la période courante, celle
+        de la période de comparaison et chaque point de la courbe sont des agrégats
+        conditionnels (FILTER) sur la réunion des plages de dates.
+        """
+        show_data_title = context.get('show_data_title', True)
+        measure = context.get('graph_measure') or context.get('measure')
+        aggregator = context.get('graph_aggregator') or 'sum'
+        fname, aggregator = self._parse_measure(model, measure, aggregator)
+        period = self._get_period_config(model, line)
+        points = max(line.kpi_sparkline_points or 0, 0) if line else 0
+
+        model.check_access('read')
+        query = model._search(domain)
+        agg_sql = self._aggregate_sql(model, fname, aggregator, query)
+
+        columns = [agg_sql]
+        buckets = []
+        if period:
+            step = PERIOD_STEPS[period['period']]
+            current_start = period['current'][0]
+            ranges = [period['current']]
+            if period['compare']:
+                ranges.append(period['compare'])
+            buckets = [(current_start - step * i, current_start - step * (i - 1)) for i in range(points - 1, -1, -1)]
+            ranges.extend(buckets)
+
+            # Restreindre le parcours à la réunion des plages de dates
+            date_field = period['date_field']
+            query.add_where(self._period_filter_sql(
+                model, date_field, query, min(r[0] for r in ranges), max(r[1] for r in ranges)
+            ))
+            columns = [SQL("%s FILTER (WHERE %s)", agg_sql, self._period_filter_sql(model, date_field, query, *r)) for r in ranges]
+
+        try:
+            model.env.cr.execute(query.select(*columns))
+            values = [v or 0 for v in model.env.cr.fetchone()]
+        except QueryCanceled:
+            raise
+        except Exception:
+            _logger.exception("Erreur lors du calcul de l'indicateur")
+            values = [0] * len(columns)
+
+        result = {
+            'type': 'kpi',
+            'value': values[0],
+            'label': self._measure_label(model, fname, aggregator, with_aggregator=fname != '__count'),
+            'period_label': period['label'] if period else '',
+            'digits': 2 if aggregator == 'avg' or aggregator in PERCENTILE_AGGREGATORS else 0,
+            'show_data_title': show_data_title,
+        }
+        if period and period['compare']:
+            result['compare'] = {
+                'value': values[1],
+                'label': period['compare_label'],
+                'delta_percent': self._delta_percent(values[0], values[1]),
+            }
+        if buckets:
+            locale = get_lang(model.env).code
+            result['sparkline'] = {
+                'labels': [
+                    babel.dates.format_date(start, format=READ_GROUP_DISPLAY_FORMAT[period['period']], locale=locale)
+                    for start, _end in buckets
+                ],
+                'values': values[-len(buckets):],
+            }
+        return result
+
     def _get_selection_map(self, model, field_name):
         """Récupère le mapping pour un champ Selection"""
         try:
@@ -1132,27 +2511,6 @@ class TableauDeBordController(http.Controller):
             pass
         return {}
 
-    def _extract_label_from_record(self, record, groupby, selection_map=None):
-        """Extrait le libellé d'un enregistrement read_group pour un groupby donné"""
-        full = (groupby or '')
-        base = full.split(':')[0]
-        # Tenter d'abord la clé complète (utile pour date groupby: field:year)
-        val = record.get(full) or record.get(base)
-        
-        # Pour les many2one, prendre le display_name
-        if isinstance(val, (list, tuple)) and len(val) > 1:
-            return val[1]  # [id, display_name]
-        
-        # Pour les Selection, chercher le libellé
-        if selection_map and val in selection_map:
-            return selection_map[val]
-        
-        # Pour les dates avec groupement temporel
-        if record.get(f"{base}") and ':' in full:
-            return str(val) if val else 'Indéfini'
-        
-        return str(val) if val is not None else 'Indéfini'
-
     def _sort_key_smart(self, label):
         """Génère une clé de tri intelligente (numérique si possible, sinon alphabétique)"""
         if label is None:
@@ -1203,234 +2561,616 @@ class TableauDeBordController(http.Controller):
             # Si ce n'est pas un nombre, tri alphabétique insensible à la casse
             return (2, label_str.lower())
 
-    def _sort_and_limit_rows(self, rows, context, limit, is_2d=False):
-        """Trie et limite les lignes selon les paramètres du contexte
-        
-        Args:
-            rows: Liste de dict avec clé 'row' (et 'value' pour 1D ou 'values' pour 2D)
-            context: Contexte contenant pivot_sort_by et pivot_sort_order
-            limit: Nombre max de lignes à retourner (None = pas de limite)
-            is_2d: True pour pivot 2D (avec 'values'), False pour 1D (avec 'value')
-        
+    def _split_specs(self, value):
+        """Normalise une liste de groupements/mesures (chaîne 'a,b' ou liste) en liste de chaînes"""
+        if not value:
+            return []
+        if isinstance(value, str):
+            value = value.split(',')
+        return [str(v).strip() for v in value if v and str(v).strip()]
+
+    def _normalize_groupby(self, model, groupby):
+        """Ajoute la granularité par défaut (mois) aux groupements date/datetime, comme read_group"""
+        fname, _sep, granularity = groupby.partition(':')
+        field = model._fields.get(fname)
+        if field and field.type in ('date', 'datetime') and not granularity:
+            return f"{fname}:month"
+        return groupby
+
+    def _parse_measure(self, model, measure, default_aggregator='sum'):
+        """Retourne (champ, agrégateur) pour une mesure 'champ' ou 'champ:agrégateur'"""
+        fname, _sep, aggregator = str(measure).partition(':')
+        if not fname or fname in ('count', '__count') or fname not in model._fields:
+            return ('__count', 'count')
+        return (fname, aggregator or default_aggregator)
+
+    def _measure_label(self, model, fname, aggregator, with_aggregator=False):
+        """Libellé d'une mesure (libellé du champ, préfixé de l'agrégateur si demandé)"""
+        if fname == '__count':
+            return "Nombre"
+        label = model._fields[fname].get_description(model.env).get('string', fname)
+        if with_aggregator:
+            return f"{AGGREGATOR_LABELS.get(aggregator, aggregator)} de {label}"
+        return label
+
+    def _groupby_label(self, model, groupby):
+        """Libellé du champ d'un groupement"""
+        fname = groupby.split(':')[0]
+        field = model._fields.get(fname)
+        if not field:
+            return fname
+        return field.get_description(model.env).get('string', fname)
+
+    def _aggregate_sql(self, model, fname, aggregator, query):
+        """Expression SQL d'agrégation d'une mesure
+
+        Les centiles (médiane, p90, p95) sont calculés par percentile_cont dans la
+        requête groupée : seules les valeurs agrégées sortent de la base.
+        """
+        if fname == '__count':
+            return model._read_group_select('__count', query)
+        if aggregator in PERCENTILE_AGGREGATORS:
+            field = model._fields[fname]
+            if field.type not in ('integer', 'float', 'monetary'):
+                raise ValueError(f"Le centile n'est disponible que pour un champ numérique ({fname})")
+            return SQL(
+                "percentile_cont(%s) WITHIN GROUP (ORDER BY %s)",
+                PERCENTILE_AGGREGATORS[aggregator], model._field_to_sql(query.table, fname, query),
+            )
+        return model._read_group_select(f"{fname}:{aggregator}", query)
+
+    def _format_group_values(self, model, groupby, raw_values):
+        """Convertit les valeurs brutes d'un groupement SQL en {valeur: (libellé, clé de tri)}
+
+        Les valeurs sont post-traitées comme dans read_group (enregistrements pour
+        les many2one, dates pour les groupements temporels), puis formatées.
+        """
+        distinct = list(dict.fromkeys(raw_values))
+        fname, _sep, granularity = groupby.partition(':')
+        selection_map = self._get_selection_map(model, fname)
+        locale = get_lang(model.env).code
+        values = list(model._read_group_postprocess_groupby(groupby, distinct))
+
+        result = {}
+        for raw, value in zip(distinct, values):
+            if isinstance(value, BaseModel):
+                label = value.sudo().display_name if value else None
+            elif isinstance(value, date) and granularity in READ_GROUP_DISPLAY_FORMAT:
+                label = babel.dates.format_date(value, format=READ_GROUP_DISPLAY_FORMAT[granularity], locale=locale)
+            elif selection_map and value in selection_map:
+                label = selection_map[value]
+            elif value is None or value is False:
+                label = None
+            else:
+                label = str(value)
+
+            if raw is None:
+                sort_key = (3,)
+            elif isinstance(raw, (int, float, date)) and not isinstance(raw, bool) and not isinstance(value, BaseModel):
+                sort_key = (1, raw)
+            else:
+                sort_key = (2, self._sort_key_smart(label))
+            result[raw] = (label or 'Indéfini', sort_key)
+        return result
+
+    def _read_grouped(self, model, domain, groupbys, measures, period=None, pivot_rows=None, window=None,
+                      line=None, info=None):
+        """Exécute une agrégation groupée en une seule requête SQL
+
+        La requête est construite sur _search() : les règles d'accès s'appliquent
+        comme pour read_group. Avec une période, le parcours est restreint à la
+        période courante ; avec une comparaison, à la réunion des deux périodes, et
+        chaque mesure est calculée deux fois par agrégat conditionnel (FILTER).
+
+        Pour un tableau croisé (pivot_rows = nombre de groupements de lignes), les
+        sous-totaux de lignes proviennent de ROLLUP et les totaux de colonnes d'un
+        GROUPING SETS (colonnes, ()), avec le masque GROUPING() en colonne.
+
+        Pour un graphique, window = {'mode': 'cumulative' | 'moving_average',
+        'periods': N, 'order': index du groupement ordonnant la série} remplace
+        chaque agrégat par son cumul ou sa moyenne mobile, calculés par une fonction
+        de fenêtre sur les autres groupements (et sur chaque période comparée).
+
+        Si la ligne est servie par un instantané matérialisé, le résultat est lu dans
+        la vue et info['snapshot_date'] indique la date des données. Agrégats
+        pré-calculés et échantillonnage ne s'appliquent pas à ces lignes.
+
+        Si un agrégat journalier pré-calculé (is.tableau.de.bord.rollup) couvre les
+        groupements, mesures et filtres, la requête porte sur sa table.
+
+        Si la ligne est en échantillonnage et que le domaine est peu sélectif, la table
+        est lue par TABLESAMPLE SYSTEM ; sommes et nombres sont extrapolés et
+        info['sample'] décrit l'échantillon (voir _sampling_plan).
+
+        En contexte tdb_explain (estimation du coût d'une ligne), la requête n'est pas
+        exécutée : son plan EXPLAIN (FORMAT JSON) est placé dans info['explain'].
+
         Returns:
-            Liste triée et limitée
+            Liste de tuples (groupements..., [masque GROUPING,] mesures courantes...,
+            [mesures de comparaison..., présence période courante, présence comparaison])
         """
-        sort_by = context.get('pivot_sort_by', 'row')
-        sort_order = context.get('pivot_sort_order', 'asc')
-        reverse = (sort_order == 'desc')
-        
-        if sort_by == 'total':
-            # Trier par le total
-            if is_2d:
-                rows.sort(key=lambda r: sum(r['values']), reverse=reverse)
+        model.check_access('read')
+        # Ligne sur instantané : toujours la requête directe, pour que sa forme (et l'empreinte
+        # comparée par _read_snapshot) ne dépende ni d'un agrégat ni d'un échantillon
+        snapshot = bool(line and line.data_source == 'snapshot')
+        rollup = model.env['is.tableau.de.bord.rollup']
+        if not window and not snapshot:
+            rollup = rollup._find_rollup(
+                model, domain, groupbys, measures, extra_fields=[period['date_field']] if period else [],
+            )
+        if rollup:
+            # Agrégats journaliers pré-calculés : mêmes expressions SQL, table plus petite
+            query = rollup._rollup_query(model, domain)
+            agg_sql = [rollup._rollup_aggregate_sql(query, fname, agg) for fname, agg in measures]
+            if info is not None:
+                info['source'] = f"rollup:{rollup.name}"
+                info['rollup_id'] = rollup.id
+        else:
+            query = model._search(domain)
+            agg_sql = [self._aggregate_sql(model, fname, agg, query) for fname, agg in measures]
+        group_sql = [model._read_group_groupby(query.table, gb, query) for gb in groupbys]
+
+        current = previous = None
+        if period:
+            current = self._period_filter_sql(model, period['date_field'], query, *period['current'])
+            if period['compare']:
+                previous = self._period_filter_sql(model, period['date_field'], query, *period['compare'])
+                query.add_where(SQL("(%s OR %s)", current, previous))
             else:
-                rows.sort(key=lambda r: r['value'], reverse=reverse)
+                query.add_where(current)
+
+        sample = None if rollup or snapshot else self._sampling_plan(model, query, measures, line)
+        if sample and info is not None:
+            info['sample'] = sample
+            info['source'] = f"sample:{sample['percent']}%"
+        factor = 100.0 / sample['percent'] if sample else None
+
+        flags = []
+        if previous is not None:
+            flags = [SQL("BOOL_OR(%s)", current), SQL("BOOL_OR(%s)", previous)]
+            agg_sql = [
+                self._window_sql(
+                    self._scale_sql(SQL("%s FILTER (WHERE %s)", agg, cond), aggregator, factor),
+                    group_sql, window, flag,
+                )
+                for cond, flag in zip((current, previous), flags)
+                for (_fname, aggregator), agg in zip(measures, agg_sql)
+            ]
         else:
-            # Trier par le libellé de la ligne
-            rows.sort(key=lambda r: self._sort_key_smart(r['row']), reverse=reverse)
-        
-        # Appliquer la limite après le tri
-        if limit and limit > 0:
-            rows = rows[:limit]
-        
-        return rows
+            agg_sql = [
+                self._window_sql(self._scale_sql(agg, aggregator, factor), group_sql, window)
+                for (_fname, aggregator), agg in zip(measures, agg_sql)
+            ]
+
+        select = list(group_sql)
+        if pivot_rows is not None:
+            row_sql, col_sql = group_sql[:pivot_rows], group_sql[pivot_rows:]
+            if group_sql:
+                select.append(SQL("GROUPING(%s)", SQL(", ").join(group_sql)))
+                grouping_sets = []
+                if row_sql:
+                    grouping_sets.append(SQL("ROLLUP(%s)", SQL(", ").join(row_sql)))
+                if col_sql:
+                    grouping_sets.append(SQL("GROUPING SETS ((%s), ())", SQL(", ").join(col_sql)))
+                query.groupby = SQL(", ").join(grouping_sets)
+            else:
+                select.append(SQL("0"))
+        elif group_sql:
+            query.groupby = SQL(", ").join(group_sql)
+        select.extend(agg_sql)
+        select.extend(flags)
+        select = [SQL("%s AS %s", col, SQL.identifier(f"c{i}")) for i, col in enumerate(select)]
+        sql = self._sampled_select(query, select, sample['percent']) if sample else query.select(*select)
+
+        if model.env.context.get('tdb_explain'):
+            model.env.cr.execute(SQL("EXPLAIN (FORMAT JSON) %s", sql))
+            if info is not None:
+                info['explain'] = model.env.cr.fetchone()[0]
+            return []
+        if snapshot:
+            rows = self._read_snapshot(model, line, sql, len(select), info)
+            if rows is not None:
+                return rows
+        model.env.cr.execute(sql)
+        return model.env.cr.fetchall()
+
+    def _sampling_plan(self, model, query, measures, line=None):
+        """Paramètres de l'échantillonnage d'une requête groupée, ou None pour un calcul exact
+
+        Le calcul reste exact si la ligne n'est pas en échantillonnage, si une mesure
+        n'est pas estimable (nombre distinct, minimum, maximum) ou si le domaine est
+        sélectif : d'après le plan EXPLAIN, l'échantillon contiendrait moins de
+        SAMPLING_MIN_ROWS lignes. Il reste exact aussi si la requête comporte des
+        jointures (champs hérités) : seule la table principale peut être échantillonnée
+        (voir _sampled_select). L'erreur indiquée est l'intervalle de confiance à
+        95 % d'un total (1,96 / √n), plus large pour les petits groupes.
+        """
+        if not line or not line.sampling or not line.sampling_percent or line.sampling_percent >= 100:
+            return None
+        if any(aggregator in SAMPLING_EXACT_AGGREGATORS for _fname, aggregator in measures):
+            return None
+        if query.from_clause.code != SQL.identifier(query.table).code:
+            return None
+        cr = model.env.cr
+        cr.execute(SQL("EXPLAIN (FORMAT JSON) %s", query.select(SQL("1"))))
+        matched = cr.fetchone()[0][0]['Plan'].get('Plan Rows', 0)
+        percent = float(line.sampling_percent)
+        sample_rows = matched * percent / 100
+        if sample_rows < SAMPLING_MIN_ROWS:
+            return None
+        return {
+            'percent': percent,
+            'rows': round(sample_rows),
+            'error_percent': round(196 / sample_rows ** 0.5, 1),
+        }
+
+    def _sampled_select(self, query, select, percent):
+        """Requête groupée lue sur un échantillon de la table principale
+
+        Même requête que query.select(*select), la clause FROM étant écrite ici avec
+        TABLESAMPLE SYSTEM : l'alias de la table est conservé, les conditions et les
+        regroupements de la requête s'appliquent tels quels aux lignes échantillonnées.
+        """
+        where = query.where_clause
+        return SQL(
+            "SELECT %s FROM %s TABLESAMPLE SYSTEM (%s)%s%s",
+            SQL(", ").join(select),
+            SQL.identifier(query.table),
+            percent,
+            SQL(" WHERE %s", where) if where.code else SQL(),
+            SQL(" GROUP BY %s", query.groupby) if query.groupby else SQL(),
+        )
+
+    def _scale_sql(self, agg, aggregator, factor):
+        """Extrapole une somme ou un nombre calculé sur un échantillon"""
+        if not factor or aggregator not in SAMPLING_SCALED_AGGREGATORS:
+            return agg
+        if aggregator == 'count':
+            return SQL("ROUND(%s * %s)", agg, factor)
+        return SQL("(%s * %s)", agg, factor)
+
+    def _read_snapshot(self, model, line, sql, ncols, info=None):
+        """Lit le résultat d'une requête agrégée dans l'instantané matérialisé de la ligne
+
+        L'instantané n'est servi que si la requête de l'utilisateur est identique,
+        paramètres compris, à celle qui l'a produit (mêmes règles d'accès, filtres et
+        bornes de période) ; sinon None est retourné et la requête s'exécute en direct.
+        En contexte tdb_snapshot_refresh (tâche planifiée), la vue est d'abord rafraîchie.
+        """
+        cr = model.env.cr
+        query_hash = hashlib.sha1(cr.mogrify(sql.code, sql.params)).hexdigest()
+        snapshot = line.sudo()
+        if model.env.context.get('tdb_snapshot_refresh'):
+            with cr.savepoint():
+                snapshot._refresh_snapshot(sql, query_hash)
+        elif snapshot.snapshot_query_hash != query_hash or not snapshot._snapshot_exists():
+            return None
+
+        columns = SQL(", ").join(SQL.identifier(f"c{i}") for i in range(ncols))
+        cr.execute(SQL("SELECT %s FROM %s", columns, SQL.identifier(snapshot._snapshot_view_name())))
+        if info is not None:
+            info['snapshot_date'] = fields.Datetime.to_string(snapshot.snapshot_date)
+            info['source'] = 'snapshot'
+        return cr.fetchall()
+
+    def _window_sql(self, agg, group_sql, window, partition_flag=None):
+        """Applique une fonction de fenêtre (cumul ou moyenne mobile) à un agrégat groupé
+
+        La série est ordonnée par le groupement window['order'] et découpée par les
+        autres groupements ; partition_flag sépare en plus les deux périodes comparées
+        pour que la période courante ne reprenne pas les valeurs de la comparaison.
+
+        Sur une série date, la moyenne mobile porte sur les N dernières périodes du
+        calendrier (cadre RANGE sur la date de la période) : une période sans données
+        ne fait pas remonter la fenêtre plus loin dans le temps.
+        """
+        if not window or window['order'] is None:
+            return agg
+        order = group_sql[window['order']]
+        partition = [gb for i, gb in enumerate(group_sql) if i != window['order']]
+        if partition_flag is not None:
+            partition.append(partition_flag)
+        partition_sql = SQL("PARTITION BY %s", SQL(", ").join(partition)) if partition else SQL()
+        if window['mode'] == 'moving_average':
+            preceding = max(window['periods'], 1) - 1
+            step = WINDOW_INTERVALS.get(window.get('granularity'))
+            if step:
+                count, unit = step
+                return SQL(
+                    "AVG(%s) OVER (%s ORDER BY %s RANGE BETWEEN CAST(%s AS interval) PRECEDING AND CURRENT ROW)",
+                    agg, partition_sql, order, f"{count * preceding} {unit}",
+                )
+            return SQL(
+                "AVG(%s) OVER (%s ORDER BY %s ROWS BETWEEN %s PRECEDING AND CURRENT ROW)",
+                agg, partition_sql, order, preceding,
+            )
+        return SQL(
+            "SUM(%s) OVER (%s ORDER BY %s ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW)",
+            agg, partition_sql, order,
+        )
 
     def _get_pivot_data(self, model, filter_obj, domain, context, line=None):
-        """Génère les données pour un tableau croisé; support 1D (lignes) et 2D (lignes x colonnes).
-        Utilise les informations du contexte du filtre pour respecter les paramètres de la vue pivot standard."""
-        
-        # Récupérer show_data_title
+        """Génère les données d'un tableau croisé : N niveaux de lignes, N niveaux de colonnes, M mesures.
+
+        Les cellules sont rangées dans une matrice dense (liste plate indexée par
+        ligne, colonne et mesure) ; tous les totaux proviennent de la base. En
+        comparaison de périodes, chaque mesure est suivie de sa valeur sur la période
+        de comparaison et de l'écart en pourcentage.
+        """
         show_data_title = context.get('show_data_title', True)
-        
-        # Déterminer la limite
-        limit = None  # Pas de limite par défaut pour les pivots
-        if line and hasattr(line, 'limit') and line.limit > 0:
+        show_row_totals = context.get('pivot_show_row_totals', True)
+        show_col_totals = context.get('pivot_show_col_totals', True)
+        sort_by = context.get('pivot_sort_by', 'row')
+        reverse = context.get('pivot_sort_order', 'asc') == 'desc'
+
+        # Limite sur le nombre de lignes de premier niveau (pas de limite par défaut ni à l'export)
+        limit = None
+        if line and hasattr(line, 'limit') and line.limit > 0 and not context.get('tdb_export'):
             limit = line.limit
-        
-        # Récupérer les groupements et mesures depuis le contexte (priorité au contexte du filtre)
-        row_gb = context.get('pivot_row_groupby') or context.get('graph_groupbys') or context.get('group_by')
-        if isinstance(row_gb, list):
-            row_gb = row_gb[0] if row_gb else None
-        
-        # Vérifier les deux noms possibles (pivot_column_groupby du filtre et pivot_col_groupby de la ligne)
-        col_gb = context.get('pivot_column_groupby') or context.get('pivot_col_groupby')
-        if isinstance(col_gb, list):
-            col_gb = col_gb[0] if col_gb else None
-        
-        # Pour la mesure, utiliser graph_measure du contexte si pivot_measures n'est pas défini
-        measures = context.get('pivot_measures') or context.get('graph_measure') or context.get('measure')
-        if isinstance(measures, list):
-            measure = measures[0] if measures else None
-        else:
-            measure = measures
 
-        use_count = not measure or str(measure) in ('count', '__count')
-        fields = [] if use_count else [f"{measure}:sum"]
-        
-        # Récupérer le libellé de la mesure
-        measure_label = "Nombre"
-        if measure and measure not in ('count', '__count'):
-            try:
-                field_info = model.fields_get([measure])
-                measure_label = field_info.get(measure, {}).get('string', measure)
-            except Exception:
-                measure_label = measure
-        
-        # Récupérer les libellés des groupements
-        row_label = "Lignes"
-        col_label = "Colonnes"
-        if row_gb:
-            try:
-                row_field = row_gb.split(':')[0]
-                field_info = model.fields_get([row_field])
-                row_label = field_info.get(row_field, {}).get('string', row_field)
-            except Exception:
-                row_label = row_gb
-        if col_gb:
-            try:
-                col_field = col_gb.split(':')[0]
-                field_info = model.fields_get([col_field])
-                col_label = field_info.get(col_field, {}).get('string', col_field)
-            except Exception:
-                col_label = col_gb
+        # Groupements et mesures (listes séparées par des virgules ou listes du contexte du filtre)
+        row_gbs = self._split_specs(context.get('pivot_row_groupby') or context.get('graph_groupbys') or context.get('group_by'))
+        col_gbs = self._split_specs(context.get('pivot_column_groupby') or context.get('pivot_col_groupby'))
+        row_gbs = [self._normalize_groupby(model, gb) for gb in row_gbs if gb.split(':')[0] in model._fields]
+        col_gbs = [self._normalize_groupby(model, gb) for gb in col_gbs if gb.split(':')[0] in model._fields]
+        measure_specs = self._split_specs(context.get('pivot_measures') or context.get('graph_measure') or context.get('measure'))
+        measures = list(dict.fromkeys(self._parse_measure(model, m) for m in measure_specs)) or [('__count', 'count')]
 
-        if row_gb and col_gb:
-            # 2D pivot
-            # Ne pas appliquer la limite au read_group, on triera et limitera après
-            try:
-                results = model.read_group(domain, fields=fields or ["__count"], groupby=[row_gb, col_gb], lazy=False)
-            except Exception:
-                results = []
-            
-            # Récupérer les mappings pour les champs Selection
-            row_selection_map = self._get_selection_map(model, row_gb.split(':')[0])
-            col_selection_map = self._get_selection_map(model, col_gb.split(':')[0])
-            
-            # Construire la structure des colonnes et des lignes
-            col_labels = []
-            col_index = {}
-            rows_map = {}
-            
-            for r in results:
-                rlab = self._extract_label_from_record(r, row_gb, row_selection_map)
-                clab = self._extract_label_from_record(r, col_gb, col_selection_map)
-                
-                if clab not in col_index:
-                    col_index[clab] = len(col_labels)
-                    col_labels.append(clab)
-                
-                if rlab not in rows_map:
-                    rows_map[rlab] = []
-                
-                # Assurer la taille de la liste des lignes
-                while len(rows_map[rlab]) < len(col_labels):
-                    rows_map[rlab].append(0)
-                
-                val = (r.get('__count') if use_count else (r.get(f"{measure}_sum") or r.get(measure) or 0)) or 0
-                rows_map[rlab][col_index[clab]] = val
-            
-            # Assurer que toutes les lignes ont la largeur complète
-            for rlab, vals in rows_map.items():
-                if len(vals) < len(col_labels):
-                    vals.extend([0] * (len(col_labels) - len(vals)))
-            
-            # Construire la liste des lignes
-            rows = [{'row': rlab, 'values': vals} for rlab, vals in rows_map.items()]
-            
-            # Trier et limiter
-            rows = self._sort_and_limit_rows(rows, context, limit, is_2d=True)
-            
-            # Calculer les totaux si demandé
-            show_row_totals = context.get('pivot_show_row_totals', True)
-            show_col_totals = context.get('pivot_show_col_totals', True)
-            
-            col_totals = None
-            if show_col_totals and rows:
-                # Calculer le total de chaque colonne
-                col_totals = [0] * len(col_labels)
-                for row in rows:
-                    for i, val in enumerate(row['values']):
-                        col_totals[i] += val
-            
-            # Ajouter le total de ligne à chaque ligne si demandé
-            if show_row_totals:
-                for row in rows:
-                    row['row_total'] = sum(row['values'])
-            
-            # sort columns by label for stability
-            columns = [{'key': i, 'label': lbl} for i, lbl in enumerate(col_labels)]
-            
-            result = {
-                'type': 'pivot',
-                'data': {
-                    'columns': columns,
-                    'rows': rows,
-                    'measure_label': measure_label,
-                    'row_label': row_label,
-                    'col_label': col_label,
-                },
-                'show_data_title': show_data_title,
+        period = self._get_period_config(model, line)
+        compare = bool(period and period['compare'])
+
+        nr, nc, nm = len(row_gbs), len(col_gbs), len(measures)
+        info = {}
+        try:
+            raw_rows = self._read_grouped(
+                model, domain, row_gbs + col_gbs, measures, period, pivot_rows=nr, line=line, info=info,
+            )
+        except QueryCanceled:
+            raise
+        except Exception:
+            _logger.exception("Erreur lors du calcul du tableau croisé")
+            raw_rows = []
+
+        # Décoder le masque GROUPING : bit à 1 = colonne agrégée (bit de poids fort = 1er groupement)
+        # Chaque contribution : (chemin ligne, chemin colonne, position dans la cellule, valeurs)
+        ng = nr + nc
+        cells = []
+        for r in raw_rows:
+            grouping = r[ng]
+            row_level = sum(1 for i in range(nr) if not (grouping >> (ng - 1 - i)) & 1)
+            col_total = nc and (grouping & 1)
+            row_path = tuple(r[:row_level])
+            col_path = () if (not nc or col_total) else tuple(r[nr:ng])
+            if not compare:
+                cells.append((row_path, col_path, 0, r[ng + 1:ng + 1 + nm]))
+                continue
+            in_current, in_compare = r[ng + 1 + 2 * nm], r[ng + 2 + 2 * nm]
+            if in_current or not ng:
+                cells.append((row_path, col_path, 0, r[ng + 1:ng + 1 + nm]))
+            if in_compare:
+                cells.append((
+                    self._shift_group_key(row_gbs, row_path, period),
+                    self._shift_group_key(col_gbs, col_path, period),
+                    nm, r[ng + 1 + nm:ng + 1 + 2 * nm],
+                ))
+
+        # Libellés et clés de tri par niveau de groupement
+        row_labels = [
+            self._format_group_values(model, gb, [c[0][i] for c in cells if len(c[0]) > i])
+            for i, gb in enumerate(row_gbs)
+        ]
+        col_labels = [
+            self._format_group_values(model, gb, [c[1][i] for c in cells if c[1]])
+            for i, gb in enumerate(col_gbs)
+        ]
+
+        # Colonnes feuilles triées hiérarchiquement + colonne de total en dernier
+        leaf_cols = sorted(
+            {c[1] for c in cells if c[1]},
+            key=lambda cp: tuple(col_labels[i][v][1] for i, v in enumerate(cp)),
+        )
+        col_index = {cp: i for i, cp in enumerate(leaf_cols)}
+        total_col = len(leaf_cols)
+        col_index[()] = total_col
+        n_cols = total_col + 1
+        slots = nm * 2 if compare else nm
+        width = n_cols * slots
+
+        # Matrice dense : valeur (ligne, colonne, mesure) à l'index (ri * n_cols + ci) * slots + mi
+        # (en comparaison, les mesures de la période de comparaison suivent celles de la période courante)
+        row_index = {}
+        for c in cells:
+            row_index.setdefault(c[0], len(row_index))
+        row_index.setdefault((), len(row_index))
+        matrix = [0] * (len(row_index) * width)
+        for rp, cp, offset, vals in cells:
+            base = (row_index[rp] * n_cols + col_index[cp]) * slots + offset
+            for mi, val in enumerate(vals):
+                matrix[base + mi] = val or 0
+
+        def cell_values(ri, first_col, last_col):
+            """Valeurs affichées des colonnes [first_col, last_col[ d'une ligne"""
+            start, end = (ri * n_cols + first_col) * slots, (ri * n_cols + last_col) * slots
+            if not compare:
+                return matrix[start:end]
+            values = []
+            for base in range(start, end, slots):
+                for mi in range(nm):
+                    current, previous = matrix[base + mi], matrix[base + nm + mi]
+                    values.extend((current, previous, self._delta_percent(current, previous)))
+            return values
+
+        def row_total(rp):
+            return matrix[(row_index[rp] * n_cols + total_col) * slots]
+
+        # Arbre des lignes : tri des frères puis parcours en profondeur
+        children = {}
+        for rp in row_index:
+            if rp:
+                children.setdefault(rp[:-1], []).append(rp)
+
+        def sort_key(rp):
+            if sort_by == 'total':
+                return row_total(rp)
+            return row_labels[len(rp) - 1][rp[-1]][1]
+
+        ordered = []
+
+        def walk(parent):
+            siblings = sorted(children.get(parent, []), key=sort_key, reverse=reverse)
+            if not parent and limit:
+                siblings = siblings[:limit]
+            for rp in siblings:
+                ordered.append(rp)
+                walk(rp)
+
+        walk(())
+
+        rows = []
+        for rp in ordered:
+            ri = row_index[rp]
+            row = {
+                'row': row_labels[len(rp) - 1][rp[-1]][0],
+                'level': len(rp),
+                'is_group': len(rp) < nr,
+                'values': cell_values(ri, 0, total_col),
             }
-            
-            # Ajouter les totaux au résultat
-            if show_col_totals and col_totals is not None:
-                result['data']['col_totals'] = col_totals
-                if show_row_totals:
-                    # Ajouter aussi le grand total (total des totaux)
-                    result['data']['grand_total'] = sum(col_totals)
-            
-            return result
+            if show_row_totals or not nc:
+                row['row_total'] = cell_values(ri, total_col, n_cols)
+            rows.append(row)
+        if not rows:
+            # Aucun groupement de lignes : une seule ligne de total
+            ri = row_index[()]
+            rows.append({
+                'row': 'Total',
+                'level': 1,
+                'is_group': False,
+                'values': cell_values(ri, 0, total_col),
+                'row_total': cell_values(ri, total_col, n_cols),
+            })
 
-        # 1D pivot (lignes uniquement)
-        data_rows = []
-        if row_gb:
-            # Récupérer le mapping pour les champs Selection
-            row_selection_map = self._get_selection_map(model, row_gb.split(':')[0])
-            
-            # Ne pas appliquer la limite au read_group, on triera et limitera après
-            try:
-                results = model.read_group(domain, fields=fields or ["__count"], groupby=[row_gb], lazy=False)
-                for r in results:
-                    label = self._extract_label_from_record(r, row_gb, row_selection_map)
-                    value = (r.get('__count') if use_count else (r.get(f"{measure}_sum") or r.get(measure))) or 0
-                    data_rows.append({'row': label, 'value': value})
-            except Exception:
-                pass
+        # Mesures affichées (en comparaison : courant, comparaison, écart % pour chaque mesure)
+        measures_meta = []
+        for fname, agg in measures:
+            label = self._measure_label(model, fname, agg, with_aggregator=agg != 'sum')
+            if compare:
+                measures_meta.extend([
+                    {'name': fname, 'label': f"{label} ({period['label']})"},
+                    {'name': fname, 'label': f"{label} ({period['compare_label']})"},
+                    {'name': fname, 'label': "Écart %", 'is_delta': True},
+                ])
+            else:
+                measures_meta.append({'name': fname, 'label': label})
+        span = len(measures_meta)
+
+        # En-têtes de colonnes multi-niveaux (fusion des cellules consécutives de même préfixe)
+        col_headers = []
+        for level in range(nc):
+            header = []
+            for cp in leaf_cols:
+                if header and header[-1][0] == cp[:level + 1]:
+                    header[-1][2] += span
+                else:
+                    header.append([cp[:level + 1], col_labels[level][cp[level]][0], span])
+            col_headers.append([{'label': lbl, 'colspan': colspan} for _key, lbl, colspan in header])
+
+        data = {
+            'measures': measures_meta,
+            'measure_label': ', '.join(self._measure_label(model, fname, agg) for fname, agg in measures),
+            'row_label': ' / '.join(self._groupby_label(model, gb) for gb in row_gbs) or 'Lignes',
+            'col_label': ' / '.join(self._groupby_label(model, gb) for gb in col_gbs) or 'Colonnes',
+            'col_headers': col_headers,
+            'columns': [
+                {'key': i, 'label': ' / '.join(col_labels[lv][v][0] for lv, v in enumerate(cp))}
+                for i, cp in enumerate(leaf_cols)
+            ],
+            'rows': rows,
+        }
+        if show_col_totals and nr:
+            ri = row_index[()]
+            data['col_totals'] = cell_values(ri, 0, total_col)
+            data['grand_total'] = cell_values(ri, total_col, n_cols)
 
-        if not data_rows:
-            # Retourner un total cohérent (sum de measure si défini, sinon count)
-            total_value = None
-            if not use_count:
-                try:
-                    res = model.read_group(domain, fields=[f"{measure}:sum"], groupby=[], lazy=False)
-                    if res and isinstance(res, list):
-                        total_value = res[0].get(f"{measure}_sum") or 0
-                except Exception:
-                    total_value = None
-            if total_value is None:
-                total_value = model.search_count(domain)
-            data_rows = [{'row': 'Total', 'value': total_value}]
-        else:
-            # Trier et limiter (sauf si c'est juste le total)
-            data_rows = self._sort_and_limit_rows(data_rows, context, limit, is_2d=False)
-        
-        # Calculer le total général pour les pivots 1D si demandé
-        show_col_totals = context.get('pivot_show_col_totals', True)
         result = {
             'type': 'pivot',
-            'data': data_rows,
-            'measure_label': measure_label,
-            'row_label': row_label,
+            'data': data,
             'show_data_title': show_data_title,
         }
-        
-        # Ajouter le total si demandé et si ce n'est pas déjà un total unique
-        if show_col_totals and data_rows and not (len(data_rows) == 1 and data_rows[0]['row'] == 'Total'):
-            total_value = sum(row['value'] for row in data_rows)
-            result['total'] = total_value
-        
+        if not compare:
+            # Agrégats au grain le plus fin : chemin complet de lignes et de colonnes
+            cube = self._build_cube(
+                model, row_gbs + col_gbs, measures,
+                [(rp + cp, vals) for rp, cp, _offset, vals in cells if len(rp) == nr and len(cp) == nc],
+                row_labels + col_labels, line, [meta['label'] for meta in measures_meta],
+            )
+            if cube:
+                cube.update({
+                    'rows': nr,
+                    'sort_by': sort_by,
+                    'sort_order': 'desc' if reverse else 'asc',
+                    'limit': limit or 0,
+                    'show_row_totals': bool(show_row_totals),
+                    'show_col_totals': bool(show_col_totals),
+                    'measure_label': data['measure_label'],
+                })
+                result['cube'] = cube
+        if info.get('snapshot_date'):
+            result['snapshot_date'] = info['snapshot_date']
+        if info.get('sample'):
+            result['sample'] = info['sample']
+        result['_perf'] = {'rows': len(raw_rows), 'source': info.get('source', 'live')}
+        if info.get('rollup_id'):
+            result['_perf']['rollup_id'] = info['rollup_id']
+        if 'explain' in info:
+            result['_perf']['explain'] = info['explain']
         return result
 
+    def _build_cube(self, model, groupbys, measures, facts, labels_by_gb, line, measure_labels):
+        """Cube client : agrégats au grain le plus fin sous forme colonnaire, ou None
+
+        Chaque dimension porte son dictionnaire de valeurs (clé brute, libellé), rangé
+        dans l'ordre de tri du groupement : le code d'une valeur est aussi son rang.
+        Les faits sont une colonne de codes par dimension et une colonne de valeurs par
+        mesure. Seulement si la ligne le demande, que toutes les mesures sont
+        ré-agrégeables et que le nombre de faits reste sous CUBE_MAX_ROWS.
+
+        Args:
+            facts: liste de (clé brute par groupement, valeurs par mesure)
+            labels_by_gb: par groupement, {valeur brute: (libellé, clé de tri)}
+        """
+        if not line or not line.cube_enabled:
+            return None
+        if any(aggregator not in CUBE_AGGREGATORS for _fname, aggregator in measures):
+            return None
+        if len(facts) > CUBE_MAX_ROWS:
+            _logger.info("Ligne %s : cube client non envoyé (%s agrégats > %s)", line.id, len(facts), CUBE_MAX_ROWS)
+            return None
+
+        dimensions = []
+        codes = []
+        for i, groupby in enumerate(groupbys):
+            labels = labels_by_gb[i]
+            ordered = sorted(labels, key=lambda raw: labels[raw][1])
+            index = {raw: code for code, raw in enumerate(ordered)}
+            dimensions.append({
+                'groupby': groupby,
+                'label': self._groupby_label(model, groupby),
+                'keys': [clean_for_json(raw) for raw in ordered],
+                'labels': [labels[raw][0] for raw in ordered],
+            })
+            codes.append([index[key[i]] for key, _values in facts])
+        return {
+            'model': model._name,
+            'count': len(facts),
+            'dimensions': dimensions,
+            'measures': [
+                {'name': fname, 'aggregator': aggregator, 'label': label}
+                for (fname, aggregator), label in zip(measures, measure_labels)
+            ],
+            'codes': codes,
+            'values': [[values[mi] or 0 for _key, values in facts] for mi in range(len(measures))],
+        }
+
     def _get_fields_from_view(self, model, view_type, view_id=None):
         """Récupère les champs et leurs libellés depuis la vue list/tree.
         Essaie d'abord 'list', puis 'tree' si nécessaire. Supporte un view_id explicite.
@@ -1464,7 +3204,7 @@ class TableauDeBordController(http.Controller):
                     field_names, fields_def = _extract(view2)
 
                 if len(field_names) <= 1:
-                    View = request.env['ir.ui.view'].sudo()
+                    View = model.env['ir.ui.view'].sudo()
                     candidates = View.search([
                         ('model', '=', model._name),
                         ('type', 'in', ['list', 'tree'])
@@ -2,3 +2,8 @@
 
 from . import is_tableau_de_bord
 from . import ir_filters
+from . import is_tableau_de_bord_rollup
+from . import is_tableau_de_bord_cache
+from . import is_tableau_de_bord_perf_stat
+from . import is_tableau_de_bord_index_advice
+from . import is_tableau_de_bord_kiosk
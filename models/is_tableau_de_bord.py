@@ -1,7 +1,42 @@
 # -*- coding: utf-8 -*-
 
+import base64
+import io
+import json
+import logging
+import marshal
+import os
+import pstats
 import random
+import tempfile
+import zipfile
+from datetime import timedelta
 from odoo import models, fields, api
+from odoo.exceptions import ValidationError
+from odoo.tools import SQL
+
+_logger = logging.getLogger(__name__)
+
+# Délai pendant lequel une demande de profilage attend le prochain chargement
+PROFILE_REQUEST_DELAY = timedelta(hours=1)
+
+# Préfixe des résultats partiels (une pièce jointe par ligne profilée)
+PROFILE_PART_PREFIX = 'tdb_profile_part_'
+
+# Seuils par défaut de l'estimation du coût d'une ligne (paramètres système is_tableau_de_bord18.cost_*)
+COST_THRESHOLDS = {
+    'warn_rows': 5000000,
+    'block_rows': 50000000,
+    'warn_cells': 100000,
+    'block_cells': 1000000,
+}
+
+# Champs de la ligne dont la modification déclenche une nouvelle estimation du coût
+COST_TRIGGER_FIELDS = {
+    'filter_id', 'display_mode', 'graph_measure', 'graph_groupbys', 'graph_series_mode',
+    'pivot_row_groupby', 'pivot_col_groupby', 'pivot_measure', 'date_field', 'period_type',
+    'compare_mode', 'compare_offset', 'compare_offset_unit', 'sampling', 'sampling_percent',
+}
 
 
 class IsTableauDeBord(models.Model):
@@ -16,6 +51,19 @@ class IsTableauDeBord(models.Model):
     active = fields.Boolean('Actif', default=True)
     color = fields.Integer('Couleur', default=lambda self: random.randint(1, 11))
     image = fields.Binary('Image', attachment=True)
+    refresh_interval = fields.Integer('Actualisation automatique (secondes)', default=0, help='Intervalle de vérification des données affichées : seuls les éléments dont les données ont changé sont recalculés (0 = pas d\'actualisation automatique)')
+    cache_duration = fields.Integer('Durée du cache (minutes)', default=0, help='Durée de conservation des résultats calculés de chaque ligne, par utilisateur (0 = pas de cache, sauf pré-calcul)')
+    precompute = fields.Boolean('Pré-calcul', help='Recalculer toutes les lignes pour les utilisateurs et groupes ci-dessous par la tâche planifiée, avant les heures de consultation')
+    precompute_user_ids = fields.Many2many('res.users', 'is_tableau_de_bord_precompute_user_rel', 'tableau_id', 'user_id', string='Utilisateurs du pré-calcul')
+    precompute_group_ids = fields.Many2many('res.groups', 'is_tableau_de_bord_precompute_group_rel', 'tableau_id', 'group_id', string='Groupes du pré-calcul')
+    precompute_date = fields.Datetime('Dernier pré-calcul', readonly=True, copy=False)
+    precompute_duration_ms = fields.Integer('Durée du dernier pré-calcul (ms)', readonly=True, copy=False)
+    cache_ids = fields.One2many('is.tableau.de.bord.cache', 'tableau_id', string='Résultats en cache')
+    profile_user_id = fields.Many2one('res.users', string='Profilage demandé par', readonly=True, copy=False)
+    profile_request_date = fields.Datetime('Profilage demandé le', readonly=True, copy=False)
+    profile_file = fields.Binary('Dernier profil', attachment=True, readonly=True, copy=False)
+    profile_filename = fields.Char('Nom du fichier de profil', readonly=True, copy=False)
+    profile_date = fields.Datetime('Profil du', readonly=True, copy=False)
 
     def action_view_dashboard(self):
         """Action pour afficher le tableau de bord"""
@@ -88,6 +136,154 @@ class IsTableauDeBord(models.Model):
         action = self.action_view_dashboard_list()
         return action
 
+    @api.model
+    def _cron_precompute(self):
+        """Tâche planifiée : pré-calcule les tableaux de bord marqués « Pré-calcul »"""
+        self.search([('precompute', '=', True)]).action_precompute()
+
+    def action_precompute(self):
+        """Calcule chaque ligne pour chaque utilisateur du pré-calcul et stocke le résultat en cache
+
+        Chaque calcul se fait avec les droits, la langue, le fuseau et les valeurs de
+        filtres mémorisées de l'utilisateur, pour produire exactement la clé de cache
+        de sa prochaine consultation ; la durée de chaque ligne est enregistrée.
+        """
+        from ..controllers.main import TableauDeBordController
+        controller = TableauDeBordController()
+        for dashboard in self:
+            users = (dashboard.precompute_user_ids | dashboard.precompute_group_ids.users).filtered('active')
+            started = fields.Datetime.now()
+            total_ms = 0
+            for user in users:
+                env = self.env(user=user.id)
+                env = env(context=env['res.users'].context_get())
+                filters_values = env['is.tableau.de.bord.mem.filter'].get_filters(dashboard.id)
+                for line in dashboard.line_ids.filtered('filter_id'):
+                    try:
+                        with self.env.cr.savepoint():
+                            _result, duration_ms = controller._cached_filter_data(
+                                env, line.filter_id.id, line.id, filters_values=filters_values,
+                                origin='precompute', force=True,
+                            )
+                            total_ms += duration_ms
+                    except Exception:
+                        _logger.exception("Erreur lors du pré-calcul de la ligne %s pour %s", line.id, user.login)
+            dashboard.write({'precompute_date': started, 'precompute_duration_ms': total_ms})
+        return True
+
+    def action_profile(self):
+        """Demande le profilage (cProfile et requêtes SQL) du prochain chargement par l'utilisateur"""
+        self.ensure_one()
+        self._profile_parts().unlink()
+        self.write({'profile_user_id': self.env.uid, 'profile_request_date': fields.Datetime.now()})
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': 'Profilage',
+                'message': 'Le prochain chargement de ce tableau de bord par vous sera profilé.',
+                'type': 'info',
+                'sticky': False,
+            },
+        }
+
+    def _profile_pending(self):
+        """Vrai si un profilage est demandé par l'utilisateur courant et pas encore expiré"""
+        self.ensure_one()
+        dashboard = self.sudo()
+        return bool(
+            dashboard.profile_user_id.id == self.env.uid
+            and dashboard.profile_request_date
+            and dashboard.profile_request_date + PROFILE_REQUEST_DELAY > fields.Datetime.now()
+        )
+
+    def _profile_parts(self):
+        return self.env['ir.attachment'].sudo().search([
+            ('res_model', '=', self._name),
+            ('res_id', 'in', self.ids),
+            ('name', '=like', PROFILE_PART_PREFIX + '%'),
+        ], order='id')
+
+    def _profile_store_part(self, line_id, stats, queries):
+        """Conserve le résultat du profilage d'une ligne jusqu'à la fin du chargement
+
+        Args:
+            stats: statistiques cProfile (Profile.stats)
+            queries: liste de dict (sql, ms, explain)
+        """
+        self.ensure_one()
+        part = {
+            'line_id': line_id,
+            'stats': base64.b64encode(marshal.dumps(stats)).decode(),
+            'queries': queries,
+        }
+        self.env['ir.attachment'].sudo().create({
+            'name': f'{PROFILE_PART_PREFIX}{line_id}.json',
+            'res_model': self._name,
+            'res_id': self.id,
+            'raw': json.dumps(part).encode(),
+            'mimetype': 'application/json',
+        })
+
+    def _profile_finish(self):
+        """Regroupe les profils des lignes dans une archive zip téléchargeable sur le tableau de bord
+
+        L'archive contient les statistiques cProfile fusionnées (profile.pstats, lisible
+        avec pstats ou snakeviz), leur résumé texte et les requêtes SQL de chaque ligne
+        avec leur durée et le plan EXPLAIN des plus lentes.
+        """
+        self.ensure_one()
+        parts = self._profile_parts()
+        if not parts:
+            return False
+        lines = self.env['is.tableau.de.bord.line'].sudo().browse()
+        stats = None
+        sql_report = []
+        with tempfile.TemporaryDirectory() as tmpdir:
+            for index, attachment in enumerate(parts):
+                part = json.loads(attachment.raw)
+                path = os.path.join(tmpdir, f'{index}.pstats')
+                with open(path, 'wb') as stats_file:
+                    stats_file.write(base64.b64decode(part['stats']))
+                if stats is None:
+                    stats = pstats.Stats(path)
+                else:
+                    stats.add(path)
+                line = lines.browse(part['line_id'])
+                queries = part['queries']
+                sql_report.append(
+                    f"=== Ligne {line.id} : {line.name or ''} "
+                    f"({len(queries)} requêtes, {sum(q['ms'] for q in queries):.1f} ms)\n"
+                )
+                for query in queries:
+                    sql_report.append(f"-- {query['ms']:.3f} ms\n{query['sql']};\n")
+                    if query.get('explain'):
+                        sql_report.append('-- EXPLAIN\n' + '\n'.join(f'--   {row}' for row in query['explain']) + '\n')
+                    sql_report.append('\n')
+            pstats_path = os.path.join(tmpdir, 'profile.pstats')
+            stats.dump_stats(pstats_path)
+            with open(pstats_path, 'rb') as stats_file:
+                pstats_data = stats_file.read()
+            summary = io.StringIO()
+            stats.stream = summary
+            stats.sort_stats('cumulative').print_stats(80)
+
+        now = fields.Datetime.now()
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr('profile.pstats', pstats_data)
+            archive.writestr('profile.txt', summary.getvalue())
+            archive.writestr('sql.txt', ''.join(sql_report))
+        parts.unlink()
+        self.sudo().write({
+            'profile_file': base64.b64encode(buffer.getvalue()),
+            'profile_filename': f"profil_tableau_{self.id}_{now.strftime('%Y%m%d_%H%M%S')}.zip",
+            'profile_date': now,
+            'profile_user_id': False,
+            'profile_request_date': False,
+        })
+        return True
+
     def action_refresh_all_lines_from_filters(self):
         """Action pour rafraîchir toutes les lignes du tableau de bord depuis leurs filtres"""
         self.ensure_one()
@@ -162,6 +358,7 @@ class IsTableauDeBordLine(models.Model):
         ('list', 'Liste'),
         ('graph', 'Graphique'),
         ('pivot', 'Tableau croisé'),
+        ('kpi', 'Indicateur (KPI)'),
     ], string='Mode d\'affichage', default='graph')
 
     graph_chart_type = fields.Selection([
@@ -176,17 +373,27 @@ class IsTableauDeBordLine(models.Model):
         ('min', 'Minimum'),
         ('max', 'Maximum'),
         ('count', 'Compte'),
+        ('count_distinct', 'Nombre de valeurs distinctes'),
+        ('median', 'Médiane'),
+        ('p90', '90e centile'),
+        ('p95', '95e centile'),
     ], string='Agrégateur', default='sum')
     
     graph_measure = fields.Char('Graph: Mesure', help='Champ utilisé pour la mesure du graphique')
     graph_groupbys = fields.Char('Graph: Groupements', help='Liste des groupements pour le graphique (ex: invoice_date:year)')
+    graph_series_mode = fields.Selection([
+        ('none', 'Valeurs par groupe'),
+        ('cumulative', 'Cumul'),
+        ('moving_average', 'Moyenne mobile'),
+    ], string='Série', default='none', help='Cumul ou moyenne mobile calculés en base le long du groupement date (ou du premier groupement)')
+    graph_moving_periods = fields.Integer('Périodes de la moyenne mobile', default=3, help='Nombre de groupes consécutifs pris en compte par la moyenne mobile')
     graph_show_legend = fields.Boolean('Afficher la légende', default=True, help='Afficher ou masquer la légende du graphique')
     show_data_title = fields.Boolean('Afficher le titre des données', default=True, help='Afficher ou masquer le titre du graphique/pivot (ex: "Somme de Total HT" ou "Mesure: Montant")')
     show_record_count = fields.Boolean('Afficher le nombre d\'enregistrements', default=True, help='Afficher ou masquer le compteur d\'enregistrements en bas de liste')
 
-    pivot_row_groupby = fields.Char('Pivot: Groupe lignes')
-    pivot_col_groupby = fields.Char('Pivot: Groupe colonnes')
-    pivot_measure     = fields.Char('Pivot: Mesure (champ numérique)')
+    pivot_row_groupby = fields.Char('Pivot: Groupe lignes', help='Groupements des lignes séparés par des virgules, un niveau par groupement (ex: partner_id,invoice_date:month)')
+    pivot_col_groupby = fields.Char('Pivot: Groupe colonnes', help='Groupements des colonnes séparés par des virgules, un niveau par groupement')
+    pivot_measure     = fields.Char('Pivot: Mesures', help='Mesures du tableau croisé séparées par des virgules (ex: amount_total,quantity ou amount_total:avg, delay:median, delay:p90, partner_id:count_distinct)')
     pivot_sort_by = fields.Selection([
         ('row', 'Tri des lignes'),
         ('total', 'Tri des totaux'),
@@ -197,6 +404,52 @@ class IsTableauDeBordLine(models.Model):
     ], string='Ordre du tri', default='asc', help='Ordre de tri (pivot et graphique)')
     pivot_show_row_totals = fields.Boolean('Afficher les totaux des lignes', default=True, help='Ajouter une colonne de total pour chaque ligne')
     pivot_show_col_totals = fields.Boolean('Afficher les totaux des colonnes', default=True, help='Ajouter une ligne de total pour chaque colonne')
+    date_field = fields.Char('Champ date', help='Champ date ou date/heure utilisé pour les périodes (ex: invoice_date)')
+    period_type = fields.Selection([
+        ('none', 'Toute la période du filtre'),
+        ('day', 'Aujourd\'hui'),
+        ('week', 'Semaine en cours'),
+        ('month', 'Mois en cours'),
+        ('quarter', 'Trimestre en cours'),
+        ('year', 'Année en cours'),
+    ], string='Période', default='none', help='Période de l\'indicateur, calculée sur le champ date')
+    compare_mode = fields.Selection([
+        ('none', 'Aucune'),
+        ('previous_period', 'Période précédente'),
+        ('previous_year', 'Même période l\'année précédente'),
+        ('custom', 'Décalage personnalisé'),
+    ], string='Comparaison', default='none', help='Période de comparaison affichée avec l\'écart en pourcentage')
+    compare_offset = fields.Integer('Décalage', default=1, help='Nombre d\'unités de décalage de la période de comparaison')
+    compare_offset_unit = fields.Selection([
+        ('day', 'Jours'),
+        ('week', 'Semaines'),
+        ('month', 'Mois'),
+        ('quarter', 'Trimestres'),
+        ('year', 'Années'),
+    ], string='Unité du décalage', default='month')
+    kpi_sparkline_points = fields.Integer('Points de la mini-courbe', default=12, help='Nombre de périodes affichées dans la mini-courbe de l\'indicateur (0 = pas de courbe)')
+    data_source = fields.Selection([
+        ('live', 'Temps réel'),
+        ('snapshot', 'Instantané matérialisé'),
+    ], string='Source des données', default='live', required=True, help='Instantané : graphique et tableau croisé servis depuis une vue matérialisée PostgreSQL rafraîchie par une tâche planifiée')
+    snapshot_refresh_interval = fields.Integer('Rafraîchir toutes les (minutes)', default=60, help='Délai minimum entre deux rafraîchissements de l\'instantané')
+    snapshot_date = fields.Datetime('Données au', readonly=True, copy=False)
+    snapshot_query_hash = fields.Char('Empreinte de la requête de l\'instantané', readonly=True, copy=False)
+    sampling = fields.Boolean('Échantillonnage', help='Graphiques et tableaux croisés : calculer sur un échantillon de la table (TABLESAMPLE SYSTEM), sommes et nombres extrapolés. Calcul exact automatique si le domaine est sélectif.')
+    cube_enabled = fields.Boolean('Cube client', help='Graphiques et tableaux croisés : envoyer aussi les agrégats au grain le plus fin pour recalculer dans le navigateur le filtrage croisé, l\'inversion lignes/colonnes et le top N (sans comparaison de périodes ni série cumulée, agrégateurs somme, nombre, minimum et maximum)')
+    sampling_percent = fields.Float('Taille de l\'échantillon (%)', default=1.0, digits=(5, 2), help='Pourcentage des blocs de la table lus')
+    refresh_interval = fields.Integer('Actualisation automatique (secondes)', default=0, help='Intervalle de vérification des données de la ligne (0 = celui du tableau de bord)')
+    statement_timeout = fields.Integer('Délai maximum (secondes)', default=0, help='Durée maximum de chaque requête de la ligne ; au-delà, la ligne affiche « délai dépassé » sans bloquer les autres (0 = paramètre global is_tableau_de_bord18.statement_timeout)')
+    cost_level = fields.Selection([
+        ('ok', 'Acceptable'),
+        ('warning', 'Élevé'),
+        ('blocked', 'Excessif'),
+        ('unknown', 'Non estimé'),
+    ], string='Coût estimé', readonly=True, copy=False)
+    cost_rows_estimate = fields.Float('Lignes lues (estimation)', digits=(16, 0), readonly=True, copy=False)
+    cost_cells_estimate = fields.Float('Cellules produites (estimation)', digits=(16, 0), readonly=True, copy=False)
+    cost_message = fields.Char('Détail de l\'estimation', readonly=True, copy=False)
+    cost_date = fields.Datetime('Coût estimé le', readonly=True, copy=False)
     limit = fields.Integer('Limite', default=0, help='Nombre maximum de lignes à afficher (0 = toutes les lignes)')
     list_groupby = fields.Char('Regroupement liste', help='Champs de regroupement pour le mode liste (ex: secteur_id,partner_id). Si défini, affiche une ligne par regroupement avec les totaux des champs numériques.')
     filter_domain     = fields.Char(compute='_compute_filter_domain', store=False)
@@ -297,7 +550,7 @@ class IsTableauDeBordLine(models.Model):
                 if 'pivot_measures' in context:
                     measures = context['pivot_measures']
                     if isinstance(measures, list) and measures:
-                        self.pivot_measure = measures[0]
+                        self.pivot_measure = ','.join(measures)
                     elif measures:  # Si c'est une chaîne non vide
                         self.pivot_measure = str(measures)
                 
@@ -489,7 +742,7 @@ class IsTableauDeBordLine(models.Model):
             if 'pivot_measures' in context:
                 measures = context['pivot_measures']
                 if isinstance(measures, list) and measures:
-                    result['pivot_measure'] = measures[0]
+                    result['pivot_measure'] = ','.join(measures)
                 else:
                     result['pivot_measure'] = str(measures)
             
@@ -565,7 +818,9 @@ class IsTableauDeBordLine(models.Model):
                     if value:  # Seulement si la valeur extraite n'est pas vide
                         vals[key] = value
         
-        return super().create(vals_list)
+        lines = super().create(vals_list)
+        lines._check_cost()
+        return lines
 
     def write(self, vals):
         """Surcharge write pour extraire automatiquement les valeurs du filtre"""
@@ -579,7 +834,234 @@ class IsTableauDeBordLine(models.Model):
                     if key not in vals or not vals[key]:
                         vals[key] = value
         
-        return super().write(vals)
+        if vals.get('data_source') == 'live':
+            self._drop_snapshot()
+            vals.update({'snapshot_date': False, 'snapshot_query_hash': False})
+        res = super().write(vals)
+        if COST_TRIGGER_FIELDS.intersection(vals):
+            self._check_cost()
+        return res
+
+    def unlink(self):
+        self._drop_snapshot()
+        return super().unlink()
+
+    @api.constrains('sampling', 'sampling_percent')
+    def _check_sampling_percent(self):
+        for line in self:
+            if line.sampling and not 0 < line.sampling_percent < 100:
+                raise ValidationError("La taille de l'échantillon doit être comprise entre 0 et 100 %")
+
+    # ------------------------------------------------------------------
+    # Estimation du coût
+    # ------------------------------------------------------------------
+
+    def _cost_thresholds(self):
+        params = self.env['ir.config_parameter'].sudo()
+        return {
+            key: float(params.get_param(f'is_tableau_de_bord18.cost_{key}', default) or default)
+            for key, default in COST_THRESHOLDS.items()
+        }
+
+    def _check_cost(self):
+        """Estime le coût des lignes et refuse l'enregistrement au-delà des seuils de blocage"""
+        self._estimate_cost()
+        blocked = self.filtered(lambda l: l.cost_level == 'blocked')
+        if blocked:
+            raise ValidationError('\n'.join(
+                f"« {line.name} » : requête trop coûteuse. {line.cost_message}" for line in blocked
+            ))
+
+    def _estimate_cost(self):
+        """Estime par EXPLAIN le coût de la requête groupée des graphiques et tableaux croisés
+
+        La ligne est calculée par le contrôleur en contexte tdb_explain : la requête
+        groupée est construite comme à l'affichage (règles d'accès de l'utilisateur,
+        période, agrégats pré-calculés) mais seul son plan est demandé à PostgreSQL.
+        Lignes lues : estimation de la table pour un parcours séquentiel, du parcours
+        sinon ; cellules produites : groupes estimés × mesures.
+        """
+        from ..controllers.main import TableauDeBordController
+        controller = TableauDeBordController()
+        thresholds = self._cost_thresholds()
+        env = self.env(context=dict(self.env.context, tdb_explain=True))
+
+        def fmt(value):
+            return f"{value:,.0f}".replace(',', ' ')
+
+        for line in self:
+            vals = {
+                'cost_level': False,
+                'cost_rows_estimate': 0,
+                'cost_cells_estimate': 0,
+                'cost_message': False,
+                'cost_date': fields.Datetime.now(),
+            }
+            if line.filter_id and line.display_mode in ('graph', 'pivot'):
+                plan = None
+                try:
+                    with self.env.cr.savepoint():
+                        result = controller._compute_filter_data(env, line.filter_id.id, line.id)
+                        plan = (result.get('_perf') or {}).get('explain')
+                except Exception as e:
+                    _logger.warning("Estimation du coût de la ligne %s impossible : %s", line.id, e)
+                if plan:
+                    root = plan[0]['Plan']
+                    rows = line._plan_rows_read(root)
+                    measures = len([m for m in (line.pivot_measure or '').split(',') if m.strip()]) or 1
+                    cells = root.get('Plan Rows', 0) * (measures if line.display_mode == 'pivot' else 1)
+                    if rows >= thresholds['block_rows'] or cells >= thresholds['block_cells']:
+                        level = 'blocked'
+                    elif rows >= thresholds['warn_rows'] or cells >= thresholds['warn_cells']:
+                        level = 'warning'
+                    else:
+                        level = 'ok'
+                    vals.update({
+                        'cost_level': level,
+                        'cost_rows_estimate': rows,
+                        'cost_cells_estimate': cells,
+                        'cost_message': (
+                            f"Estimation : {fmt(rows)} lignes lues, {fmt(cells)} cellules produites "
+                            f"(avertissement à {fmt(thresholds['warn_rows'])} lignes / {fmt(thresholds['warn_cells'])} cellules, "
+                            f"blocage à {fmt(thresholds['block_rows'])} / {fmt(thresholds['block_cells'])})"
+                        ),
+                    })
+                else:
+                    vals.update({'cost_level': 'unknown', 'cost_message': 'Plan de la requête indisponible'})
+            line._write_cost(vals)
+
+    def _write_cost(self, vals):
+        """Enregistre l'estimation par UPDATE direct
+
+        Ni write_date ni write_uid ne changent : l'estimation ne rend pas obsolète le
+        cache des données de la ligne et ne redéclenche pas l'estimation.
+        """
+        self.flush_recordset(list(vals))
+        self.env.cr.execute(SQL(
+            "UPDATE %s SET %s WHERE id = ANY(%s)",
+            SQL.identifier(self._table),
+            SQL(", ").join(SQL("%s = %s", SQL.identifier(fname), None if value is False else value)
+                         for fname, value in vals.items()),
+            self.ids,
+        ))
+        self.invalidate_recordset(list(vals))
+
+    def _plan_rows_read(self, node):
+        """Nombre de lignes lues par un plan EXPLAIN (somme des parcours de tables)"""
+        rows = 0
+        if node.get('Relation Name'):
+            rows = node.get('Plan Rows', 0)
+            if node.get('Node Type', '').endswith('Seq Scan'):
+                # Le nombre de lignes du plan est après filtre : un parcours séquentiel lit toute la table
+                self.env.cr.execute(SQL(
+                    "SELECT reltuples FROM pg_class WHERE relname = %s AND relkind IN ('r', 'p', 'm')",
+                    node['Relation Name'],
+                ))
+                row = self.env.cr.fetchone()
+                if row and row[0] > rows:
+                    rows = row[0]
+        return rows + sum(self._plan_rows_read(child) for child in node.get('Plans', []))
+
+    def action_estimate_cost(self):
+        """Bouton : estime le coût de la ligne sans bloquer"""
+        self._estimate_cost()
+        line = self[:1]
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': 'Coût estimé',
+                'message': line.cost_message or 'Estimation disponible pour les graphiques et tableaux croisés uniquement',
+                'type': {'ok': 'success', 'warning': 'warning', 'blocked': 'danger'}.get(line.cost_level, 'info'),
+                'sticky': line.cost_level in ('warning', 'blocked'),
+                'next': {'type': 'ir.actions.client', 'tag': 'soft_reload'},
+            },
+        }
+
+    # ------------------------------------------------------------------
+    # Instantanés matérialisés
+    # ------------------------------------------------------------------
+
+    def _snapshot_view_name(self):
+        self.ensure_one()
+        return f"is_tableau_de_bord_snapshot_{self.id}"
+
+    def _snapshot_exists(self):
+        self.ensure_one()
+        self.env.cr.execute(SQL("SELECT 1 FROM pg_matviews WHERE matviewname = %s", self._snapshot_view_name()))
+        return bool(self.env.cr.rowcount)
+
+    def _drop_snapshot(self):
+        for line in self:
+            self.env.cr.execute(SQL("DROP MATERIALIZED VIEW IF EXISTS %s", SQL.identifier(line._snapshot_view_name())))
+
+    def _refresh_snapshot(self, query, query_hash):
+        """Rafraîchit la vue matérialisée de la ligne avec la requête agrégée query
+
+        Si la requête n'a pas changé, la vue est rafraîchie sans bloquer les lectures
+        (CONCURRENTLY, grâce à l'index unique sur snapshot_row) ; sinon (configuration,
+        règles d'accès ou bornes de période modifiées) elle est recréée.
+        """
+        self.ensure_one()
+        cr = self.env.cr
+        view = SQL.identifier(self._snapshot_view_name())
+        if self.snapshot_query_hash == query_hash and self._snapshot_exists():
+            cr.execute(SQL("REFRESH MATERIALIZED VIEW CONCURRENTLY %s", view))
+        else:
+            cr.execute(SQL("DROP MATERIALIZED VIEW IF EXISTS %s", view))
+            cr.execute(SQL(
+                "CREATE MATERIALIZED VIEW %s AS SELECT ROW_NUMBER() OVER () AS snapshot_row, snapshot.* FROM (%s) AS snapshot",
+                view, query,
+            ))
+            cr.execute(SQL("CREATE UNIQUE INDEX ON %s (snapshot_row)", view))
+        self.write({
+            'snapshot_query_hash': query_hash,
+            'snapshot_date': fields.Datetime.now(),
+        })
+
+    def action_refresh_snapshot(self):
+        """Bouton : rafraîchit immédiatement l'instantané des lignes sélectionnées"""
+        self._run_snapshot_refresh()
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': 'Instantané rafraîchi',
+                'message': 'Les données de l\'instantané ont été recalculées.',
+                'type': 'success',
+                'sticky': False,
+            }
+        }
+
+    @api.model
+    def _cron_refresh_snapshots(self):
+        """Tâche planifiée : rafraîchit les instantanés dont le délai est écoulé"""
+        now = fields.Datetime.now()
+        lines = self.search([('data_source', '=', 'snapshot'), ('filter_id', '!=', False)])
+        due = lines.filtered(
+            lambda l: not l.snapshot_date
+            or l.snapshot_date + timedelta(minutes=max(l.snapshot_refresh_interval, 1)) <= now
+        )
+        due._run_snapshot_refresh()
+
+    def _run_snapshot_refresh(self):
+        """Recalcule les lignes avec les droits du propriétaire du filtre
+
+        Le calcul passe par le contrôleur avec le contexte tdb_snapshot_refresh : la
+        requête agrégée est alors matérialisée au lieu d'être exécutée. Elle n'est
+        servie ensuite qu'aux utilisateurs dont la requête est strictement identique.
+        """
+        from ..controllers.main import TableauDeBordController
+        controller = TableauDeBordController()
+        for line in self.filtered(lambda l: l.data_source == 'snapshot' and l.filter_id):
+            owner = line.user_id or line.filter_id.user_id or self.env.user
+            env = self.env(user=owner.id)
+            env = env(context=dict(env['res.users'].context_get(), tdb_snapshot_refresh=True))
+            try:
+                with self.env.cr.savepoint():
+                    controller._compute_filter_data(env, line.filter_id.id, line.id)
+            except Exception:
+                _logger.exception("Erreur lors du rafraîchissement de l'instantané de la ligne %s", line.id)
 
 
     def action_refresh_from_filter(self):
@@ -632,7 +1114,7 @@ class IsTableauDeBordLine(models.Model):
         if self.graph_aggregator:
             context['graph_aggregator'] = self.graph_aggregator
         if self.pivot_measure:
-            context['pivot_measures'] = [self.pivot_measure]
+            context['pivot_measures'] = [g.strip() for g in self.pivot_measure.split(',')]
         if self.pivot_row_groupby:
             context['pivot_row_groupby'] = [g.strip() for g in self.pivot_row_groupby.split(',')]
         if self.pivot_col_groupby:
@@ -657,6 +1139,9 @@ class IsTableauDeBordLine(models.Model):
         elif self.display_mode == 'pivot':
             views = [[False, 'pivot'], [False, 'list'], [False, 'form']]
             view_mode = 'pivot,list,form'
+        elif self.display_mode == 'kpi':
+            views = [[False, 'graph'], [False, 'list'], [False, 'form']]
+            view_mode = 'graph,list,form'
         else:  # auto ou non défini
             # Utiliser toutes les vues disponibles
             views = [[False, 'list'], [False, 'graph'], [False, 'pivot'], [False, 'form']]
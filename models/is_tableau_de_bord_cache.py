@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+import json
+from datetime import timedelta
+from psycopg2 import IntegrityError
+from odoo import models, fields, api
+
+
+class IsTableauDeBordCache(models.Model):
+    """Résultats calculés des lignes de tableau de bord, par utilisateur
+
+    Une entrée est identifiée par la ligne, l'utilisateur et une clé regroupant le
+    filtre, les valeurs des filtres du tableau de bord, la langue, le fuseau et les
+    sociétés actives. Elle est ignorée dès que la ligne ou la recherche enregistrée
+    est modifiée après son calcul, quand l'empreinte des données lues par la ligne a
+    changé depuis son calcul, ou à son expiration.
+    """
+    _name = 'is.tableau.de.bord.cache'
+    _description = 'Cache des résultats du tableau de bord'
+    _order = 'computed_at desc, id desc'
+
+    line_id = fields.Many2one('is.tableau.de.bord.line', string='Ligne', required=True, ondelete='cascade', index=True)
+    tableau_id = fields.Many2one(related='line_id.tableau_id', string='Tableau de bord', store=True)
+    user_id = fields.Many2one('res.users', string='Utilisateur', required=True, ondelete='cascade', index=True)
+    cache_key = fields.Char('Clé', required=True, index=True)
+    payload = fields.Text('Résultat (JSON)')
+    computed_at = fields.Datetime('Calculé le', required=True)
+    expires_at = fields.Datetime('Expire le', required=True, index=True)
+    duration_ms = fields.Integer('Durée du calcul (ms)')
+    data_fingerprint = fields.Char('Empreinte des données', help='Empreinte des données lues au moment du calcul : instantané, agrégat pré-calculé ou enregistrements du domaine')
+    origin = fields.Selection([
+        ('request', 'Consultation'),
+        ('precompute', 'Pré-calcul'),
+        ('kiosk', 'Écran kiosque'),
+    ], string='Origine', default='request', required=True)
+
+    _sql_constraints = [
+        ('unique_line_user_key', 'UNIQUE(line_id, user_id, cache_key)', 'Une seule entrée par ligne, utilisateur et clé !'),
+    ]
+
+    @api.model
+    def _cache_key(self, filter_id, filters_values, variant=None):
+        """Clé des paramètres qui changent le résultat pour un même utilisateur et une même ligne
+
+        variant distingue plusieurs rendus d'une même ligne (nombre de points d'une courbe).
+        """
+        values = {str(key): value for key, value in (filters_values or {}).items() if value}
+        key = [
+            int(filter_id),
+            sorted(values.items()),
+            self.env.context.get('lang'),
+            self.env.context.get('tz'),
+            sorted(self.env.companies.ids),
+        ]
+        if variant is not None:
+            key.append(variant)
+        return hashlib.sha1(json.dumps(key, default=str).encode()).hexdigest()
+
+    @api.model
+    def _get_entry(self, line, cache_key):
+        """Entrée du cache de la ligne pour l'utilisateur courant, ou enregistrement vide
+
+        L'entrée est ignorée si elle a expiré ou si la ligne ou la recherche enregistrée
+        ont été modifiées depuis son calcul. L'empreinte des données (data_fingerprint)
+        est vérifiée par l'appelant, qui sait l'établir pour l'origine des données.
+        """
+        entry = self.sudo().search([
+            ('line_id', '=', line.id),
+            ('user_id', '=', self.env.uid),
+            ('cache_key', '=', cache_key),
+            ('expires_at', '>', fields.Datetime.now()),
+        ], limit=1)
+        if not entry:
+            return entry
+        changed = max(line.write_date, line.filter_id.write_date or line.write_date)
+        if entry.computed_at < changed:
+            return self.browse()
+        return entry
+
+    @api.model
+    def _is_stored(self, line, payload, origin='request'):
+        """Vrai si le résultat sera enregistré : tableau de bord avec cache (ou pré-calcul et kiosque), sans erreur"""
+        return not payload.get('error') and bool(line.tableau_id.cache_duration or origin != 'request')
+
+    @api.model
+    def _store_payload(self, line, cache_key, payload, duration_ms, origin='request', data_fingerprint=None):
+        """Enregistre le résultat calculé si le tableau de bord utilise le cache (ou en pré-calcul et kiosque)"""
+        if not self._is_stored(line, payload, origin):
+            return
+        duration = line.tableau_id.cache_duration
+        now = fields.Datetime.now()
+        vals = {
+            'payload': json.dumps({key: value for key, value in payload.items() if key != '_perf'}, default=str),
+            'computed_at': now,
+            'expires_at': now + (timedelta(minutes=duration) if duration else timedelta(days=1)),
+            'duration_ms': duration_ms,
+            'origin': origin,
+            'data_fingerprint': data_fingerprint or False,
+        }
+        Cache = self.sudo()
+        try:
+            with self.env.cr.savepoint():
+                entry = Cache.search([
+                    ('line_id', '=', line.id),
+                    ('user_id', '=', self.env.uid),
+                    ('cache_key', '=', cache_key),
+                ], limit=1)
+                if entry:
+                    entry.write(vals)
+                else:
+                    Cache.create(dict(vals, line_id=line.id, user_id=self.env.uid, cache_key=cache_key))
+        except IntegrityError:
+            # Calcul concurrent du même résultat : l'autre entrée suffit
+            pass
+
+    @api.autovacuum
+    def _gc_expired(self):
+        """Supprime les entrées expirées"""
+        self.sudo().search([('expires_at', '<=', fields.Datetime.now())]).unlink()
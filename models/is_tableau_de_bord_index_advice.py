@@ -0,0 +1,497 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+import json
+import logging
+import re
+from contextlib import closing
+import psycopg2
+from odoo import models, fields, api, sql_db
+from odoo.exceptions import UserError
+from odoo.osv import expression
+from odoo.tools import SQL
+
+_logger = logging.getLogger(__name__)
+
+# Classement des opérateurs de domaine
+EQUALITY_OPERATORS = ('=', 'in', '=?')
+RANGE_OPERATORS = ('<', '<=', '>', '>=')
+LIKE_OPERATORS = ('like', 'ilike', '=like', '=ilike', 'not like', 'not ilike')
+
+# Colonne à peu de valeurs distinctes : son égalité à une constante devient la condition d'un index partiel
+PARTIAL_MAX_DISTINCT = 20
+
+# Nombre maximum de colonnes de regroupement et de mesures ajoutées en INCLUDE (index couvrant)
+INCLUDE_MAX_COLUMNS = 4
+
+# Nom d'index accepté à la création (préfixe du module, identifiant PostgreSQL de 63 caractères au plus)
+INDEX_NAME_RE = re.compile(r'^tdb_[a-z0-9_]{1,59}$')
+
+# Types des valeurs acceptées dans la condition d'un index partiel
+PARTIAL_VALUE_TYPES = (str, int, float, bool)
+
+# Valeurs types pour reproduire les filtres dynamiques du tableau de bord (texte par défaut)
+FILTER_SAMPLES = {
+    'date': '2025',
+    'datetime': '2025',
+    'integer': '>0',
+    'float': '>0',
+    'monetary': '>0',
+    'boolean': '1',
+}
+
+
+def _format_count(value):
+    return f"{value:,.0f}".replace(',', ' ')
+
+
+def _and_leaves(domain):
+    """Conditions d'un domaine qui s'appliquent à tous les enregistrements (reliées par ET)
+
+    Les conditions sous un OU ou un NON ne sont pas retenues : un index sur
+    celles-ci ne serait pas utilisable pour toute la requête.
+    """
+    if not domain:
+        return []
+    domain = expression.normalize_domain(list(domain))
+
+    def parse(pos):
+        token = domain[pos]
+        if token == '!':
+            _leaves, end = parse(pos + 1)
+            return [], end
+        if token in ('&', '|'):
+            left, end = parse(pos + 1)
+            right, end = parse(end)
+            return (left + right if token == '&' else []), end
+        return [token], pos + 1
+
+    try:
+        return parse(0)[0]
+    except (IndexError, TypeError):
+        return []
+
+
+class IsTableauDeBordIndexAdvice(models.Model):
+    """Index conseillés pour les lignes de tableau de bord
+
+    L'analyse parcourt les lignes des tableaux de bord actifs : conditions (ET) de
+    la recherche enregistrée, champs des filtres du tableau de bord, champ date de
+    la période, regroupements et mesures. Elle propose par table un index B-tree
+    composite (égalités les plus sélectives d'abord, puis plage de dates), partiel
+    pour les colonnes à peu de valeurs (pg_stats), couvrant pour les regroupements
+    et mesures, et un index trigramme pour les recherches ilike.
+
+    Le gain estimé est le nombre de lignes lues en moins par chargement, d'après le
+    plan EXPLAIN actuel de la requête de chaque ligne (lignes lues - lignes retenues).
+    """
+    _name = 'is.tableau.de.bord.index.advice'
+    _description = 'Conseil d\'index du tableau de bord'
+    _order = 'state, benefit desc, id'
+
+    name = fields.Char('Nom de l\'index', required=True, readonly=True)
+    model_id = fields.Many2one('ir.model', string='Modèle', ondelete='cascade', readonly=True)
+    table_name = fields.Char('Table', required=True, readonly=True)
+    index_type = fields.Selection([
+        ('btree', 'B-tree'),
+        ('trigram', 'Trigramme (GIN)'),
+    ], string='Type', required=True, readonly=True)
+    columns = fields.Char('Colonnes', readonly=True)
+    include_columns = fields.Char('Colonnes incluses', readonly=True)
+    where_clause = fields.Char('Condition (index partiel)', readonly=True)
+    partial_conditions = fields.Text('Conditions de l\'index partiel (JSON)', readonly=True,
+                                     help='Liste [colonne, valeur] des égalités de l\'index partiel')
+    definition = fields.Text('Instruction SQL', compute='_compute_definition',
+                             help='Reconstruite à partir de la table, des colonnes et des conditions, vérifiées avant la création')
+    reason = fields.Text('Justification', readonly=True)
+    line_ids = fields.Many2many(
+        'is.tableau.de.bord.line', 'is_tableau_de_bord_index_advice_line_rel', 'advice_id', 'line_id',
+        string='Lignes concernées', readonly=True,
+    )
+    line_count = fields.Integer('Nombre de lignes', readonly=True)
+    rows_read = fields.Float('Lignes lues actuellement', digits=(16, 0), readonly=True)
+    rows_matched = fields.Float('Lignes retenues', digits=(16, 0), readonly=True)
+    benefit = fields.Float('Gain estimé (lignes évitées par chargement)', digits=(16, 0), readonly=True)
+    state = fields.Selection([
+        ('proposed', 'Proposé'),
+        ('approved', 'Approuvé'),
+        ('created', 'Créé'),
+        ('rejected', 'Rejeté'),
+    ], string='État', default='proposed', required=True, readonly=True)
+    concurrently = fields.Boolean('Sans verrou (CONCURRENTLY)', default=True, help='Créer l\'index sans bloquer les écritures sur la table (plus long, hors transaction)')
+    created_date = fields.Datetime('Créé le', readonly=True)
+
+    @api.depends('model_id', 'table_name', 'index_type', 'columns', 'include_columns', 'partial_conditions', 'concurrently')
+    def _compute_definition(self):
+        for advice in self:
+            try:
+                statement = advice._index_statement()
+                advice.definition = self.env.cr.mogrify(statement.code, statement.params).decode()
+            except UserError as e:
+                advice.definition = f"-- {e}"
+
+    @api.model
+    def action_analyse(self):
+        """Recalcule les propositions à partir des lignes des tableaux de bord actifs
+
+        Les propositions non traitées sont remplacées ; celles approuvées, créées ou
+        rejetées sont conservées et leurs estimations mises à jour.
+        """
+        from ..controllers.main import TableauDeBordController
+        controller = TableauDeBordController()
+        lines = self.env['is.tableau.de.bord.line'].search([
+            ('tableau_id.active', '=', True),
+            ('filter_id', '!=', False),
+        ])
+        proposals = {}
+        for line in lines:
+            try:
+                with self.env.cr.savepoint():
+                    line_proposals = self._line_proposals(controller, line)
+            except Exception:
+                _logger.exception("Analyse des index de la ligne %s impossible", line.id)
+                continue
+            for proposal in line_proposals:
+                current = proposals.get(proposal['name'])
+                if not current:
+                    proposals[proposal['name']] = dict(proposal, line_ids={line.id}, reasons=[proposal['reason']])
+                    continue
+                current['line_ids'].add(line.id)
+                current['include'] = list(dict.fromkeys(current['include'] + proposal['include']))[:INCLUDE_MAX_COLUMNS]
+                current['rows_read'] = max(current['rows_read'], proposal['rows_read'])
+                current['rows_matched'] = max(current['rows_matched'], proposal['rows_matched'])
+                current['benefit'] += proposal['benefit']
+                if proposal['reason'] not in current['reasons']:
+                    current['reasons'].append(proposal['reason'])
+
+        self.search([('state', '=', 'proposed')]).unlink()
+        kept = {advice.name: advice for advice in self.search([])}
+        existing = {}
+        for name, proposal in proposals.items():
+            table = proposal['table_name']
+            if table not in existing:
+                existing[table] = self._existing_indexes(table)
+            if self._is_covered(proposal, existing[table]):
+                continue
+            vals = {
+                'model_id': self.env['ir.model']._get_id(proposal['model']),
+                'table_name': table,
+                'index_type': proposal['index_type'],
+                'columns': ', '.join(proposal['columns']),
+                'include_columns': ', '.join(proposal['include']),
+                'where_clause': proposal['where'] or False,
+                'partial_conditions': json.dumps(proposal['partial']) if proposal['partial'] else False,
+                'reason': '\n'.join(proposal['reasons']),
+                'line_ids': [(6, 0, sorted(proposal['line_ids']))],
+                'line_count': len(proposal['line_ids']),
+                'rows_read': proposal['rows_read'],
+                'rows_matched': proposal['rows_matched'],
+                'benefit': proposal['benefit'],
+            }
+            if name in kept:
+                if kept[name].state != 'created':
+                    kept[name].write(vals)
+            else:
+                self.create(dict(vals, name=name))
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'soft_reload',
+        }
+
+    @api.model
+    def _line_proposals(self, controller, line):
+        """Index utiles à une ligne : B-tree composite et trigrammes, avec leur gain estimé"""
+        Model = self.env[line.filter_id.model_id]
+        if not Model._auto or Model._abstract or Model._table_query:
+            return []
+        table = Model._table
+        domain = controller._eval_filter_domain(self.env, line.filter_id)
+        leaves = _and_leaves(domain)
+        for line_filter in line.line_filter_ids:
+            ttype = line_filter.field_id.ttype
+            leaves += controller._parse_filter_value(
+                line_filter.field_id.name, ttype, FILTER_SAMPLES.get(ttype, 'abc'), line_filter.filter_def_id.filter_type,
+            )
+        distinct = self._column_distinct(table)
+
+        def column(fname):
+            field = Model._fields.get(fname)
+            return fname if field and field.store and field.column_type and fname != 'id' else None
+
+        equality, ranges, partial, trigrams = [], [], [], []
+        for leaf in leaves:
+            if not isinstance(leaf, (list, tuple)) or len(leaf) != 3 or not isinstance(leaf[0], str):
+                continue
+            path, operator, value = leaf
+            fname, _dot, subpath = path.partition('.')
+            if not column(fname):
+                continue
+            operator = str(operator).lower()
+            if operator in LIKE_OPERATORS:
+                target = self._trigram_target(Model, fname, subpath)
+                if target:
+                    trigrams.append(target)
+            elif subpath:
+                # Condition sur le modèle lié : filtre « colonne IN (sous-requête) »
+                equality.append(fname)
+            elif operator in RANGE_OPERATORS:
+                ranges.append(fname)
+            elif operator in EQUALITY_OPERATORS:
+                if (operator == '=' and value is not False and isinstance(value, PARTIAL_VALUE_TYPES)
+                        and 0 < distinct.get(fname, 0) <= PARTIAL_MAX_DISTINCT):
+                    partial.append((fname, value))
+                else:
+                    equality.append(fname)
+        if line.date_field and line.period_type not in (False, 'none') and column(line.date_field):
+            ranges.insert(0, line.date_field)
+
+        extra = []
+        for spec in (line.graph_groupbys, line.pivot_row_groupby, line.pivot_col_groupby,
+                     line.list_groupby, line.graph_measure, line.pivot_measure):
+            for item in (spec or '').split(','):
+                fname = column(item.strip().split(':')[0])
+                if fname:
+                    extra.append(fname)
+
+        rows_read, rows_matched = self._plan_estimate(line, Model, domain)
+        proposals = []
+
+        key = sorted(set(equality), key=lambda fname: -distinct.get(fname, 0))
+        range_column = next((fname for fname in ranges if fname not in key), None)
+        if range_column:
+            key.append(range_column)
+        if not key and partial and extra:
+            key = [extra[0]]
+        if key:
+            where = ''
+            if partial:
+                where_sql = self._partial_sql(partial)
+                where = self.env.cr.mogrify(where_sql.code, where_sql.params).decode()
+            include = [fname for fname in dict.fromkeys(extra) if fname not in key][:INCLUDE_MAX_COLUMNS]
+            reason = (
+                f"{line.tableau_id.name} / {line.name} : "
+                f"égalités {', '.join(sorted(set(equality))) or '-'} ; plage {range_column or '-'}"
+                f"{' ; partiel ' + where if where else ''} ; "
+                f"lecture estimée {_format_count(rows_read)} → {_format_count(rows_matched)} lignes"
+            )
+            proposal = self._proposal(Model, 'btree', key, include, where, rows_read, rows_matched, reason)
+            proposal['partial'] = [list(condition) for condition in dict.fromkeys(partial)]
+            proposals.append(proposal)
+
+        for target_model, fname in dict.fromkeys(trigrams):
+            target_rows = self._table_rows(target_model._table)
+            reason = (
+                f"{line.tableau_id.name} / {line.name} : recherche ilike sur {target_model._name}.{fname}, "
+                f"parcours complet de {_format_count(target_rows)} lignes"
+            )
+            proposals.append(self._proposal(target_model, 'trigram', [fname], [], '', target_rows, 0, reason))
+        return proposals
+
+    @api.model
+    def _proposal(self, Model, index_type, columns, include, where, rows_read, rows_matched, reason):
+        table = Model._table
+        digest = hashlib.sha1(repr((table, index_type, columns, where)).encode()).hexdigest()[:8]
+        base = f"tdb_{table}_{'_'.join(columns)}{'_trgm' if index_type == 'trigram' else ''}"
+        return {
+            'name': f"{base[:54]}_{digest}",
+            'model': Model._name,
+            'table_name': table,
+            'index_type': index_type,
+            'columns': list(columns),
+            'include': list(include),
+            'where': where,
+            'partial': [],
+            'rows_read': rows_read,
+            'rows_matched': rows_matched,
+            'benefit': max(rows_read - rows_matched, 0),
+            'reason': reason,
+        }
+
+    @api.model
+    def _trigram_target(self, Model, fname, subpath):
+        """(modèle, champ) recherché par ilike, en suivant au plus un many2one"""
+        field = Model._fields[fname]
+        if subpath:
+            if field.type != 'many2one':
+                return None
+            Model = self.env[field.comodel_name]
+            fname = subpath.split('.')[0]
+            field = Model._fields.get(fname)
+            if not field or not field.store or not Model._auto or Model._table_query:
+                return None
+        if field.type not in ('char', 'text', 'html'):
+            return None
+        return (Model, fname)
+
+    @api.model
+    def _plan_estimate(self, line, Model, domain):
+        """(lignes lues, lignes retenues) par la requête de la ligne selon son plan EXPLAIN actuel"""
+        try:
+            with self.env.cr.savepoint():
+                query = Model._search(domain)
+                self.env.cr.execute(SQL("EXPLAIN (FORMAT JSON) %s", query.select(SQL("1"))))
+                root = self.env.cr.fetchone()[0][0]['Plan']
+        except Exception:
+            return 0.0, 0.0
+        return float(line._plan_rows_read(root)), float(root.get('Plan Rows', 0))
+
+    @api.model
+    def _table_rows(self, table):
+        self.env.cr.execute(SQL("SELECT GREATEST(reltuples, 0) FROM pg_class WHERE relname = %s AND relkind = 'r'", table))
+        row = self.env.cr.fetchone()
+        return float(row[0]) if row else 0.0
+
+    @api.model
+    def _column_distinct(self, table):
+        """Nombre estimé de valeurs distinctes par colonne (pg_stats ; négatif = proportion des lignes)"""
+        rows = self._table_rows(table)
+        self.env.cr.execute(SQL(
+            "SELECT attname, n_distinct FROM pg_stats WHERE schemaname = current_schema() AND tablename = %s",
+            table,
+        ))
+        return {
+            attname: (-n_distinct * rows if n_distinct < 0 else n_distinct)
+            for attname, n_distinct in self.env.cr.fetchall()
+        }
+
+    @api.model
+    def _existing_indexes(self, table):
+        """Index existants de la table : (méthode, colonnes clés, condition)"""
+        self.env.cr.execute(SQL("""
+            SELECT am.amname,
+                   array_agg(a.attname ORDER BY k.ord),
+                   pg_get_expr(i.indpred, i.indrelid)
+              FROM pg_index i
+              JOIN pg_class c ON c.oid = i.indrelid
+              JOIN pg_class ic ON ic.oid = i.indexrelid
+              JOIN pg_am am ON am.oid = ic.relam
+             CROSS JOIN LATERAL unnest(i.indkey::int2[]) WITH ORDINALITY AS k(attnum, ord)
+              JOIN pg_attribute a ON a.attrelid = c.oid AND a.attnum = k.attnum
+             WHERE c.relname = %s AND c.relnamespace = current_schema()::regnamespace AND k.ord <= i.indnkeyatts
+          GROUP BY i.indexrelid, am.amname, i.indpred, i.indrelid
+        """, table))
+        return self.env.cr.fetchall()
+
+    @api.model
+    def _is_covered(self, proposal, indexes):
+        """Vrai si un index existant sert déjà la proposition"""
+        columns = proposal['columns']
+        for method, index_columns, predicate in indexes:
+            if proposal['index_type'] == 'trigram':
+                if method == 'gin' and columns[0] in index_columns:
+                    return True
+            elif method == 'btree' and list(index_columns[:len(columns)]) == columns and not predicate:
+                return True
+        return False
+
+    @api.model
+    def _partial_sql(self, conditions):
+        """Condition d'un index partiel : égalités colonne = valeur (valeurs passées en paramètres)"""
+        return SQL(" AND ").join(SQL("%s = %s", SQL.identifier(fname), value) for fname, value in conditions)
+
+    def _index_statement(self):
+        """Instruction CREATE INDEX reconstruite à partir des champs de la proposition
+
+        Le modèle, la table, les colonnes et les conditions sont vérifiés (champs stockés
+        du modèle présents dans information_schema, nom préfixé) et les identifiants
+        protégés : aucun texte saisi n'est exécuté tel quel.
+        """
+        self.ensure_one()
+        Model = self.env.get(self.model_id.model) if self.model_id else None
+        if (Model is None or Model._table != self.table_name or not Model._auto
+                or Model._abstract or Model._table_query):
+            raise UserError(f"Table {self.table_name} invalide pour le modèle {self.model_id.model or '-'}")
+        if not INDEX_NAME_RE.match(self.name or ''):
+            raise UserError(f"Nom d'index invalide : {self.name}")
+        self.env.cr.execute(SQL(
+            "SELECT column_name FROM information_schema.columns WHERE table_schema = current_schema() AND table_name = %s",
+            self.table_name,
+        ))
+        table_columns = {row[0] for row in self.env.cr.fetchall()}
+
+        def checked(names):
+            result = []
+            for fname in names:
+                field = Model._fields.get(fname)
+                if not field or not field.store or not field.column_type or fname not in table_columns:
+                    raise UserError(f"Colonne {fname} invalide pour la table {self.table_name}")
+                result.append(fname)
+            return result
+
+        def split(value):
+            return [fname.strip() for fname in (value or '').split(',') if fname.strip()]
+
+        columns = checked(split(self.columns))
+        include = checked(split(self.include_columns))
+        try:
+            conditions = json.loads(self.partial_conditions) if self.partial_conditions else []
+        except ValueError:
+            raise UserError(f"Conditions de l'index partiel {self.name} invalides")
+        if self.where_clause and not conditions:
+            # Proposition antérieure aux conditions structurées : relancer l'analyse
+            raise UserError(f"Conditions de l'index partiel {self.name} absentes, relancer l'analyse")
+        if not columns or not all(
+            isinstance(condition, list) and len(condition) == 2 and isinstance(condition[1], PARTIAL_VALUE_TYPES)
+            for condition in conditions
+        ):
+            raise UserError(f"Définition de l'index {self.name} invalide")
+        checked([fname for fname, _value in conditions])
+
+        concurrently = SQL("CONCURRENTLY") if self.concurrently else SQL()
+        name = SQL.identifier(self.name)
+        table = SQL.identifier(self.table_name)
+        if self.index_type == 'trigram':
+            fname = columns[0]
+            if Model._fields[fname].translate:
+                # Même expression que les index trigram de l'ORM sur les champs traduits
+                expr = SQL("(jsonb_path_query_array(%s, '$.*')::text) gin_trgm_ops", SQL.identifier(fname))
+            else:
+                expr = SQL("%s gin_trgm_ops", SQL.identifier(fname))
+            return SQL("CREATE INDEX %s %s ON %s USING gin (%s)", concurrently, name, table, expr)
+        statement = SQL(
+            "CREATE INDEX %s %s ON %s (%s)", concurrently, name, table,
+            SQL(", ").join(SQL.identifier(fname) for fname in columns),
+        )
+        if include:
+            statement = SQL("%s INCLUDE (%s)", statement, SQL(", ").join(SQL.identifier(fname) for fname in include))
+        if conditions:
+            statement = SQL("%s WHERE %s", statement, self._partial_sql(conditions))
+        return statement
+
+    def action_approve(self):
+        self.filtered(lambda a: a.state in ('proposed', 'rejected')).write({'state': 'approved'})
+
+    def action_reject(self):
+        self.filtered(lambda a: a.state in ('proposed', 'approved')).write({'state': 'rejected'})
+
+    def action_create_index(self):
+        """Crée les index approuvés, sans verrou (CONCURRENTLY, hors transaction) si demandé
+
+        CREATE INDEX CONCURRENTLY ne peut s'exécuter dans une transaction : il passe par
+        une connexion dédiée en autocommit, hors du pool de connexions d'Odoo, fermée
+        aussitôt après.
+        """
+        for advice in self.filtered(lambda a: a.state == 'approved'):
+            if advice.index_type == 'trigram':
+                self.env.cr.execute(SQL("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'"))
+                if not self.env.cr.rowcount:
+                    raise UserError("L'extension PostgreSQL pg_trgm n'est pas installée (CREATE EXTENSION pg_trgm)")
+            statement = advice._index_statement()
+            try:
+                if advice.concurrently:
+                    _dbname, connection_info = sql_db.connection_info_for(self.env.cr.dbname)
+                    with closing(psycopg2.connect(**connection_info)) as cnx:
+                        cnx.autocommit = True
+                        with cnx.cursor() as cr:
+                            cr.execute(statement.code, statement.params)
+                else:
+                    with self.env.cr.savepoint():
+                        self.env.cr.execute(statement)
+            except Exception as e:
+                raise UserError(
+                    f"Création de l'index {advice.name} impossible : {e}\n"
+                    "Un index CONCURRENTLY interrompu reste invalide et doit être supprimé (DROP INDEX)."
+                )
+            _logger.info("Index %s créé : %s", advice.name, advice.definition)
+            advice.write({'state': 'created', 'created_date': fields.Datetime.now()})
+        return True
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import secrets
+from datetime import timedelta
+from odoo import models, fields, api
+
+_logger = logging.getLogger(__name__)
+
+
+def _new_token():
+    return secrets.token_urlsafe(24)
+
+
+class IsTableauDeBordKiosk(models.Model):
+    """Écran kiosque : tableaux de bord affichés en rotation sur une URL à jeton
+
+    Les résultats des lignes sont calculés une seule fois par une tâche planifiée,
+    avec les droits de l'utilisateur technique désigné, et stockés dans le cache des
+    résultats : tous les écrans ouverts sur le même jeton les partagent.
+    """
+    _name = 'is.tableau.de.bord.kiosk'
+    _description = 'Écran kiosque de tableaux de bord'
+    _order = 'name'
+
+    name = fields.Char('Nom', required=True)
+    active = fields.Boolean('Actif', default=True)
+    access_token = fields.Char('Jeton d\'accès', required=True, readonly=True, copy=False, index=True, default=_new_token)
+    url = fields.Char('URL de l\'écran', compute='_compute_url')
+    user_id = fields.Many2one(
+        'res.users', string='Utilisateur technique', required=True, ondelete='restrict',
+        help="Les lignes sont calculées avec les droits, la langue, le fuseau et les filtres mémorisés de cet utilisateur",
+    )
+    slide_ids = fields.One2many('is.tableau.de.bord.kiosk.slide', 'kiosk_id', string='Tableaux de bord', copy=True)
+    rotation_seconds = fields.Integer('Durée d\'affichage (secondes)', default=60,
+                                      help="Durée d'affichage de chaque tableau de bord avant de passer au suivant")
+    refresh_interval = fields.Integer('Recalcul (minutes)', default=5,
+                                      help="Intervalle de recalcul des lignes par la tâche planifiée ; les écrans rechargent les données au même rythme")
+    compute_date = fields.Datetime('Dernier calcul', readonly=True, copy=False)
+    compute_duration_ms = fields.Integer('Durée du dernier calcul (ms)', readonly=True, copy=False)
+
+    _sql_constraints = [
+        ('unique_access_token', 'UNIQUE(access_token)', 'Le jeton d\'accès doit être unique !'),
+    ]
+
+    @api.depends('access_token')
+    def _compute_url(self):
+        base_url = self.env['ir.config_parameter'].sudo().get_param('web.base.url')
+        for kiosk in self:
+            kiosk.url = f"{base_url}/tableau_de_bord/kiosk/{kiosk.access_token}"
+
+    def _kiosk_env(self):
+        """Environnement de l'utilisateur technique, avec son contexte (même clé de cache qu'à la consultation)"""
+        self.ensure_one()
+        env = self.env(user=self.user_id.id, su=False)
+        return env(context=env['res.users'].context_get())
+
+    @api.model
+    def _cron_compute(self):
+        """Tâche planifiée : recalcule les écrans dont l'intervalle de recalcul est échu"""
+        now = fields.Datetime.now()
+        for kiosk in self.search([]):
+            interval = timedelta(minutes=max(kiosk.refresh_interval, 1))
+            if not kiosk.compute_date or kiosk.compute_date + interval <= now:
+                kiosk.action_compute()
+
+    def action_compute(self):
+        """Calcule chaque ligne des tableaux de bord de l'écran pour l'utilisateur technique"""
+        from ..controllers.main import TableauDeBordController
+        controller = TableauDeBordController()
+        for kiosk in self:
+            env = kiosk._kiosk_env()
+            started = fields.Datetime.now()
+            total_ms = 0
+            for dashboard in kiosk.slide_ids.dashboard_id:
+                filters_values = env['is.tableau.de.bord.mem.filter'].get_filters(dashboard.id)
+                for line in dashboard.line_ids.filtered('filter_id'):
+                    try:
+                        with self.env.cr.savepoint():
+                            _result, duration_ms = controller._cached_filter_data(
+                                env, line.filter_id.id, line.id, filters_values=filters_values,
+                                origin='kiosk', force=True,
+                            )
+                            total_ms += duration_ms
+                    except Exception:
+                        _logger.exception("Erreur lors du calcul de la ligne %s pour l'écran %s", line.id, kiosk.name)
+            kiosk.write({'compute_date': started, 'compute_duration_ms': total_ms})
+        return True
+
+    def action_regenerate_token(self):
+        """Nouveau jeton : les écrans ouverts sur l'ancienne URL n'ont plus accès"""
+        for kiosk in self:
+            kiosk.access_token = _new_token()
+        return True
+
+    def action_open_kiosk(self):
+        """Ouvre l'écran dans un nouvel onglet"""
+        self.ensure_one()
+        return {
+            'type': 'ir.actions.act_url',
+            'url': self.url,
+            'target': 'new',
+        }
+
+
+class IsTableauDeBordKioskSlide(models.Model):
+    """Tableau de bord affiché par un écran kiosque, dans l'ordre de rotation"""
+    _name = 'is.tableau.de.bord.kiosk.slide'
+    _description = 'Tableau de bord d\'un écran kiosque'
+    _order = 'sequence, id'
+
+    kiosk_id = fields.Many2one('is.tableau.de.bord.kiosk', string='Écran', required=True, ondelete='cascade', index=True)
+    sequence = fields.Integer('Séquence', default=10)
+    dashboard_id = fields.Many2one('is.tableau.de.bord', string='Tableau de bord', required=True, ondelete='cascade')
+    duration = fields.Integer('Durée d\'affichage (secondes)', help="0 = durée de l'écran")
@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+
+import json
+import logging
+import random
+from collections import defaultdict
+from datetime import timedelta
+from odoo import models, fields, api, tools
+from odoo.tools import SQL
+
+_logger = logging.getLogger(__name__)
+
+# Nombre maximum de durées conservées par ligne et par jour pour le calcul des centiles
+PERF_SAMPLE_SIZE = 500
+
+# Conservation des statistiques (jours)
+PERF_RETENTION_DAYS = 180
+
+
+def _percentile(values, fraction):
+    """Centile par interpolation linéaire (même méthode que percentile_cont)"""
+    if not values:
+        return 0.0
+    values = sorted(values)
+    position = (len(values) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+class IsTableauDeBordPerfStat(models.Model):
+    """Statistiques journalières de temps de réponse des lignes de tableau de bord
+
+    Une entrée par ligne et par jour, alimentée par lots depuis le contrôleur :
+    nombre d'appels, succès du cache, erreurs, lignes lues, requêtes SQL et
+    durées (médiane, 95e centile, maximum) calculées sur un échantillon des
+    durées du jour.
+    """
+    _name = 'is.tableau.de.bord.perf.stat'
+    _description = 'Statistiques de performance du tableau de bord'
+    _order = 'date desc, p95_ms desc'
+    _rec_name = 'line_id'
+
+    date = fields.Date('Date', required=True, index=True)
+    line_id = fields.Many2one('is.tableau.de.bord.line', string='Ligne', required=True, ondelete='cascade', index=True)
+    tableau_id = fields.Many2one(related='line_id.tableau_id', string='Tableau de bord', store=True)
+    display_mode = fields.Selection(related='line_id.display_mode', string='Mode d\'affichage', store=True)
+    call_count = fields.Integer('Appels', aggregator='sum')
+    hit_count = fields.Integer('Succès du cache', aggregator='sum')
+    error_count = fields.Integer('Erreurs', aggregator='sum')
+    hit_rate = fields.Float('Taux de succès du cache (%)', compute='_compute_rates', store=True, aggregator='avg', digits=(16, 1))
+    rows_total = fields.Integer('Lignes lues', aggregator='sum')
+    queries_total = fields.Integer('Requêtes SQL', aggregator='sum')
+    total_ms = fields.Float('Temps cumulé (ms)', aggregator='sum', digits=(16, 0))
+    avg_ms = fields.Float('Moyenne (ms)', compute='_compute_rates', store=True, aggregator='avg', digits=(16, 1))
+    p50_ms = fields.Float('Médiane (ms)', aggregator='avg', digits=(16, 1))
+    p95_ms = fields.Float('95e centile (ms)', aggregator='max', digits=(16, 1))
+    max_ms = fields.Float('Maximum (ms)', aggregator='max', digits=(16, 1))
+    samples = fields.Text('Échantillon des durées (JSON)')
+
+    _sql_constraints = [
+        ('unique_line_date', 'UNIQUE(line_id, date)', 'Une seule statistique par ligne et par jour !'),
+    ]
+
+    @api.depends('call_count', 'hit_count', 'total_ms')
+    def _compute_rates(self):
+        for stat in self:
+            stat.hit_rate = stat.call_count and 100.0 * stat.hit_count / stat.call_count
+            stat.avg_ms = stat.call_count and stat.total_ms / stat.call_count
+
+    @api.model
+    def _record_samples(self, samples):
+        """Intègre un lot de mesures du contrôleur
+
+        Args:
+            samples: liste de dict (line_id, date, total_ms, cache_hit, error, rows, queries)
+        """
+        by_key = defaultdict(list)
+        for sample in samples:
+            by_key[(sample['line_id'], sample['date'])].append(sample)
+        existing_lines = set(self.env['is.tableau.de.bord.line'].browse(
+            list({line_id for line_id, _day in by_key})
+        ).exists().ids)
+
+        for (line_id, day), items in by_key.items():
+            if line_id not in existing_lines:
+                continue
+            try:
+                with self.env.cr.savepoint():
+                    self._merge_samples(line_id, day, items)
+            except Exception:
+                # Mise à jour concurrente de la même journée : ce lot est abandonné
+                _logger.debug("Statistiques de la ligne %s du %s non enregistrées", line_id, day, exc_info=True)
+
+    def _merge_samples(self, line_id, day, items):
+        """Ajoute les mesures d'une ligne et d'un jour à la statistique correspondante"""
+        self.env.cr.execute(SQL(
+            "SELECT id FROM is_tableau_de_bord_perf_stat WHERE line_id = %s AND date = %s FOR UPDATE",
+            line_id, day,
+        ))
+        row = self.env.cr.fetchone()
+        stat = self.browse(row[0]) if row else self.browse()
+
+        durations = json.loads(stat.samples) if stat and stat.samples else []
+        durations.extend(item['total_ms'] for item in items if not item.get('error'))
+        if len(durations) > PERF_SAMPLE_SIZE:
+            durations = random.sample(durations, PERF_SAMPLE_SIZE)
+
+        vals = {
+            'call_count': stat.call_count + len(items),
+            'hit_count': stat.hit_count + sum(1 for item in items if item.get('cache_hit')),
+            'error_count': stat.error_count + sum(1 for item in items if item.get('error')),
+            'rows_total': stat.rows_total + sum(item.get('rows') or 0 for item in items),
+            'queries_total': stat.queries_total + sum(item.get('queries') or 0 for item in items),
+            'total_ms': stat.total_ms + sum(item['total_ms'] for item in items),
+            'max_ms': max([stat.max_ms] + [item['total_ms'] for item in items]),
+            'p50_ms': _percentile(durations, 0.5),
+            'p95_ms': _percentile(durations, 0.95),
+            'samples': json.dumps([round(value, 1) for value in durations]),
+        }
+        if stat:
+            stat.write(vals)
+        else:
+            self.create(dict(vals, line_id=line_id, date=day))
+
+    @api.autovacuum
+    def _gc_old_stats(self):
+        """Supprime les statistiques anciennes"""
+        limit = fields.Date.today() - timedelta(days=PERF_RETENTION_DAYS)
+        self.sudo().search([('date', '<', limit)]).unlink()
+
+
+class IsTableauDeBordPerfReport(models.Model):
+    """Éléments les plus lents des 30 derniers jours (vue SQL sur les statistiques journalières)"""
+    _name = 'is.tableau.de.bord.perf.report'
+    _description = 'Éléments de tableau de bord les plus lents'
+    _auto = False
+    _order = 'total_ms desc'
+    _rec_name = 'line_id'
+
+    line_id = fields.Many2one('is.tableau.de.bord.line', string='Ligne', readonly=True)
+    tableau_id = fields.Many2one('is.tableau.de.bord', string='Tableau de bord', readonly=True)
+    display_mode = fields.Selection(related='line_id.display_mode', string='Mode d\'affichage')
+    filter_id = fields.Many2one(related='line_id.filter_id', string='Recherche enregistrée')
+    call_count = fields.Integer('Appels', readonly=True)
+    error_count = fields.Integer('Erreurs', readonly=True)
+    hit_rate = fields.Float('Taux de succès du cache (%)', readonly=True, aggregator='avg', digits=(16, 1))
+    rows_avg = fields.Float('Lignes lues par appel', readonly=True, aggregator='avg', digits=(16, 0))
+    queries_avg = fields.Float('Requêtes SQL par appel', readonly=True, aggregator='avg', digits=(16, 1))
+    total_ms = fields.Float('Temps cumulé (ms)', readonly=True, digits=(16, 0))
+    avg_ms = fields.Float('Moyenne (ms)', readonly=True, aggregator='avg', digits=(16, 1))
+    p95_ms = fields.Float('95e centile journalier max (ms)', readonly=True, aggregator='max', digits=(16, 1))
+    max_ms = fields.Float('Maximum (ms)', readonly=True, aggregator='max', digits=(16, 1))
+
+    def init(self):
+        tools.drop_view_if_exists(self.env.cr, self._table)
+        self.env.cr.execute(SQL("""
+            CREATE OR REPLACE VIEW %s AS (
+                SELECT s.line_id AS id,
+                       s.line_id,
+                       s.tableau_id,
+                       SUM(s.call_count) AS call_count,
+                       SUM(s.error_count) AS error_count,
+                       100.0 * SUM(s.hit_count) / NULLIF(SUM(s.call_count), 0) AS hit_rate,
+                       SUM(s.rows_total)::float / NULLIF(SUM(s.call_count), 0) AS rows_avg,
+                       SUM(s.queries_total)::float / NULLIF(SUM(s.call_count), 0) AS queries_avg,
+                       SUM(s.total_ms) AS total_ms,
+                       SUM(s.total_ms) / NULLIF(SUM(s.call_count), 0) AS avg_ms,
+                       MAX(s.p95_ms) AS p95_ms,
+                       MAX(s.max_ms) AS max_ms
+                  FROM is_tableau_de_bord_perf_stat s
+                 WHERE s.date >= CURRENT_DATE - 30
+              GROUP BY s.line_id, s.tableau_id
+            )
+        """, SQL.identifier(self._table)))
+
+    def action_open_line(self):
+        """Ouvre la ligne de tableau de bord concernée"""
+        self.ensure_one()
+        return {
+            'type': 'ir.actions.act_window',
+            'res_model': 'is.tableau.de.bord.line',
+            'res_id': self.line_id.id,
+            'view_mode': 'form',
+            'target': 'current',
+        }
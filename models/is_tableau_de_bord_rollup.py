@@ -0,0 +1,425 @@
+# -*- coding: utf-8 -*-
+
+import logging
+from odoo import models, fields, api
+from odoo.exceptions import ValidationError
+from odoo.osv import expression
+from odoo.tools import SQL
+from odoo.tools.query import Query
+
+_logger = logging.getLogger(__name__)
+
+# Types de champs acceptés pour le regroupement et la mesure d'un agrégat
+ROLLUP_GROUPBY_TYPES = ('many2one', 'selection', 'char', 'integer', 'boolean')
+ROLLUP_MEASURE_TYPES = ('integer', 'float', 'monetary')
+
+# Classe des verrous consultatifs (pg_advisory_xact_lock) de mise à jour des agrégats, le second entier étant l'id
+ROLLUP_LOCK_CLASS = 7402
+
+
+class IsTableauDeBordRollup(models.Model):
+    """Agrégats journaliers pré-calculés d'un modèle
+
+    Pour un couple (champ date, champ de regroupement, mesure), une table
+    is_tableau_de_bord_rollup_<id> conserve par jour, par valeur de regroupement et
+    par société (modèles multi-sociétés) le nombre d'enregistrements, le nombre de
+    mesures renseignées et leur somme.
+
+    Des déclencheurs PostgreSQL sur la table du modèle notent les jours modifiés
+    (création, modification des colonnes utiles, suppression, y compris hors ORM),
+    une seule fois par jour ; seuls ces jours sont recalculés, par la tâche
+    planifiée ou à la lecture si le verrou de l'agrégat est libre (sinon la lecture
+    se fait en direct sur la table du modèle).
+    """
+    _name = 'is.tableau.de.bord.rollup'
+    _description = 'Agrégats journaliers pré-calculés'
+    _order = 'name'
+
+    name = fields.Char('Nom', required=True)
+    active = fields.Boolean('Actif', default=True)
+    model_id = fields.Many2one(
+        'ir.model', string='Modèle', required=True, ondelete='cascade',
+        help="Les agrégats sont conservés par société si le modèle a un champ company_id stocké. "
+             "Ils ne servent un utilisateur que si les règles d'accès du modèle ne portent que sur "
+             "le champ date, le champ de regroupement et la société (règle multi-société usuelle) ; "
+             "sinon ses tuiles sont calculées en direct.",
+    )
+    model_name = fields.Char(related='model_id.model', string='Nom technique du modèle', store=True)
+    date_field = fields.Char('Champ date', required=True, help='Champ date stocké servant de jour d\'agrégation (ex: date)')
+    groupby_field = fields.Char('Champ de regroupement', help='Champ stocké de regroupement (ex: partner_id), facultatif')
+    measure_field = fields.Char('Champ mesure', help='Champ numérique stocké à sommer (ex: balance), vide = nombre d\'enregistrements uniquement')
+    last_rebuild = fields.Datetime('Dernière reconstruction', readonly=True, copy=False)
+    data_version = fields.Integer('Version des agrégats', readonly=True, copy=False,
+                                  help='Incrémentée à chaque recalcul de jours : sert d\'empreinte aux résultats mis en cache')
+    verification_date = fields.Datetime('Dernière vérification', readonly=True, copy=False)
+    verification_result = fields.Text('Résultat de la vérification', readonly=True, copy=False)
+
+    @api.constrains('model_id', 'date_field', 'groupby_field', 'measure_field')
+    def _check_fields(self):
+        for rollup in self:
+            Model = self.env[rollup.model_name]
+            if Model._abstract or not Model._auto:
+                raise ValidationError(f"Le modèle {rollup.model_name} n'a pas de table propre")
+            checks = [
+                (rollup.date_field, ('date',), 'date'),
+                (rollup.groupby_field, ROLLUP_GROUPBY_TYPES, 'de regroupement'),
+                (rollup.measure_field, ROLLUP_MEASURE_TYPES, 'mesure'),
+            ]
+            for fname, types, label in checks:
+                if not fname:
+                    continue
+                field = Model._fields.get(fname)
+                if not field or not field.store or not field.column_type or field.type not in types:
+                    raise ValidationError(
+                        f"Le champ {label} « {fname} » doit être un champ stocké de type {', '.join(types)}"
+                    )
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        records.filtered('active')._rollup_install()
+        return records
+
+    def write(self, vals):
+        res = super().write(vals)
+        if {'model_id', 'date_field', 'groupby_field', 'measure_field', 'active'} & set(vals):
+            self._rollup_uninstall()
+            self.filtered('active')._rollup_install()
+        return res
+
+    def unlink(self):
+        self._rollup_uninstall()
+        return super().unlink()
+
+    # ------------------------------------------------------------------
+    # Table d'agrégats et déclencheurs
+    # ------------------------------------------------------------------
+
+    def _rollup_table(self):
+        self.ensure_one()
+        return f"is_tableau_de_bord_rollup_{self.id}"
+
+    def _rollup_columns(self):
+        """Champs du modèle repris en colonnes (même nom que dans la table source)
+
+        Date, regroupement, puis société si le modèle en a une : les règles
+        multi-sociétés s'appliquent alors à la table d'agrégats.
+        """
+        self.ensure_one()
+        columns = [fname for fname in (self.date_field, self.groupby_field) if fname]
+        field = self.env[self.model_name]._fields.get('company_id')
+        if field and field.store and field.type == 'many2one' and 'company_id' not in columns:
+            columns.append('company_id')
+        return columns
+
+    def _rollup_install(self):
+        """Crée la table d'agrégats, la table des jours à recalculer et les déclencheurs, puis charge tout"""
+        cr = self.env.cr
+        for rollup in self:
+            Model = self.env[rollup.model_name]
+            table = SQL.identifier(rollup._rollup_table())
+            dirty = SQL.identifier(f"{rollup._rollup_table()}_dirty")
+            function = SQL.identifier(f"{rollup._rollup_table()}_mark")
+            date_col = SQL.identifier(rollup.date_field)
+            columns = SQL(", ").join(
+                SQL("%s %s", SQL.identifier(fname), SQL(Model._fields[fname].column_type[1]))
+                for fname in rollup._rollup_columns()
+            )
+            cr.execute(SQL(
+                "CREATE TABLE %s (%s, rollup_count bigint NOT NULL, rollup_nn bigint NOT NULL, rollup_total numeric)",
+                table, columns,
+            ))
+            cr.execute(SQL("CREATE INDEX ON %s (%s)", table, date_col))
+            cr.execute(SQL("CREATE TABLE %s (%s date)", dirty, date_col))
+
+            # Colonnes dont la modification change les agrégats
+            watched = [fname for fname in (*rollup._rollup_columns(), rollup.measure_field) if fname]
+            if 'active' in Model._fields and Model._fields['active'].store:
+                watched.append('active')
+            old_sql = SQL(", ").join(SQL("o.%s", SQL.identifier(fname)) for fname in watched)
+            new_sql = SQL(", ").join(SQL("n.%s", SQL.identifier(fname)) for fname in watched)
+            source = SQL.identifier(Model._table)
+
+            # Déclencheurs par instruction (tables de transition) : un seul INSERT par instruction.
+            # Pas de contrainte d'unicité sur le jour : une ligne notée par une transaction non
+            # visible de la mise à jour en cours doit survivre à son DELETE pour le passage suivant
+            # (les doublons sont éliminés à la lecture, voir _rollup_apply_pending)
+            cr.execute(SQL("""
+                CREATE FUNCTION %(function)s() RETURNS trigger LANGUAGE plpgsql AS $body$
+                BEGIN
+                    IF TG_OP = 'INSERT' THEN
+                        INSERT INTO %(dirty)s SELECT DISTINCT %(date)s FROM new_rows;
+                    ELSIF TG_OP = 'DELETE' THEN
+                        INSERT INTO %(dirty)s SELECT DISTINCT %(date)s FROM old_rows;
+                    ELSE
+                        INSERT INTO %(dirty)s
+                        SELECT DISTINCT day FROM old_rows o JOIN new_rows n ON n.id = o.id,
+                               LATERAL (VALUES (o.%(date)s), (n.%(date)s)) AS days(day)
+                         WHERE (%(old)s) IS DISTINCT FROM (%(new)s);
+                    END IF;
+                    RETURN NULL;
+                END
+                $body$
+            """, function=function, dirty=dirty, date=date_col, old=old_sql, new=new_sql))
+            cr.execute(SQL(
+                "CREATE TRIGGER %s AFTER INSERT ON %s REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION %s()",
+                SQL.identifier(f"{rollup._rollup_table()}_ins"), source, function,
+            ))
+            cr.execute(SQL(
+                "CREATE TRIGGER %s AFTER DELETE ON %s REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION %s()",
+                SQL.identifier(f"{rollup._rollup_table()}_del"), source, function,
+            ))
+            # Pas de liste de colonnes avec des tables de transition : la fonction compare les colonnes utiles
+            cr.execute(SQL(
+                "CREATE TRIGGER %s AFTER UPDATE ON %s REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows "
+                "FOR EACH STATEMENT EXECUTE FUNCTION %s()",
+                SQL.identifier(f"{rollup._rollup_table()}_upd"), source, function,
+            ))
+            rollup._rollup_load()
+
+    def _rollup_uninstall(self):
+        """Supprime déclencheurs, fonction et tables (la table source n'est pas modifiée)"""
+        cr = self.env.cr
+        for rollup in self:
+            name = rollup._rollup_table()
+            source = self.env[rollup.model_name]._table if rollup.model_name in self.env else None
+            if source:
+                for suffix in ('ins', 'del', 'upd'):
+                    cr.execute(SQL("DROP TRIGGER IF EXISTS %s ON %s", SQL.identifier(f"{name}_{suffix}"), SQL.identifier(source)))
+            cr.execute(SQL("DROP FUNCTION IF EXISTS %s()", SQL.identifier(f"{name}_mark")))
+            cr.execute(SQL("DROP TABLE IF EXISTS %s, %s", SQL.identifier(name), SQL.identifier(f"{name}_dirty")))
+
+    def _rollup_load(self, days=None):
+        """Recalcule les agrégats des jours donnés (tous si days est None) depuis la table source
+
+        Le calcul passe par _search() en superutilisateur : les règles d'accès ne
+        s'appliquent pas (d'où leur vérification avant toute lecture), mais le filtre
+        implicite sur active est conservé.
+        """
+        self.ensure_one()
+        cr = self.env.cr
+        Model = self.env[self.model_name].sudo()
+        Model.flush_model()
+        table = SQL.identifier(self._rollup_table())
+        query = Model._search([])
+        group_sql = [Model._field_to_sql(query.table, fname, query) for fname in self._rollup_columns()]
+        date_sql = group_sql[0]
+
+        if days is None:
+            cr.execute(SQL("TRUNCATE %s", table))
+        else:
+            dates = [day for day in days if day]
+            condition = SQL("%s = ANY(%s)", date_sql, dates)
+            target = SQL("%s = ANY(%s)", SQL.identifier(self.date_field), dates)
+            if None in days or False in days:
+                condition = SQL("(%s OR %s IS NULL)", condition, date_sql)
+                target = SQL("(%s OR %s IS NULL)", target, SQL.identifier(self.date_field))
+            query.add_where(condition)
+            cr.execute(SQL("DELETE FROM %s WHERE %s", table, target))
+
+        if self.measure_field:
+            measure_sql = Model._field_to_sql(query.table, self.measure_field, query)
+            aggregates = [SQL("COUNT(*)"), SQL("COUNT(%s)", measure_sql), SQL("SUM(%s)", measure_sql)]
+        else:
+            aggregates = [SQL("COUNT(*)"), SQL("0"), SQL("NULL")]
+        query.groupby = SQL(", ").join(group_sql)
+        columns = SQL(", ").join(SQL.identifier(fname) for fname in self._rollup_columns())
+        cr.execute(SQL(
+            "INSERT INTO %s (%s, rollup_count, rollup_nn, rollup_total) %s",
+            table, columns, query.select(*group_sql, *aggregates),
+        ))
+        if days is None:
+            cr.execute(SQL("TRUNCATE %s", SQL.identifier(f"{self._rollup_table()}_dirty")))
+            self.last_rebuild = fields.Datetime.now()
+        self.data_version += 1
+
+    def _rollup_apply_pending(self, wait=True):
+        """Recalcule les jours notés par les déclencheurs depuis le dernier passage
+
+        Sous le verrou consultatif de l'agrégat (jusqu'à la fin de la transaction) :
+        avec wait=False, l'agrégat déjà en cours de mise à jour par une autre
+        transaction est laissé de côté.
+
+        Returns:
+            True si l'agrégat est à jour pour la transaction courante
+        """
+        self.ensure_one()
+        cr = self.env.cr
+        self.env[self.model_name].flush_model()
+        dirty = SQL.identifier(f"{self._rollup_table()}_dirty")
+        if not wait:
+            cr.execute(SQL("SELECT EXISTS(SELECT 1 FROM %s)", dirty))
+            if not cr.fetchone()[0]:
+                return True
+            cr.execute(SQL("SELECT pg_try_advisory_xact_lock(%s, %s)", ROLLUP_LOCK_CLASS, self.id))
+            if not cr.fetchone()[0]:
+                return False
+        else:
+            cr.execute(SQL("SELECT pg_advisory_xact_lock(%s, %s)", ROLLUP_LOCK_CLASS, self.id))
+        cr.execute(SQL("DELETE FROM %s RETURNING %s", dirty, SQL.identifier(self.date_field)))
+        days = {row[0] for row in cr.fetchall()}
+        if days:
+            self._rollup_load(days)
+        return True
+
+    def _rollup_stamp(self):
+        """Empreinte du contenu de l'agrégat sans lire la table source
+
+        Version des agrégats et nombre de jours en attente : toute modification validée
+        de la table source ajoute un jour en attente, tout recalcul change la version.
+        """
+        self.ensure_one()
+        self.env[self.model_name].flush_model()
+        self.env.cr.execute(SQL("SELECT COUNT(*) FROM %s", SQL.identifier(f"{self._rollup_table()}_dirty")))
+        return [self.data_version, self.env.cr.fetchone()[0]]
+
+    def _rollup_try_refresh(self):
+        """Lecture par une tuile : intègre les jours en attente si personne d'autre ne le fait
+
+        Faute de verrou libre (ou en cas d'erreur, annulée par le savepoint), l'agrégat
+        n'est pas à jour et la lecture se fait en direct.
+        """
+        self.ensure_one()
+        try:
+            with self.env.cr.savepoint():
+                return self._rollup_apply_pending(wait=False)
+        except Exception:
+            _logger.exception("Erreur lors de la mise à jour des agrégats %s", self.name)
+            return False
+
+    @api.model
+    def _cron_apply_pending(self):
+        """Tâche planifiée : intègre les modifications en attente pour que les lectures n'aient rien à recalculer"""
+        for rollup in self.search([]):
+            try:
+                with self.env.cr.savepoint():
+                    rollup._rollup_apply_pending()
+            except Exception:
+                _logger.exception("Erreur lors de la mise à jour des agrégats %s", rollup.name)
+
+    def action_rebuild(self):
+        """Bouton : recrée la table, les déclencheurs et recharge entièrement les agrégats"""
+        rollups = self.filtered('active')
+        rollups._rollup_uninstall()
+        rollups._rollup_install()
+        return True
+
+    # ------------------------------------------------------------------
+    # Lecture par les tuiles
+    # ------------------------------------------------------------------
+
+    @api.model
+    def _find_rollup(self, model, domain, groupbys, measures, extra_fields=()):
+        """Retourne l'agrégat capable de répondre à la requête, ou un enregistrement vide
+
+        Conditions : domaine et règles d'accès de l'utilisateur portant uniquement sur
+        les colonnes de l'agrégat (date, regroupement, société), groupements sur ces
+        champs (granularité jour ou plus large pour la date), mesures en nombre,
+        somme ou moyenne du champ mesure, jours en attente intégrés (voir
+        _rollup_try_refresh). extra_fields : autres champs utilisés par la requête
+        (champ date d'une période).
+        """
+        rollups = self.sudo().search([('model_name', '=', model._name)])
+        if not rollups or model.env.su:
+            return self.browse()
+        if 'active' in model._fields and not model.env.context.get('active_test', True):
+            return self.browse()
+
+        rule_domain = model.env['ir.rule']._compute_domain(model._name, 'read') or []
+        domain_fields = set(extra_fields) | self._domain_fields(domain) | self._domain_fields(rule_domain)
+
+        for rollup in rollups:
+            allowed = set(rollup._rollup_columns())
+            if not domain_fields <= allowed:
+                continue
+            if not all(rollup._fits_groupby(gb) for gb in groupbys):
+                continue
+            if not all(
+                fname == '__count' or (fname == rollup.measure_field and agg in ('sum', 'avg'))
+                for fname, agg in measures
+            ):
+                continue
+            if not rollup._rollup_try_refresh():
+                continue
+            return rollup
+        return self.browse()
+
+    @api.model
+    def _domain_fields(self, domain):
+        """Champs (premier élément du chemin) sur lesquels porte un domaine"""
+        result = set()
+        for leaf in domain or []:
+            if expression.is_leaf(leaf) and leaf not in (expression.TRUE_LEAF, expression.FALSE_LEAF):
+                result.add(leaf[0].split('.')[0])
+        return result
+
+    def _fits_groupby(self, groupby):
+        fname, _sep, granularity = groupby.partition(':')
+        if fname == self.date_field:
+            return granularity in ('day', 'week', 'month', 'quarter', 'year')
+        return fname in self._rollup_columns()[1:] and not granularity
+
+    def _rollup_query(self, model, domain):
+        """Requête sur la table d'agrégats, avec l'alias de la table du modèle
+
+        Les colonnes portant le nom des champs d'origine, les expressions SQL de
+        l'ORM (domaine, règles d'accès de l'utilisateur, groupements par date)
+        s'appliquent telles quelles.
+        """
+        self.ensure_one()
+        query = Query(model.env, model._table, SQL.identifier(self._rollup_table()))
+        rule_domain = [] if model.env.su else model.env['ir.rule']._compute_domain(model._name, 'read') or []
+        where = model._where_calc(expression.AND([list(domain or []), list(rule_domain)]), active_test=False)
+        query.add_where(where.where_clause)
+        return query
+
+    def _rollup_aggregate_sql(self, query, fname, aggregator):
+        """Expression d'agrégation d'une mesure sur la table d'agrégats"""
+        if fname == '__count':
+            return SQL("SUM(%s)", SQL.identifier(query.table, 'rollup_count'))
+        total = SQL.identifier(query.table, 'rollup_total')
+        if aggregator == 'avg':
+            return SQL("SUM(%s) / NULLIF(SUM(%s), 0)", total, SQL.identifier(query.table, 'rollup_nn'))
+        return SQL("SUM(%s)", total)
+
+    # ------------------------------------------------------------------
+    # Vérification
+    # ------------------------------------------------------------------
+
+    def action_verify(self):
+        """Compare les agrégats stockés au calcul direct sur la table source, jour par jour
+
+        Nombre d'enregistrements, nombre de mesures renseignées et somme : les trois
+        données dont sont tirés les nombres, sommes et moyennes servis aux tuiles.
+        """
+        cr = self.env.cr
+        for rollup in self.filtered('active'):
+            rollup._rollup_apply_pending()
+            Model = self.env[rollup.model_name].sudo()
+            query = Model._search([])
+            group_sql = [Model._field_to_sql(query.table, fname, query) for fname in rollup._rollup_columns()]
+            measure_sql = Model._field_to_sql(query.table, rollup.measure_field, query) if rollup.measure_field else SQL("NULL")
+            query.groupby = SQL(", ").join(group_sql)
+            cr.execute(query.select(*group_sql, SQL("COUNT(*)"), SQL("COUNT(%s)", measure_sql), SQL("SUM(%s)", measure_sql)))
+            live = {tuple(row[:-3]): (row[-3], row[-2], row[-1] or 0) for row in cr.fetchall()}
+
+            columns = SQL(", ").join(SQL.identifier(fname) for fname in rollup._rollup_columns())
+            cr.execute(SQL(
+                "SELECT %s, SUM(rollup_count), SUM(rollup_nn), SUM(rollup_total) FROM %s GROUP BY %s",
+                columns, SQL.identifier(rollup._rollup_table()), columns,
+            ))
+            stored = {tuple(row[:-3]): (row[-3], row[-2], row[-1] or 0) for row in cr.fetchall()}
+
+            differences = [
+                key for key in live.keys() | stored.keys()
+                if key not in live or key not in stored
+                or live[key][:2] != stored[key][:2]
+                or abs(float(live[key][2]) - float(stored[key][2])) > 1e-6 * max(1.0, abs(float(live[key][2])))
+            ]
+            if differences:
+                sample = ', '.join(str(key) for key in sorted(differences, key=str)[:5])
+                result = f"Écarts sur {len(differences)} groupe(s) sur {len(live)} (ex: {sample})"
+            else:
+                result = f"OK : {len(live)} groupe(s) identiques au calcul direct"
+            rollup.write({'verification_date': fields.Datetime.now(), 'verification_result': result})
+        return True
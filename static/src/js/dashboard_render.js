@@ -0,0 +1,250 @@
+/** @odoo-module **/
+
+// Rendu HTML des éléments sans dépendance au client web : partagé par le tableau de bord
+// (et son Web Worker, qui reprend le source de ces fonctions) et par les écrans kiosque
+
+// Valeur échappée pour un attribut HTML
+export function escapeAttr(value) {
+    return String(value ?? '').replace(/&/g, '&amp;').replace(/"/g, '&quot;').replace(/</g, '&lt;');
+}
+
+// Nombre entier arrondi avec séparateur de milliers
+export function formatNumberFr(value) {
+    if (value === null || value === undefined) return '0';
+    // Formater avec séparateur de milliers en nombres entiers uniquement
+    const num = parseFloat(value);
+    if (isNaN(num)) return value;
+    // Arrondir à l'entier le plus proche
+    const rounded = Math.round(num);
+    return rounded.toLocaleString('fr-FR');
+}
+
+// Construction du HTML d'une liste (exécutée dans le Web Worker des éléments)
+export function buildListHtml(data) {
+    if (!data.data || data.data.length === 0) {
+        return { html: '<div class="alert alert-info m-2">Aucune donnée à afficher</div>' };
+    }
+    
+    // Filtrer les champs invalides
+    const validFields = (data.fields || []).filter(f => f !== null && f !== undefined);
+    
+    if (validFields.length === 0) {
+        return { html: '<div class="alert alert-warning m-2">Aucun champ à afficher</div>' };
+    }
+    
+    // Détecter si c'est une liste groupée
+    const isGrouped = data.is_grouped === true;
+    
+    let html = '<div class="table-responsive h-100"><table class="table table-sm mb-0">';
+    
+    // En-têtes
+    html += '<thead class="table-light"><tr>';
+    for (const f of validFields) {
+        const label = typeof f === 'string' ? f : (f?.string || f?.name || 'Sans nom');
+        const fieldType = f?.type || 'char';
+        const isNumeric = ['integer', 'float', 'monetary'].includes(fieldType);
+        const isAggregate = f?.is_aggregate === true;
+        const alignClass = isNumeric ? 'text-end' : '';
+        // Style spécial pour les colonnes d'agrégation
+        const headerStyle = isAggregate ? 'background-color: #e3f2fd;' : '';
+        html += `<th class="${alignClass}" style="white-space: nowrap; font-size: 0.875rem; overflow: hidden; text-overflow: ellipsis; max-width: 200px; padding: 0.25rem 0.5rem; ${headerStyle}" title="${label}">${label}</th>`;
+    }
+    html += '</tr></thead>';
+    
+    // Données
+    html += '<tbody>';
+    const groupbyNames = validFields.filter((f) => f?.is_groupby).map((f) => f.name);
+    let parentKey = '';
+    for (const row of data.data) {
+        // Détecter si c'est une ligne d'en-tête de groupe (total de niveau 1)
+        const isGroupHeader = row._is_group_header === true;
+        const groupLevel = row._group_level || 1;
+
+        // Clé de la ligne pour la mise à jour incrémentale : id, sinon libellés du groupe
+        let rowKey = row.id !== undefined ? `r${row.id}` : JSON.stringify(groupbyNames.map((name) => row[name]));
+        if (isGroupHeader) {
+            parentKey = rowKey;
+            rowKey = `h${rowKey}`;
+        } else if (row.id === undefined) {
+            rowKey = `d${JSON.stringify([groupLevel === 2 ? parentKey : '', rowKey])}`;
+        }
+        
+        // Style de la ligne selon le niveau
+        let rowClass = '';
+        let rowStyle = '';
+        if (isGroupHeader) {
+            // Ligne de total de groupe : fond coloré et texte en gras
+            rowClass = 'table-primary';
+            rowStyle = 'font-weight: 600;';
+        } else if (groupLevel === 2) {
+            // Ligne de détail niveau 2 : légèrement indentée visuellement
+            rowStyle = 'background-color: #fafbfc;';
+        }
+        
+        html += `<tr class="${rowClass}" style="${rowStyle}" data-key="${escapeAttr(rowKey)}">`;
+        for (const f of validFields) {
+            const name = typeof f === 'string' ? f : (f?.name || '');
+            const fieldType = f?.type || 'char';
+            const digits = f?.digits;
+            const isAggregate = f?.is_aggregate === true;
+            const isGroupby = f?.is_groupby === true;
+            let val = row[name];
+            let displayVal = '';
+            let alignClass = '';
+            let cellStyle = '';
+            
+            // Style spécial pour les cellules d'agrégation
+            if (isAggregate && !isGroupHeader) {
+                cellStyle = 'background-color: #f5faff;';
+            }
+            
+            // Traitement selon le type de champ
+            if (fieldType === 'integer' && val !== null && val !== undefined && val !== false && val !== '') {
+                // Entier avec séparateur de milliers
+                alignClass = 'text-end';
+                displayVal = parseInt(val).toLocaleString('fr-FR');
+            } else if ((fieldType === 'float' || fieldType === 'monetary') && val !== null && val !== undefined && val !== false && val !== '') {
+                // Décimal avec séparateur de milliers et respect des décimales
+                alignClass = 'text-end';
+                const numDigits = digits !== undefined ? digits : 2;
+                displayVal = parseFloat(val).toLocaleString('fr-FR', {
+                    minimumFractionDigits: numDigits,
+                    maximumFractionDigits: numDigits
+                });
+            } else if (Array.isArray(val)) {
+                // many2one: [id, display]
+                displayVal = val.length > 1 ? val[1] : val[0];
+            } else if (val && typeof val === 'object') {
+                // divers formats -> stringify propre
+                displayVal = val.display_name || val.name || JSON.stringify(val);
+            } else if (val !== null && val !== undefined && val !== false) {
+                // Valeur simple
+                displayVal = val;
+            }
+            
+            html += `<td class="${alignClass}" style="${cellStyle}">${displayVal}</td>`;
+        }
+        html += '</tr>';
+    }
+    html += '</tbody>';
+    
+    html += `</table></div>`;
+    
+    // Afficher le compteur seulement si show_record_count est True
+    if (data.show_record_count !== false && data.count !== undefined) {
+        const countLabel = isGrouped ? 'Total enregistrements' : 'Total';
+        html += `<div class="text-muted small p-2 border-top">${countLabel}: ${data.count} enregistrement(s)</div>`;
+    }
+    
+    return { html, className: "dashboard-item h-100 d-flex flex-column" };
+}
+
+// Construction du HTML d'un tableau croisé (exécutée dans le Web Worker des éléments)
+export function buildPivotHtml(data) {
+    // Matrice : data.data = { measures, col_headers, columns, rows: [{row, level, is_group, values, row_total}], col_totals, grand_total }
+    const pivot = data.data || {};
+    const measures = pivot.measures || [];
+    const nbMeasures = Math.max(measures.length, 1);
+    const colHeaders = pivot.col_headers || [];
+    const cols = pivot.columns || [];
+    const rows = pivot.rows || [];
+    const measureLabel = pivot.measure_label || 'Total';
+    const rowLabel = pivot.row_label || 'Lignes';
+    const colTotals = pivot.col_totals || null;
+    const grandTotal = pivot.grand_total || null;
+    const hasColumns = cols.length > 0;
+    const showRowTotals = rows.length > 0 && rows[0].hasOwnProperty('row_total');
+    const showDataTitle = data.show_data_title !== undefined ? data.show_data_title : true;
+    const showMeasureRow = nbMeasures > 1 || !hasColumns;
+    // Les mesures « Écart % » (comparaison de périodes) sont colorées selon leur signe
+    const formatCell = (v, i) => {
+        if (!measures[i % nbMeasures]?.is_delta) return formatNumberFr(v);
+        if (v === null || v === undefined) return '-';
+        const deltaClass = v >= 0 ? 'text-success' : 'text-danger';
+        return `<span class="${deltaClass}">${v > 0 ? '+' : ''}${v.toLocaleString('fr-FR', { maximumFractionDigits: 1 })} %</span>`;
+    };
+    const headerRowCount = colHeaders.length + (showMeasureRow ? 1 : 0) || 1;
+
+    let html = '<div class="h-100 d-flex flex-column">';
+    if (showDataTitle) {
+        html += '<div class="px-2 pt-2"><small class="text-muted">Mesure: <strong>' + measureLabel + '</strong></small></div>';
+    }
+    html += '<div class="table-responsive flex-grow-1 px-2"><table class="table table-sm table-hover mb-0" style="font-size: 0.9rem;">';
+
+    // En-têtes : un niveau par groupement de colonnes, puis une ligne de mesures si nécessaire
+    html += '<thead class="table-light">';
+    for (let level = 0; level < colHeaders.length; level++) {
+        html += '<tr>';
+        if (level === 0) {
+            html += `<th class="border-end" rowspan="${headerRowCount}" style="background-color: #f8f9fa;">${rowLabel}</th>`;
+        }
+        for (const h of colHeaders[level]) {
+            html += `<th class="text-center" colspan="${h.colspan}">${h.label}</th>`;
+        }
+        if (level === 0 && showRowTotals) {
+            html += `<th class="text-end border-start fw-bold" rowspan="${colHeaders.length}" colspan="${nbMeasures}" style="background-color: #e9ecef;">Total</th>`;
+        }
+        html += '</tr>';
+    }
+    if (showMeasureRow) {
+        html += '<tr>';
+        if (colHeaders.length === 0) {
+            html += '<th class="border-end" style="background-color: #f8f9fa;">' + rowLabel + '</th>';
+        }
+        const measureCells = measures.map(m => '<th class="text-end">' + m.label + '</th>').join('');
+        for (let i = 0; i < cols.length; i++) {
+            html += measureCells;
+        }
+        if (showRowTotals) {
+            html += hasColumns
+                ? measureCells.replace(/class="text-end"/g, 'class="text-end border-start fw-bold" style="background-color: #e9ecef;"')
+                : measureCells;
+        }
+        html += '</tr>';
+    }
+    html += '</thead>';
+
+    // Corps : lignes de groupe (sous-totaux) en gras, indentation par niveau
+    html += '<tbody>';
+    const labelPath = [];
+    for (const r of rows) {
+        const indent = ((r.level || 1) - 1) * 1.2;
+        // Clé de la ligne pour la mise à jour incrémentale : chemin des libellés
+        labelPath.length = (r.level || 1) - 1;
+        labelPath.push(r.row);
+        const rowKey = JSON.stringify(labelPath);
+        const rowStyle = r.is_group ? ' class="fw-bold"' : '';
+        const clickable = r.path && data.clickable ? ` data-row-index="${rows.indexOf(r)}" role="button" title="Filtrer les autres éléments sur ce groupe"` : '';
+        html += `<tr${rowStyle} data-key="${escapeAttr(rowKey)}"><td class="border-end fw-bold" style="background-color: #fafbfc; padding-left: ${0.75 + indent}rem;"${clickable}>${r.row}</td>`;
+        (r.values || []).forEach((v, i) => {
+            html += '<td class="text-end">' + formatCell(v, i) + '</td>';
+        });
+        if (showRowTotals) {
+            (r.row_total || []).forEach((t, i) => {
+                const totalClass = hasColumns ? 'text-end border-start fw-bold' : 'text-end fw-bold';
+                html += `<td class="${totalClass}" style="background-color: #f8f9fa;">` + formatCell(t, i) + '</td>';
+            });
+        }
+        html += '</tr>';
+    }
+
+    // Ligne de total par colonne (calculée en base)
+    if (colTotals !== null) {
+        html += '<tr class="table-secondary border-top border-2"><td class="border-end fw-bold">Total</td>';
+        colTotals.forEach((t, i) => {
+            html += '<td class="text-end fw-bold">' + formatCell(t, i) + '</td>';
+        });
+        if (showRowTotals && grandTotal !== null) {
+            grandTotal.forEach((g, i) => {
+                const totalClass = hasColumns ? 'text-end border-start fw-bold' : 'text-end fw-bold';
+                html += `<td class="${totalClass}">` + formatCell(g, i) + '</td>';
+            });
+        }
+        html += '</tr>';
+    }
+    html += '</tbody></table></div></div>';
+    return { html };
+}
+
+// Palette des graphiques (identique à celle du serveur)
+export const CHART_PALETTE = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd', '#8c564b', '#e377c2', '#7f7f7f', '#bcbd22', '#17becf'];
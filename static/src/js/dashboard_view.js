@@ -1,10 +1,433 @@
 /** @odoo-module **/
 
-import { Component, onMounted, onWillStart } from "@odoo/owl";
+import { Component, onMounted, onWillStart, onWillUnmount } from "@odoo/owl";
 import { registry } from "@web/core/registry";
 import { FormController } from "@web/views/form/form_controller";
 import { rpc } from "@web/core/network/rpc";
 import { useService } from "@web/core/utils/hooks";
+import { user } from "@web/core/user";
+import { buildListHtml, buildPivotHtml, escapeAttr, formatNumberFr, CHART_PALETTE } from "@is_tableau_de_bord18/js/dashboard_render";
+
+// Cache navigateur des résultats des éléments (IndexedDB), limité en taille (LRU)
+const TILE_CACHE_DB = "is_tableau_de_bord_tiles";
+const TILE_CACHE_STORE = "tiles";
+const TILE_CACHE_MAX_BYTES = 20 * 1024 * 1024;
+const TILE_CACHE_USER_KEY = "is_tableau_de_bord_tiles_uid";
+
+// Numéro du dernier rendu d'élément demandé (voir renderFilterData)
+let renderSeq = 0;
+
+// Intervalle minimum de l'actualisation automatique (secondes)
+const REFRESH_MIN_SECONDS = 10;
+
+const tileCache = {
+    _db: null,
+
+    open() {
+        if (!this._db) {
+            this._db = new Promise((resolve, reject) => {
+                if (!window.indexedDB) {
+                    reject(new Error("IndexedDB indisponible"));
+                    return;
+                }
+                const request = window.indexedDB.open(TILE_CACHE_DB, 1);
+                request.onupgradeneeded = () => {
+                    const store = request.result.createObjectStore(TILE_CACHE_STORE, { keyPath: "key" });
+                    store.createIndex("accessed", "accessed");
+                };
+                request.onsuccess = () => resolve(request.result);
+                request.onerror = () => reject(request.error);
+            });
+        }
+        return this._db;
+    },
+
+    async transaction(mode, callback) {
+        const db = await this.open();
+        return new Promise((resolve, reject) => {
+            const tx = db.transaction(TILE_CACHE_STORE, mode);
+            let result = null;
+            callback(tx.objectStore(TILE_CACHE_STORE), (value) => { result = value; });
+            tx.oncomplete = () => resolve(result);
+            tx.onerror = () => reject(tx.error);
+            tx.onabort = () => reject(tx.error);
+        });
+    },
+
+    async get(key) {
+        // Lecture et mise à jour de la date d'accès (ordre LRU)
+        try {
+            return await this.transaction("readwrite", (store, setResult) => {
+                store.get(key).onsuccess = (event) => {
+                    const entry = event.target.result;
+                    if (entry) {
+                        entry.accessed = Date.now();
+                        store.put(entry);
+                        setResult(entry);
+                    }
+                };
+            });
+        } catch (error) {
+            return null;
+        }
+    },
+
+    async put(entry) {
+        try {
+            await this.transaction("readwrite", (store) => {
+                store.put({ ...entry, accessed: Date.now() });
+            });
+        } catch (error) {
+            console.warn("[TDB] Cache navigateur indisponible:", error);
+        }
+    },
+
+    async update(key, values) {
+        // Met à jour une entrée existante (ex. nouvelle empreinte d'un résultat inchangé)
+        try {
+            await this.transaction("readwrite", (store) => {
+                store.get(key).onsuccess = (event) => {
+                    const entry = event.target.result;
+                    if (entry) {
+                        store.put({ ...entry, ...values, accessed: Date.now() });
+                    }
+                };
+            });
+        } catch (error) {
+            console.warn("[TDB] Cache navigateur indisponible:", error);
+        }
+    },
+
+    async evict(maxBytes = TILE_CACHE_MAX_BYTES) {
+        // Supprime les entrées les moins récemment utilisées au-delà de la taille maximum
+        try {
+            await this.transaction("readwrite", (store) => {
+                let total = 0;
+                store.index("accessed").openCursor(null, "prev").onsuccess = (event) => {
+                    const cursor = event.target.result;
+                    if (!cursor) {
+                        return;
+                    }
+                    total += cursor.value.size || 0;
+                    if (total > maxBytes) {
+                        cursor.delete();
+                    }
+                    cursor.continue();
+                };
+            });
+        } catch (error) {
+            console.warn("[TDB] Cache navigateur indisponible:", error);
+        }
+    },
+
+    async clear() {
+        try {
+            await this.transaction("readwrite", (store) => store.clear());
+        } catch (error) {
+            // Rien à purger
+        }
+    },
+
+    async checkUser(userId) {
+        // Un autre utilisateur sur ce navigateur : purger les résultats du précédent
+        const previous = window.localStorage.getItem(TILE_CACHE_USER_KEY);
+        if (previous !== String(userId)) {
+            await this.clear();
+            window.localStorage.setItem(TILE_CACHE_USER_KEY, String(userId));
+        }
+    },
+};
+
+// Cube client : ré-agrégation locale des agrégats au grain le plus fin envoyés par le serveur.
+// Les fonctions exécutées dans le Web Worker ne référencent que celles qui y sont copiées
+// (voir tileWorker) : pas de variable ni d'import du module.
+function aggregateCube(request) {
+    const { cube, mode, rowDims, colDims, filters = [], limit = 0, sortBy = 'row', sortOrder = 'asc' } = request;
+    const dims = cube.dimensions;
+    const measures = cube.measures;
+    const dir = sortOrder === 'desc' ? -1 : 1;
+    const sameKey = (a, b) => JSON.stringify(a) === JSON.stringify(b);
+    const compareCodes = (a, b) => {
+        for (let i = 0; i < Math.min(a.length, b.length); i++) {
+            if (a[i] !== b[i]) {
+                return a[i] - b[i];
+            }
+        }
+        return a.length - b.length;
+    };
+    const parse = (key) => (key === '' ? [] : key.split(',').map(Number));
+    const pathOf = (dimIndexes, codes) => codes.map((code, n) => ({
+        groupby: dims[dimIndexes[n]].groupby,
+        key: dims[dimIndexes[n]].keys[code],
+        label: dims[dimIndexes[n]].labels[code],
+    }));
+    const labelOf = (dimIndexes, codes) => codes.map((code, n) => dims[dimIndexes[n]].labels[code]).join(' / ');
+
+    // Filtres croisés : code de la valeur filtrée dans chaque dimension
+    const filterCodes = filters.map((f) => [f.dim, dims[f.dim].keys.findIndex((k) => sameKey(k, f.key))]);
+    const combine = measures.map((m) => {
+        if (m.aggregator === 'min') {
+            return Math.min;
+        }
+        if (m.aggregator === 'max') {
+            return Math.max;
+        }
+        return (a, b) => a + b;
+    });
+    const groups = new Map();
+    const add = (key, fact) => {
+        const acc = groups.get(key);
+        if (!acc) {
+            groups.set(key, measures.map((_m, mi) => cube.values[mi][fact]));
+            return;
+        }
+        for (let mi = 0; mi < measures.length; mi++) {
+            acc[mi] = combine[mi](acc[mi], cube.values[mi][fact]);
+        }
+    };
+
+    const rowPaths = new Map();
+    const colPaths = new Map();
+    for (let fact = 0; fact < cube.count; fact++) {
+        if (filterCodes.some(([dim, code]) => cube.codes[dim][fact] !== code)) {
+            continue;
+        }
+        const rowPath = rowDims.map((d) => cube.codes[d][fact]);
+        if (mode === 'graph') {
+            add(rowPath.join(','), fact);
+            continue;
+        }
+        const colPath = colDims.map((d) => cube.codes[d][fact]);
+        const col = colDims.length ? colPath.join(',') : '*';
+        if (colDims.length) {
+            colPaths.set(col, colPath);
+        }
+        for (let level = 0; level <= rowPath.length; level++) {
+            const row = rowPath.slice(0, level).join(',');
+            if (level) {
+                rowPaths.set(row, rowPath.slice(0, level));
+            }
+            add(row + '|' + col, fact);
+            if (colDims.length) {
+                add(row + '|*', fact);
+            }
+        }
+    }
+
+    if (mode === 'graph') {
+        let items = [...groups.entries()].map(([key, values]) => ({ codes: parse(key), value: values[0] }));
+        items.sort((a, b) => dir * (sortBy === 'total' ? a.value - b.value : compareCodes(a.codes, b.codes)));
+        if (limit > 0) {
+            items = items.slice(0, limit);
+        }
+        return {
+            labels: items.map((item) => labelOf(rowDims, item.codes) || 'Total'),
+            values: items.map((item) => item.value),
+            keys: items.map((item) => pathOf(rowDims, item.codes)),
+        };
+    }
+
+    // Tableau croisé : même structure que celle calculée par le serveur
+    const nr = rowDims.length;
+    const nc = colDims.length;
+    const span = measures.length;
+    const leafCols = [...colPaths.values()].sort(compareCodes);
+    const value = (row, col) => groups.get(row + '|' + col) || measures.map(() => 0);
+    const cells = (row) => leafCols.flatMap((cp) => value(row, cp.join(',')));
+    const total = (row) => value(row, '*');
+
+    const children = new Map();
+    for (const path of rowPaths.values()) {
+        const parent = path.slice(0, -1).join(',');
+        if (!children.has(parent)) {
+            children.set(parent, []);
+        }
+        children.get(parent).push(path);
+    }
+    const showRowTotals = cube.show_row_totals !== false;
+    const rows = [];
+    const walk = (parent) => {
+        let siblings = children.get(parent) || [];
+        siblings.sort((a, b) => dir * (sortBy === 'total'
+            ? total(a.join(','))[0] - total(b.join(','))[0]
+            : a[a.length - 1] - b[b.length - 1]));
+        if (!parent && limit > 0) {
+            siblings = siblings.slice(0, limit);
+        }
+        for (const path of siblings) {
+            const key = path.join(',');
+            const row = {
+                row: dims[rowDims[path.length - 1]].labels[path[path.length - 1]],
+                level: path.length,
+                is_group: path.length < nr,
+                values: cells(key),
+                path: pathOf(rowDims, path),
+            };
+            if (showRowTotals || !nc) {
+                row.row_total = total(key);
+            }
+            rows.push(row);
+            walk(key);
+        }
+    };
+    walk('');
+    if (!rows.length) {
+        rows.push({ row: 'Total', level: 1, is_group: false, values: cells(''), row_total: total('') });
+    }
+
+    const colHeaders = [];
+    for (let level = 0; level < nc; level++) {
+        const header = [];
+        for (const cp of leafCols) {
+            const prefix = cp.slice(0, level + 1).join(',');
+            if (header.length && header[header.length - 1].prefix === prefix) {
+                header[header.length - 1].colspan += span;
+            } else {
+                header.push({ prefix, label: dims[colDims[level]].labels[cp[level]], colspan: span });
+            }
+        }
+        colHeaders.push(header.map(({ label, colspan }) => ({ label, colspan })));
+    }
+
+    const data = {
+        measures: measures.map((m) => ({ name: m.name, label: m.label })),
+        measure_label: cube.measure_label,
+        row_label: rowDims.map((d) => dims[d].label).join(' / ') || 'Lignes',
+        col_label: colDims.map((d) => dims[d].label).join(' / ') || 'Colonnes',
+        col_headers: colHeaders,
+        columns: leafCols.map((cp, i) => ({ key: i, label: labelOf(colDims, cp) })),
+        rows,
+    };
+    if (cube.show_col_totals !== false && nr) {
+        data.col_totals = cells('');
+        data.grand_total = total('');
+    }
+    return data;
+}
+
+// Web Worker des éléments (cube, HTML des listes et tableaux croisés), créé à la première
+// utilisation ; sans Worker disponible, les mêmes fonctions sont appelées directement
+const TILE_WORKER_OPS = { cube: aggregateCube, list: buildListHtml, pivot: buildPivotHtml };
+
+const tileWorker = {
+    _worker: null,
+    _seq: 0,
+    _pending: new Map(),
+
+    start() {
+        if (this._worker !== null) {
+            return this._worker;
+        }
+        try {
+            const functions = { aggregateCube, buildListHtml, buildPivotHtml, formatNumberFr, escapeAttr };
+            const source = Object.entries(functions)
+                .map(([name, fn]) => `const ${name} = ${fn.toString()};`)
+                .concat([
+                    "const ops = { cube: aggregateCube, list: buildListHtml, pivot: buildPivotHtml };",
+                    "self.onmessage = (event) => self.postMessage({ id: event.data.id, result: ops[event.data.op](event.data.request) });",
+                ])
+                .join("\n");
+            const url = URL.createObjectURL(new Blob([source], { type: "text/javascript" }));
+            this._worker = new Worker(url);
+            this._worker.onmessage = (event) => {
+                const pending = this._pending.get(event.data.id);
+                this._pending.delete(event.data.id);
+                pending?.resolve(event.data.result);
+            };
+            this._worker.onerror = (event) => {
+                // Worker inutilisable : les calculs en attente sont refaits sur le fil principal
+                event.preventDefault?.();
+                this._worker.terminate();
+                this._worker = false;
+                for (const pending of this._pending.values()) {
+                    pending.resolve(TILE_WORKER_OPS[pending.op](pending.request));
+                }
+                this._pending.clear();
+            };
+        } catch (error) {
+            this._worker = false;
+        }
+        return this._worker;
+    },
+
+    run(op, request) {
+        if (!this.start()) {
+            return Promise.resolve(TILE_WORKER_OPS[op](request));
+        }
+        return new Promise((resolve) => {
+            const id = ++this._seq;
+            this._pending.set(id, { resolve, op, request });
+            this._worker.postMessage({ id, op, request });
+        });
+    },
+};
+
+// Mise à jour incrémentale du DOM d'un élément : seuls les nœuds modifiés sont remplacés.
+// Les enfants portant data-key (lignes des listes et tableaux croisés) sont appariés par clé,
+// les autres par position ; la position de défilement et les nœuds inchangés sont conservés.
+function patchNode(oldNode, newNode) {
+    if (oldNode.isEqualNode(newNode)) {
+        return oldNode;
+    }
+    if (oldNode.nodeType !== newNode.nodeType || oldNode.nodeName !== newNode.nodeName) {
+        oldNode.replaceWith(newNode);
+        return newNode;
+    }
+    if (oldNode.nodeType !== Node.ELEMENT_NODE) {
+        oldNode.nodeValue = newNode.nodeValue;
+        return oldNode;
+    }
+    for (const attr of [...oldNode.attributes]) {
+        if (!newNode.hasAttribute(attr.name)) {
+            oldNode.removeAttribute(attr.name);
+        }
+    }
+    for (const attr of newNode.attributes) {
+        if (oldNode.getAttribute(attr.name) !== attr.value) {
+            oldNode.setAttribute(attr.name, attr.value);
+        }
+    }
+    patchChildren(oldNode, newNode);
+    return oldNode;
+}
+
+function patchChildren(parent, newParent) {
+    const keyed = new Map();
+    for (const child of parent.children) {
+        if (child.dataset?.key !== undefined) {
+            keyed.set(child.dataset.key, child);
+        }
+    }
+    const newChildren = [...newParent.childNodes];
+    let index = 0;
+    for (const newChild of newChildren) {
+        const key = newChild.nodeType === Node.ELEMENT_NODE ? newChild.dataset.key : undefined;
+        const current = parent.childNodes[index];
+        let node;
+        if (key !== undefined) {
+            const old = keyed.get(key);
+            keyed.delete(key);
+            node = old ? patchNode(old, newChild) : newChild;
+        } else if (current && current.dataset?.key === undefined) {
+            node = patchNode(current, newChild);
+        } else {
+            node = newChild;
+        }
+        if (parent.childNodes[index] !== node) {
+            parent.insertBefore(node, parent.childNodes[index] || null);
+        }
+        index++;
+    }
+    while (parent.childNodes.length > index) {
+        parent.lastChild.remove();
+    }
+}
+
+function patchHtml(container, html) {
+    const template = document.createElement('template');
+    template.innerHTML = html;
+    patchChildren(container, template.content);
+}
 
 export class DashboardFormController extends FormController {
     setup() {
@@ -17,6 +440,12 @@ export class DashboardFormController extends FormController {
                 this.setupDashboard();
             }
         });
+
+        // Quitter le tableau de bord interrompt les chargements et l'actualisation automatique
+        onWillUnmount(() => {
+            this.stopAutoRefresh();
+            this.abortTileRequests();
+        });
     }
 
     isDashboard() {
@@ -48,25 +477,50 @@ export class DashboardFormController extends FormController {
     }
 
     async setupDashboard() {
-        // Vérifier si l'utilisateur est gestionnaire
-        await this.checkUserPermissions();
+        // Chargement initial : lignes, filtres, droits et premiers résultats en un seul appel
+        await this.loadBootstrap();
+        if (!this.bootstrap) {
+            return;
+        }
         
-        // Créer les inputs de filtres
+        // Créer les inputs de filtres (avec les valeurs mémorisées pour cet utilisateur)
         this.createFilterInputs();
         
-        // Charger les filtres mémorisés pour cet utilisateur
-        await this.loadSavedFilters();
+        this.createDashboardLayout();
+        this.loadDashboardItems();
+    }
+
+    async loadBootstrap() {
+        const dashboardId = this.model?.root?.resId;
+        this.bootstrap = null;
+        if (!dashboardId) return;
         
-        // Attendre que le formulaire soit complètement chargé
-        setTimeout(() => {
-            this.createDashboardLayout();
-            this.loadDashboardItems();
-        }, 1500);
+        try {
+            // Taille de la zone d'affichage : le serveur calcule directement les éléments visibles
+            const container = document.getElementById('dashboard_container');
+            const result = await rpc("/tableau_de_bord/bootstrap/" + dashboardId, {
+                viewport_width: container?.clientWidth || window.innerWidth,
+                viewport_height: window.innerHeight - (container?.getBoundingClientRect().top || 0),
+            });
+            if (result.error) {
+                throw new Error(result.error);
+            }
+            this.bootstrap = result;
+            this.isManager = result.is_manager;
+            // Résultats intégrés : utilisés une seule fois, au premier affichage
+            this.bootstrapTiles = result.tiles || {};
+        } catch (error) {
+            console.error("[TDB] Erreur lors du chargement du tableau de bord:", error);
+            const container = document.getElementById('dashboard_container');
+            if (container) {
+                container.innerHTML = `<div class="alert alert-danger m-2">Erreur lors du chargement du tableau de bord: ${escapeAttr(error.message)}</div>`;
+            }
+        }
     }
 
     createFilterInputs() {
-        const record = this.model.root;
-        const filterDefs = record?.data?.filter_def_ids?.records || [];
+        const filterDefs = this.bootstrap?.filter_defs || [];
+        const savedValues = this.bootstrap?.filters_values || {};
         
         const container = document.getElementById('filter_container');
         if (!container || filterDefs.length === 0) {
@@ -75,9 +529,8 @@ export class DashboardFormController extends FormController {
 
         let html = '';
         
-        for (const filterDefRecord of filterDefs) {
-            const filterDef = filterDefRecord.data;
-            const filterId = filterDefRecord.resId || filterDef.id;
+        for (const filterDef of filterDefs) {
+            const filterId = filterDef.id;
             const filterName = filterDef.name || 'Filtre';
             const filterType = filterDef.filter_type || 'text';
             
@@ -156,6 +609,7 @@ export class DashboardFormController extends FormController {
                            data-filter-id="${filterId}"
                            data-filter-type="${filterType}"
                            placeholder="${placeholder}"
+                           value="${escapeAttr(savedValues[filterId] || '')}"
                            style="width: 140px; font-size: 12px; outline: none;">
                 </div>
             `;
@@ -255,26 +709,6 @@ export class DashboardFormController extends FormController {
         this.loadDashboardItems();
     }
 
-    async loadSavedFilters() {
-        const dashboardId = this.model?.root?.resId;
-        if (!dashboardId) return;
-        
-        try {
-            const result = await rpc("/tableau_de_bord/get_saved_filter/" + dashboardId);
-            if (result && result.filters) {
-                // Peupler les inputs avec les valeurs sauvegardées
-                for (const [filterId, value] of Object.entries(result.filters)) {
-                    const input = document.getElementById(`dashboard_filter_${filterId}`);
-                    if (input) {
-                        input.value = value;
-                    }
-                }
-            }
-        } catch (error) {
-            // Ignorer les erreurs silencieusement
-        }
-    }
-
     async saveFilters(filtersDict) {
         const dashboardId = this.model?.root?.resId;
         if (!dashboardId) return;
@@ -302,25 +736,9 @@ export class DashboardFormController extends FormController {
         return filtersValues;
     }
 
-    async checkUserPermissions() {
-        try {
-            // Vérifier si l'utilisateur appartient au groupe manager via notre méthode custom
-            const result = await rpc("/web/dataset/call_kw/is.tableau.de.bord/check_is_manager", {
-                model: 'is.tableau.de.bord',
-                method: 'check_is_manager',
-                args: [],
-                kwargs: {},
-            });
-            this.isManager = result;
-        } catch (error) {
-            // En cas d'erreur, considérer l'utilisateur comme non-manager
-            this.isManager = false;
-        }
-    }
-
     createDashboardLayout() {
-        const record = this.model.root;
-        if (!record?.data?.line_ids?.records) {
+        const lines = this.bootstrap?.lines;
+        if (!lines) {
             return;
         }
 
@@ -329,23 +747,19 @@ export class DashboardFormController extends FormController {
             return;
         }
 
-        let html = '<div class="row">';
+        let html = '';
+        // Gestionnaires : bouton d'affichage des performances de chaque tuile
+        if (this.isManager) {
+            html += `<div class="d-flex justify-content-end px-2 mb-1">
+                <button class="btn btn-sm ${this.showPerf ? 'btn-secondary' : 'btn-outline-secondary'}" id="perf_overlay_btn" title="Afficher les temps de calcul de chaque élément">
+                    <i class="fa fa-tachometer"></i> Performances
+                </button>
+            </div>`;
+        }
+        html += '<div class="row">';
         
-        for (const lineRecord of record.data.line_ids.records) {
-            const line = lineRecord.data;
-            // filter_id peut être un many2one sous forme [id, display] ou un objet {resId}
-            let filterId = null;
-            if (Array.isArray(line.filter_id)) {
-                filterId = line.filter_id[0];
-            } else if (line.filter_id && typeof line.filter_id === 'object') {
-                // Odoo 18 peut exposer m2o comme {id, display_name} ou {resId}
-                filterId = line.filter_id.id || line.filter_id.resId || null;
-            } else if (typeof line.filter_id === 'number') {
-                filterId = line.filter_id;
-            }
-            
-            // Récupérer l'ID serveur de la ligne
-            const serverLineId = lineRecord.resId || line.id || (line._values && line._values.id) || lineRecord.id;
+        for (const line of lines) {
+            const serverLineId = line.id;
             
             const widthCol = parseInt(line.width || 6, 10);
             const heightPx = parseInt(line.height || 400, 10);
@@ -379,11 +793,17 @@ export class DashboardFormController extends FormController {
                                 <a href="#" class="btn btn-sm btn-outline-primary open-filter-link" data-line-id="${serverLineId}" title="Ouvrir la recherche complète en plein écran">
                                     <i class="fa fa-expand"></i>
                                 </a>
+                                <a href="#" class="btn btn-sm btn-outline-success export-line-link" data-line-id="${serverLineId}" data-format="xlsx" title="Exporter le résultat complet (Excel)">
+                                    <i class="fa fa-file-excel-o"></i>
+                                </a>
+                                <a href="#" class="btn btn-sm btn-outline-success export-line-link" data-line-id="${serverLineId}" data-format="csv" title="Exporter le résultat complet (CSV)">
+                                    <i class="fa fa-file-text-o"></i>
+                                </a>
                                 ${editButtons}
                             </div>
                         </div>
                         <div class="card-body p-0" style="height: ${isNaN(heightPx) ? 400 : heightPx}px; overflow: auto;">
-                            <div id="dashboard_item_${lineRecord.id}" class="dashboard-item h-100 d-flex align-items-center justify-content-center">
+                            <div id="dashboard_item_${line.id}" class="dashboard-item h-100 d-flex align-items-center justify-content-center">
                                 <div class="spinner-border text-primary" role="status">
                                     <span class="visually-hidden">Chargement...</span>
                                 </div>
@@ -403,14 +823,62 @@ export class DashboardFormController extends FormController {
     // Ajouter les gestionnaires d'événements
     setTimeout(() => {
         this.attachOpenFilterLinks();
+        this.attachExportLinks();
         // Boutons d'édition uniquement pour les gestionnaires
         if (this.isManager) {
             this.attachEditLineLinks();
             this.attachEditFilterLinks();
+            const perfBtn = document.getElementById('perf_overlay_btn');
+            if (perfBtn) {
+                perfBtn.addEventListener('click', () => this.togglePerfOverlay());
+            }
         }
     }, 100);
     }
 
+    togglePerfOverlay() {
+        this.showPerf = !this.showPerf;
+        const btn = document.getElementById('perf_overlay_btn');
+        if (btn) {
+            btn.classList.toggle('btn-secondary', this.showPerf);
+            btn.classList.toggle('btn-outline-secondary', !this.showPerf);
+        }
+        document.querySelectorAll('.dashboard-perf-overlay').forEach(el => el.remove());
+        if (this.showPerf) {
+            for (const lineId of Object.keys(this.tilePerf || {})) {
+                this.renderPerfOverlay(lineId);
+            }
+        }
+    }
+
+    renderPerfOverlay(lineId) {
+        // Superposition : temps serveur (config / domaine / SQL / post-traitement), requêtes, lignes, groupes, cache
+        const perf = this.tilePerf?.[lineId];
+        const container = document.getElementById(`dashboard_item_${lineId}`);
+        if (!perf || !container) {
+            return;
+        }
+        container.querySelector('.dashboard-perf-overlay')?.remove();
+        const fmt = (v) => Math.round(v || 0).toLocaleString('fr-FR');
+        const overlay = document.createElement('div');
+        overlay.className = 'dashboard-perf-overlay';
+        let html = `<strong>${fmt(perf.total_ms)} ms</strong>`;
+        if (perf.not_modified) {
+            html += ' <span class="badge text-bg-success">non modifié</span>';
+        }
+        if (perf.cache_hit) {
+            html += ' <span class="badge text-bg-success">cache</span>';
+        } else {
+            html += `<br>config ${fmt(perf.config_ms)} · domaine ${fmt(perf.domain_ms)} · SQL ${fmt(perf.sql_ms)} · post ${fmt(perf.post_ms)} ms`;
+        }
+        html += `<br>${perf.queries || 0} requêtes · ${fmt(perf.rows)} lignes · ${fmt(perf.groups)} groupes`;
+        if (perf.source && perf.source !== 'live') {
+            html += `<br>source : ${perf.source}`;
+        }
+        overlay.innerHTML = html;
+        container.appendChild(overlay);
+    }
+
     attachOpenFilterLinks() {
         const links = document.querySelectorAll('.open-filter-link');
         
@@ -428,6 +896,41 @@ export class DashboardFormController extends FormController {
         });
     }
 
+    attachExportLinks() {
+        const links = document.querySelectorAll('.export-line-link');
+
+        links.forEach(link => {
+            link.addEventListener('click', (e) => {
+                e.preventDefault();
+                const lineId = parseInt(link.dataset.lineId);
+
+                if (!lineId) {
+                    return;
+                }
+
+                this.exportLine(lineId, link.dataset.format);
+            });
+        });
+    }
+
+    exportLine(serverLineId, format) {
+        // Téléchargement diffusé par le serveur : mêmes filtres (et filtre croisé) que l'élément affiché
+        const params = new URLSearchParams({ filters_values: JSON.stringify(this.getFiltersValues()) });
+        const tile = (this.dashboardTiles || []).find((t) => t.serverLineId === serverLineId);
+        if (tile && this.crossFilteredTiles?.[tile.lineId]) {
+            params.set('cross_filter', JSON.stringify({
+                model: this.crossFilter.model,
+                conditions: this.crossFilter.conditions,
+            }));
+        }
+        const link = document.createElement('a');
+        link.href = `/tableau_de_bord/export/${serverLineId}/${format}?${params}`;
+        link.download = '';
+        document.body.appendChild(link);
+        link.click();
+        link.remove();
+    }
+
     attachEditFilterLinks() {
         const links = document.querySelectorAll('.edit-filter-link');
         
@@ -524,203 +1027,564 @@ export class DashboardFormController extends FormController {
     }
 
     async loadDashboardItems() {
-        const record = this.model.root;
-        if (!record?.data?.line_ids?.records) return;
-
-    for (const lineRecord of record.data.line_ids.records) {
-            const line = lineRecord.data;
-            let filterId = null;
-            if (Array.isArray(line.filter_id)) {
-                filterId = line.filter_id[0];
-            } else if (line.filter_id && typeof line.filter_id === 'object') {
-                filterId = line.filter_id.id || line.filter_id.resId || null;
-            } else if (typeof line.filter_id === 'number') {
-                filterId = line.filter_id;
-            }
-            if (filterId) {
-        // Utiliser l'id serveur de la ligne si disponible pour le backend (overrides)
-        const serverLineId = lineRecord.resId || line.id || (line._values && line._values.id) || lineRecord.id;
-                const overrides = {
-                    display_mode: line.display_mode,
-                    graph_chart_type: line.graph_chart_type,
-                    graph_aggregator: line.graph_aggregator,
-                    graph_show_legend: line.graph_show_legend,
-                    show_data_title: line.show_data_title,
-                    show_record_count: line.show_record_count,
-                    // Pour les graphiques, envoyer aussi graph_measure et graph_groupbys
-                    graph_measure: line.graph_measure,
-                    graph_groupbys: line.graph_groupbys,
-                    // Pour les pivots
-                    pivot_row_groupby: line.pivot_row_groupby,
-                    pivot_column_groupby: line.pivot_col_groupby,
-                    pivot_measures: line.pivot_measure,
-                    pivot_sort_by: line.pivot_sort_by,
-                    pivot_sort_order: line.pivot_sort_order,
-                    // Pour les listes groupées
-                    list_groupby: line.list_groupby,
-                };
-                await this.loadFilterData(lineRecord.id, filterId, serverLineId, overrides);
+        const dashboard = this.bootstrap;
+        if (!dashboard?.lines) return;
+        this.profiledLoad = false;
+        // Résultats calculés par le chargement initial : valables pour le premier affichage seulement
+        const inlineTiles = this.bootstrapTiles || {};
+        this.bootstrapTiles = null;
+
+        // Un nouveau chargement (filtres ré-appliqués) annule le précédent
+        this.abortTileRequests();
+        const abortController = new AbortController();
+        this.tileAbortController = abortController;
+        const signal = abortController.signal;
+        const tiles = [];
+        this.dashboardTiles = tiles;
+        // Ré-appliquer les filtres du tableau de bord annule le filtre croisé
+        this.crossFilter = null;
+        this.crossFilteredTiles = {};
+        this.renderCrossFilterBar();
+
+        for (const line of dashboard.lines) {
+            if (line.filter_id) {
+                // Overrides construits par le serveur (courbes : nombre de points selon la largeur affichée)
+                const overrides = { ...line.overrides };
+                if (this.fullResolution?.[line.id]) {
+                    overrides.graph_max_points = 0;
+                }
+                tiles.push({
+                    lineId: line.id,
+                    filterId: line.filter_id,
+                    serverLineId: line.id,
+                    overrides,
+                    refreshInterval: line.refresh_interval || dashboard.refresh_interval || 0,
+                    model: line.model_name,
+                    inlineData: inlineTiles[line.id],
+                });
             } else {
-                this.renderError(lineRecord.id, "Aucun filtre sélectionné");
+                this.renderError(line.id, "Aucun filtre sélectionné");
+            }
+        }
+
+        // Afficher immédiatement les derniers résultats connus, puis les revalider un par un
+        await this.paintCachedTiles(tiles);
+        for (const tile of tiles) {
+            if (signal.aborted) {
+                return;
+            }
+            await this.loadFilterData(tile.lineId, tile.filterId, tile.serverLineId, tile.overrides, signal, tile.inlineData);
+            delete tile.inlineData;
+        }
+        if (signal.aborted) {
+            return;
+        }
+        tileCache.evict();
+        if (this.tileAbortController === abortController) {
+            this.tileAbortController = null;
+        }
+        this.startAutoRefresh(tiles);
+
+        // Chargement profilé à la demande d'un gestionnaire : enregistrer le profil
+        if (this.profiledLoad) {
+            await this.finishProfile();
+        }
+    }
+
+    async finishProfile() {
+        try {
+            const result = await rpc("/tableau_de_bord/profile_finish/" + this.model.root.resId, {});
+            if (result.done) {
+                await this.actionService.doAction({
+                    type: 'ir.actions.client',
+                    tag: 'display_notification',
+                    params: {
+                        title: 'Profilage',
+                        message: `Profil enregistré sur le tableau de bord (${result.filename})`,
+                        type: 'success',
+                    },
+                });
+            }
+        } catch (error) {
+            console.error("[TDB] Erreur lors de l'enregistrement du profil:", error);
+        }
+        this.profiledLoad = false;
+    }
+
+    tileCacheKey(backendLineId, filtersValues) {
+        const values = Object.keys(filtersValues || {}).sort().map((key) => [key, filtersValues[key]]);
+        return [user.userId, this.model?.root?.resId, backendLineId, JSON.stringify(values)].join("|");
+    }
+
+    async paintCachedTiles(tiles) {
+        this.tileHashes = {};
+        this.tileFingerprints = {};
+        await tileCache.checkUser(user.userId);
+        const filtersValues = this.getFiltersValues();
+        await Promise.all(tiles.map(async (tile) => {
+            const entry = await tileCache.get(this.tileCacheKey(tile.serverLineId || tile.lineId, filtersValues));
+            if (entry) {
+                this.renderFilterData(tile.lineId, entry.payload);
+                this.tileHashes[tile.lineId] = entry.hash;
+                this.tileFingerprints[tile.lineId] = entry.fingerprint;
+            }
+        }));
+    }
+
+    startAutoRefresh(tiles) {
+        // Actualisation automatique : les empreintes des éléments dont l'intervalle est échu
+        // sont demandées au serveur, seuls les éléments dont les données ont bougé sont recalculés
+        this.stopAutoRefresh();
+        const now = Date.now();
+        this.refreshTiles = tiles
+            .filter((tile) => tile.refreshInterval > 0)
+            .map((tile) => ({
+                ...tile,
+                refreshMs: Math.max(tile.refreshInterval, REFRESH_MIN_SECONDS) * 1000,
+                nextCheck: now + Math.max(tile.refreshInterval, REFRESH_MIN_SECONDS) * 1000,
+            }));
+        if (!this.refreshTiles.length) {
+            return;
+        }
+        const tickMs = Math.min(...this.refreshTiles.map((tile) => tile.refreshMs));
+        this.refreshTimer = setInterval(() => this.refreshChangedTiles(), tickMs);
+    }
+
+    stopAutoRefresh() {
+        if (this.refreshTimer) {
+            clearInterval(this.refreshTimer);
+            this.refreshTimer = null;
+        }
+    }
+
+    async refreshChangedTiles() {
+        // Onglet masqué ou chargement en cours : attendre le prochain passage
+        if (document.hidden || this.tileAbortController || this.refreshRunning) {
+            return;
+        }
+        const now = Date.now();
+        const due = (this.refreshTiles || []).filter((tile) => tile.nextCheck <= now);
+        if (!due.length) {
+            return;
+        }
+        this.refreshRunning = true;
+        const abortController = new AbortController();
+        this.tileAbortController = abortController;
+        const signal = abortController.signal;
+        try {
+            const filtersValues = this.getFiltersValues();
+            const result = await rpc("/tableau_de_bord/fingerprints", {
+                dashboard_id: this.model?.root?.resId,
+                filters_values: filtersValues,
+                tiles: due.map((tile) => ({
+                    line_id: tile.serverLineId || tile.lineId,
+                    filter_id: tile.filterId,
+                    overrides: tile.overrides,
+                    // Origine des données du résultat affiché (instantané, agrégat, table)
+                    known_fingerprint: this.tileFingerprints?.[tile.lineId] || null,
+                })),
+            });
+            const fingerprints = result.fingerprints || {};
+            for (const tile of due) {
+                if (signal.aborted) {
+                    return;
+                }
+                tile.nextCheck = Date.now() + tile.refreshMs;
+                const fingerprint = fingerprints[tile.serverLineId || tile.lineId];
+                if (fingerprint && fingerprint === this.tileFingerprints?.[tile.lineId]) {
+                    continue;
+                }
+                await this.loadFilterData(tile.lineId, tile.filterId, tile.serverLineId, tile.overrides, signal);
             }
+        } catch (error) {
+            console.warn("[TDB] Actualisation automatique impossible:", error);
+        } finally {
+            this.refreshRunning = false;
+            if (this.tileAbortController === abortController) {
+                this.tileAbortController = null;
+            }
+        }
+    }
+
+    abortTileRequests() {
+        if (this.tileAbortController) {
+            this.tileAbortController.abort();
+            this.tileAbortController = null;
         }
     }
 
-    async loadFilterData(lineId, filterId, backendLineId, overrides) {
+    async loadFilterData(lineId, filterId, backendLineId, overrides, signal, inlineData = null) {
         try {
             const lid = backendLineId || lineId;
             const dashboardId = this.model?.root?.resId;
             
             // Collecter les valeurs des filtres
             const filtersValues = this.getFiltersValues();
+            // Filtre croisé non applicable au cube de l'élément : appliqué par le serveur
+            const crossFilter = this.crossFilteredTiles?.[lineId] === 'server'
+                ? { model: this.crossFilter.model, conditions: this.crossFilter.conditions }
+                : null;
             
-            const data = await rpc("/tableau_de_bord/get_filter_data/" + filterId, { 
-                line_id: lid, 
-                overrides, 
-                dashboard_id: dashboardId,
-                filters_values: filtersValues
-            });
-            this.renderFilterData(lineId, data);
+            let data = inlineData;
+            if (!data) {
+                const request = rpc("/tableau_de_bord/get_filter_data/" + filterId, { 
+                    line_id: lid, 
+                    overrides, 
+                    dashboard_id: dashboardId,
+                    filters_values: filtersValues,
+                    // Empreintes du résultat affiché : le serveur répond « non modifié » s'il est inchangé
+                    known_hash: crossFilter ? null : this.tileHashes?.[lineId] || null,
+                    known_fingerprint: crossFilter ? null : this.tileFingerprints?.[lineId] || null,
+                    cross_filter: crossFilter,
+                });
+                // Annulation : la requête HTTP est interrompue côté navigateur
+                const onAbort = () => request.abort();
+                signal?.addEventListener('abort', onAbort, { once: true });
+                try {
+                    data = await request;
+                } finally {
+                    signal?.removeEventListener('abort', onAbort);
+                }
+            }
+            if (signal?.aborted) {
+                return;
+            }
+            if (data._profiled) {
+                this.profiledLoad = true;
+            }
+            this.tileHashes = this.tileHashes || {};
+            this.tileFingerprints = this.tileFingerprints || {};
+            if (crossFilter) {
+                // Résultat filtré : ni mis en cache, ni comparé au résultat complet
+                delete this.tileHashes[lineId];
+                delete this.tileFingerprints[lineId];
+                this.renderFilterData(lineId, data);
+                return;
+            }
+            if (data.not_modified) {
+                // Résultat inchangé : l'élément affiché est conservé, seule l'empreinte est mise à jour
+                this.storeTilePerf(lineId, data);
+                if (data._fingerprint !== this.tileFingerprints[lineId]) {
+                    this.tileFingerprints[lineId] = data._fingerprint;
+                    tileCache.update(this.tileCacheKey(lid, filtersValues), { fingerprint: data._fingerprint });
+                }
+                return;
+            }
+            if (data._hash && this.tileHashes[lineId] === data._hash) {
+                // Données identiques à celles déjà affichées depuis le cache : pas de nouveau rendu
+                this.storeTilePerf(lineId, data);
+            } else {
+                this.renderFilterData(lineId, data);
+            }
+            if (data._hash) {
+                this.tileHashes[lineId] = data._hash;
+                this.tileFingerprints[lineId] = data._fingerprint;
+                const payload = Object.fromEntries(Object.entries(data).filter(([key]) => !key.startsWith('_')));
+                tileCache.put({
+                    key: this.tileCacheKey(lid, filtersValues),
+                    hash: data._hash,
+                    fingerprint: data._fingerprint,
+                    payload,
+                    size: JSON.stringify(payload).length,
+                });
+            } else {
+                delete this.tileHashes[lineId];
+                delete this.tileFingerprints[lineId];
+            }
         } catch (error) {
+            if (signal?.aborted) {
+                return;
+            }
             this.renderError(lineId, "Erreur lors du chargement des données: " + error.message);
         }
     }
 
-    renderFilterData(lineId, data) {
+    async renderFilterData(lineId, data) {
         const container = document.getElementById(`dashboard_item_${lineId}`);
         if (!container) {
             return;
         }
 
+        if (data.timeout) {
+            this.renderTimeout(lineId, data);
+            return;
+        }
         if (data.error) {
             this.renderError(lineId, data.error);
             return;
         }
+        // Cube client : l'élément est ré-agrégé dans le Web Worker avant d'être dessiné
+        if (data.cube && !data._fromCube) {
+            this.renderCubeTile(lineId, data);
+            return;
+        }
+        if (!data.cube && this.cubeState) {
+            delete this.cubeState[lineId];
+        }
+
+        // Jeton du rendu : un rendu asynchrone dépassé par un plus récent n'est pas inséré
+        const token = String(++renderSeq);
+        container.dataset.renderToken = token;
 
         switch (data.type) {
             case 'list':
-                this.renderListData(container, data);
+                await this.renderListData(container, data);
                 break;
             case 'graph':
                 this.renderGraphData(container, data);
                 break;
             case 'pivot':
-                this.renderPivotData(container, data);
+                await this.renderPivotData(container, data);
+                break;
+            case 'kpi':
+                this.renderKpiData(container, data);
                 break;
             default:
                 this.renderError(lineId, "Type de données non supporté: " + data.type);
+                return;
+        }
+        if (container.dataset.renderToken !== token) {
+            return;
+        }
+
+        // Données servies par un instantané matérialisé : afficher leur date
+        if (data.snapshot_date) {
+            const asOf = new Date(data.snapshot_date.replace(' ', 'T') + 'Z').toLocaleString('fr-FR', {
+                dateStyle: 'short',
+                timeStyle: 'short',
+            });
+            const badge = document.createElement('div');
+            badge.className = 'dashboard-snapshot-date small text-muted';
+            badge.title = "Données issues d'un instantané rafraîchi périodiquement";
+            badge.innerHTML = `<i class="fa fa-clock-o"></i> Données au ${asOf}`;
+            container.appendChild(badge);
+        }
+
+        // Valeurs estimées sur un échantillon de la table : taille et marge d'erreur
+        if (data.sample) {
+            const fmt = (v) => v.toLocaleString('fr-FR', { maximumFractionDigits: 2 });
+            const badge = document.createElement('div');
+            badge.className = 'dashboard-sample-badge small text-muted';
+            badge.title = `Valeurs estimées sur un échantillon d'environ ${fmt(data.sample.rows)} lignes ; sommes et nombres extrapolés, marge d'erreur à 95 % sur les totaux (plus large pour les petits groupes)`;
+            badge.innerHTML = `<i class="fa fa-flask"></i> Échantillon ${fmt(data.sample.percent)} % · ±${fmt(data.sample.error_percent)} %`;
+            container.appendChild(badge);
+        }
+
+        // Courbe simplifiée à la largeur de l'élément : proposer la pleine résolution
+        if (data.downsampled) {
+            const fmt = (v) => v.toLocaleString('fr-FR');
+            const badge = document.createElement('div');
+            badge.className = 'dashboard-downsample-badge small text-muted';
+            badge.title = `Courbe simplifiée (Largest-Triangle-Three-Buckets) : ${fmt(data.downsampled.points)} points affichés sur ${fmt(data.downsampled.total)}`;
+            badge.innerHTML = `<i class="fa fa-line-chart"></i> ${fmt(data.downsampled.points)} / ${fmt(data.downsampled.total)} points ·
+                <a href="#" class="dashboard-full-resolution">Pleine résolution</a>`;
+            badge.querySelector('a').addEventListener('click', (ev) => {
+                ev.preventDefault();
+                this.loadFullResolution(lineId);
+            });
+            container.appendChild(badge);
         }
+
+        if (data._fromCube) {
+            this.renderCubeToolbar(lineId, data);
+        }
+
+        this.storeTilePerf(lineId, data);
     }
 
-    renderListData(container, data) {
-        if (!data.data || data.data.length === 0) {
-            container.innerHTML = '<div class="alert alert-info m-2">Aucune donnée à afficher</div>';
+    async loadFullResolution(lineId) {
+        // Recharge la courbe sans simplification, conservé jusqu'au rechargement du tableau de bord
+        const tile = (this.dashboardTiles || []).find((t) => t.lineId === lineId);
+        if (!tile) {
             return;
         }
-        
-        // Filtrer les champs invalides
-        const validFields = (data.fields || []).filter(f => f !== null && f !== undefined);
-        
-        if (validFields.length === 0) {
-            container.innerHTML = '<div class="alert alert-warning m-2">Aucun champ à afficher</div>';
+        this.fullResolution = { ...this.fullResolution, [lineId]: true };
+        // Même objet que celui de l'actualisation automatique : les empreintes suivent
+        tile.overrides.graph_max_points = 0;
+        await this.loadFilterData(tile.lineId, tile.filterId, tile.serverLineId, tile.overrides);
+    }
+
+    async renderCubeTile(lineId, payload) {
+        // Options locales de l'élément (inversion, top N) conservées d'un rendu à l'autre
+        this.cubeState = this.cubeState || {};
+        const previous = this.cubeState[lineId];
+        const cube = payload.cube;
+        const state = {
+            payload,
+            transposed: previous?.transposed || false,
+            limit: previous ? previous.limit : cube.limit || 0,
+        };
+        this.cubeState[lineId] = state;
+
+        const dims = cube.dimensions.map((_dim, i) => i);
+        const nr = payload.type === 'pivot' ? cube.rows : dims.length;
+        let rowDims = dims.slice(0, nr);
+        let colDims = dims.slice(nr);
+        if (state.transposed) {
+            [rowDims, colDims] = [colDims, rowDims];
+        }
+        const result = await tileWorker.run('cube', {
+            cube,
+            mode: payload.type,
+            rowDims,
+            colDims,
+            filters: this.crossFilteredTiles?.[lineId] === 'local' ? this.localCrossFilters(lineId) : [],
+            limit: state.limit,
+            sortBy: cube.sort_by,
+            sortOrder: cube.sort_order,
+        });
+        // Un rendu plus récent a été demandé entre-temps
+        if (this.cubeState[lineId] !== state) {
             return;
         }
-        
-        // Détecter si c'est une liste groupée
-        const isGrouped = data.is_grouped === true;
-        
-        let html = '<div class="table-responsive h-100"><table class="table table-sm mb-0">';
-        
-        // En-têtes
-        html += '<thead class="table-light"><tr>';
-        for (const f of validFields) {
-            const label = typeof f === 'string' ? f : (f?.string || f?.name || 'Sans nom');
-            const fieldType = f?.type || 'char';
-            const isNumeric = ['integer', 'float', 'monetary'].includes(fieldType);
-            const isAggregate = f?.is_aggregate === true;
-            const alignClass = isNumeric ? 'text-end' : '';
-            // Style spécial pour les colonnes d'agrégation
-            const headerStyle = isAggregate ? 'background-color: #e3f2fd;' : '';
-            html += `<th class="${alignClass}" style="white-space: nowrap; font-size: 0.875rem; overflow: hidden; text-overflow: ellipsis; max-width: 200px; padding: 0.25rem 0.5rem; ${headerStyle}" title="${label}">${label}</th>`;
+        let data = result;
+        if (payload.type === 'graph') {
+            const dataset = payload.data?.datasets?.[0] || { label: cube.measures[0].label };
+            data = {
+                labels: result.labels,
+                keys: result.keys,
+                datasets: [{
+                    ...dataset,
+                    data: result.values,
+                    backgroundColor: result.values.map((_v, i) => CHART_PALETTE[i % CHART_PALETTE.length]),
+                }],
+            };
         }
-        html += '</tr></thead>';
-        
-        // Données
-        html += '<tbody>';
-        for (const row of data.data) {
-            // Détecter si c'est une ligne d'en-tête de groupe (total de niveau 1)
-            const isGroupHeader = row._is_group_header === true;
-            const groupLevel = row._group_level || 1;
-            
-            // Style de la ligne selon le niveau
-            let rowClass = '';
-            let rowStyle = '';
-            if (isGroupHeader) {
-                // Ligne de total de groupe : fond coloré et texte en gras
-                rowClass = 'table-primary';
-                rowStyle = 'font-weight: 600;';
-            } else if (groupLevel === 2) {
-                // Ligne de détail niveau 2 : légèrement indentée visuellement
-                rowStyle = 'background-color: #fafbfc;';
+        this.renderFilterData(lineId, { ...payload, data, _fromCube: true });
+    }
+
+    renderCubeToolbar(lineId, data) {
+        // Top N et inversion lignes/colonnes recalculés localement
+        const container = document.getElementById(`dashboard_item_${lineId}`);
+        const state = this.cubeState?.[lineId];
+        if (!container || !state) {
+            return;
+        }
+        const choices = [...new Set([5, 10, 20, 50, data.cube.limit || 0, state.limit || 0])].filter((n) => n > 0).sort((a, b) => a - b);
+        const options = ['<option value="0">Tous</option>']
+            .concat(choices.map((n) => `<option value="${n}" ${n === state.limit ? 'selected' : ''}>Top ${n}</option>`))
+            .join('');
+        const toolbar = document.createElement('div');
+        toolbar.className = 'dashboard-cube-toolbar';
+        toolbar.innerHTML = `<select class="form-select form-select-sm" title="Nombre de groupes affichés">${options}</select>`
+            + (data.type === 'pivot'
+                ? '<button class="btn btn-sm btn-light" title="Inverser lignes et colonnes"><i class="fa fa-exchange"></i></button>'
+                : '');
+        toolbar.querySelector('select').addEventListener('change', (ev) => {
+            state.limit = parseInt(ev.target.value, 10) || 0;
+            this.renderCubeTile(lineId, state.payload);
+        });
+        toolbar.querySelector('button')?.addEventListener('click', () => {
+            state.transposed = !state.transposed;
+            this.renderCubeTile(lineId, state.payload);
+        });
+        container.appendChild(toolbar);
+    }
+
+    localCrossFilters(lineId) {
+        // Conditions du filtre croisé traduites en dimensions du cube de l'élément (null si impossible)
+        const cube = this.cubeState?.[lineId]?.payload?.cube;
+        if (!this.crossFilter || !cube || cube.model !== this.crossFilter.model) {
+            return null;
+        }
+        const filters = [];
+        for (const condition of this.crossFilter.conditions) {
+            const dim = cube.dimensions.findIndex((d) => d.groupby === condition.groupby);
+            if (dim < 0) {
+                return null;
             }
-            
-            html += `<tr class="${rowClass}" style="${rowStyle}">`;
-            for (const f of validFields) {
-                const name = typeof f === 'string' ? f : (f?.name || '');
-                const fieldType = f?.type || 'char';
-                const digits = f?.digits;
-                const isAggregate = f?.is_aggregate === true;
-                const isGroupby = f?.is_groupby === true;
-                let val = row[name];
-                let displayVal = '';
-                let alignClass = '';
-                let cellStyle = '';
-                
-                // Style spécial pour les cellules d'agrégation
-                if (isAggregate && !isGroupHeader) {
-                    cellStyle = 'background-color: #f5faff;';
-                }
-                
-                // Traitement selon le type de champ
-                if (fieldType === 'integer' && val !== null && val !== undefined && val !== false && val !== '') {
-                    // Entier avec séparateur de milliers
-                    alignClass = 'text-end';
-                    displayVal = parseInt(val).toLocaleString('fr-FR');
-                } else if ((fieldType === 'float' || fieldType === 'monetary') && val !== null && val !== undefined && val !== false && val !== '') {
-                    // Décimal avec séparateur de milliers et respect des décimales
-                    alignClass = 'text-end';
-                    const numDigits = digits !== undefined ? digits : 2;
-                    displayVal = parseFloat(val).toLocaleString('fr-FR', {
-                        minimumFractionDigits: numDigits,
-                        maximumFractionDigits: numDigits
-                    });
-                } else if (Array.isArray(val)) {
-                    // many2one: [id, display]
-                    displayVal = val.length > 1 ? val[1] : val[0];
-                } else if (val && typeof val === 'object') {
-                    // divers formats -> stringify propre
-                    displayVal = val.display_name || val.name || JSON.stringify(val);
-                } else if (val !== null && val !== undefined && val !== false) {
-                    // Valeur simple
-                    displayVal = val;
+            filters.push({ dim, key: condition.key });
+        }
+        return filters;
+    }
+
+    async applyCrossFilter(sourceLineId, model, conditions) {
+        // Clic sur un groupe : filtre les autres éléments du même modèle (un second clic l'annule)
+        const same = this.crossFilter && sourceLineId
+            && this.crossFilter.sourceLineId === sourceLineId
+            && JSON.stringify(this.crossFilter.conditions) === JSON.stringify(conditions);
+        const previous = this.crossFilteredTiles || {};
+        this.crossFilter = !sourceLineId || same ? null : { sourceLineId, model, conditions };
+        this.crossFilteredTiles = {};
+        const tiles = this.dashboardTiles || [];
+        if (this.crossFilter) {
+            for (const tile of tiles) {
+                if (tile.model === model && tile.lineId !== sourceLineId) {
+                    this.crossFilteredTiles[tile.lineId] = this.localCrossFilters(tile.lineId) ? 'local' : 'server';
                 }
-                
-                html += `<td class="${alignClass}" style="${cellStyle}">${displayVal}</td>`;
             }
-            html += '</tr>';
         }
-        html += '</tbody>';
-        
-        html += `</table></div>`;
-        
-        // Afficher le compteur seulement si show_record_count est True
-        if (data.show_record_count !== false && data.count !== undefined) {
-            const countLabel = isGrouped ? 'Total enregistrements' : 'Total';
-            html += `<div class="text-muted small p-2 border-top">${countLabel}: ${data.count} enregistrement(s)</div>`;
+        this.renderCrossFilterBar();
+
+        // Éléments recalculés dans le navigateur, puis ceux qui repassent par le serveur
+        const serverTiles = [];
+        for (const tile of tiles) {
+            const now = this.crossFilteredTiles[tile.lineId];
+            const before = previous[tile.lineId];
+            if (!now && !before) {
+                continue;
+            }
+            if (now === 'server' || before === 'server') {
+                serverTiles.push(tile);
+            } else {
+                this.renderCubeTile(tile.lineId, this.cubeState[tile.lineId].payload);
+            }
+        }
+        for (const tile of serverTiles) {
+            await this.loadFilterData(tile.lineId, tile.filterId, tile.serverLineId, tile.overrides);
+        }
+    }
+
+    renderCrossFilterBar() {
+        const container = document.getElementById('dashboard_container');
+        if (!container) {
+            return;
+        }
+        let bar = document.getElementById('cross_filter_bar');
+        if (!this.crossFilter) {
+            bar?.remove();
+            return;
+        }
+        if (!bar) {
+            bar = document.createElement('div');
+            bar.id = 'cross_filter_bar';
+            bar.className = 'alert alert-info d-flex align-items-center gap-2 py-1 px-2 mx-2 mb-2';
+            container.prepend(bar);
+        }
+        const label = this.crossFilter.conditions.map((c) => c.label).join(' / ');
+        bar.innerHTML = `<i class="fa fa-filter"></i> <span class="flex-grow-1">Filtre croisé : <strong>${label}</strong></span>
+            <button class="btn btn-sm btn-link p-0" title="Retirer le filtre croisé"><i class="fa fa-times"></i></button>`;
+        bar.querySelector('button').addEventListener('click', () => this.applyCrossFilter(null));
+    }
+
+    storeTilePerf(lineId, data) {
+        // Mesures de performance du serveur (affichées à la demande des gestionnaires)
+        if (data._perf) {
+            this.tilePerf = this.tilePerf || {};
+            this.tilePerf[lineId] = data._perf;
+            if (this.showPerf) {
+                this.renderPerfOverlay(lineId);
+            }
+        }
+    }
+
+    async renderListData(container, data) {
+        // HTML construit dans le Web Worker : le fil principal ne fait que l'insérer
+        const token = container.dataset.renderToken;
+        const built = await tileWorker.run('list', {
+            data: data.data,
+            fields: data.fields,
+            is_grouped: data.is_grouped,
+            show_record_count: data.show_record_count,
+            count: data.count,
+        });
+        if (container.dataset.renderToken !== token) {
+            return;
+        }
+        patchHtml(container, built.html);
+        if (built.className) {
+            container.className = built.className;
         }
-        
-        container.innerHTML = html;
-        container.className = "dashboard-item h-100 d-flex flex-column";
     }
 
     renderGraphData(container, data) {
@@ -791,16 +1655,43 @@ export class DashboardFormController extends FormController {
                 };
             }
             
+            // Comparaison de périodes : l'écart en pourcentage est ajouté à l'infobulle
+            const datasets = data.data.datasets;
+            const compareDataset = datasets.find(ds => ds.delta_percent);
+            if (compareDataset) {
+                chartOptions.plugins.tooltip = {
+                    callbacks: {
+                        footer: (items) => {
+                            const delta = compareDataset.delta_percent[items[0]?.dataIndex];
+                            if (delta === null || delta === undefined) return '';
+                            return `Écart : ${delta > 0 ? '+' : ''}${delta.toLocaleString('fr-FR', { maximumFractionDigits: 1 })} %`;
+                        }
+                    }
+                };
+            }
+
+            // Cube client : un clic sur un groupe filtre les autres éléments du même modèle
+            const keys = data.data.keys;
+            if (keys && data.cube) {
+                const lineId = container.id.replace('dashboard_item_', '');
+                chartOptions.onClick = (_event, elements) => {
+                    if (elements.length && keys[elements[0].index]?.length) {
+                        this.applyCrossFilter(lineId, data.cube.model, keys[elements[0].index]);
+                    }
+                };
+            }
+
             new window.Chart(el.getContext('2d'), {
                 type: chartType,
                 data: {
                     labels,
-                    datasets: [{
-                        label: dataset.label,
-                        data: dataset.data,
-                        backgroundColor: dataset.backgroundColor || '#1f77b4',
+                    datasets: datasets.map(ds => ({
+                        label: ds.label,
+                        data: ds.data,
+                        backgroundColor: ds.backgroundColor || '#1f77b4',
+                        borderColor: chartType === 'line' ? ds.backgroundColor : undefined,
                         borderWidth: 1,
-                    }]
+                    }))
                 },
                 options: chartOptions
             });
@@ -822,113 +1713,100 @@ export class DashboardFormController extends FormController {
         }
     }
 
+    renderKpiData(container, data) {
+        // Indicateur : grande valeur, écart avec la période de comparaison et mini-courbe SVG (sans Chart.js)
+        const digits = data.digits || 0;
+        const formatValue = (v) => parseFloat(v || 0).toLocaleString('fr-FR', {
+            minimumFractionDigits: digits,
+            maximumFractionDigits: digits,
+        });
+        const showDataTitle = data.show_data_title !== undefined ? data.show_data_title : true;
+
+        let html = '<div class="h-100 d-flex flex-column justify-content-center text-center p-2 dashboard-kpi">';
+        if (showDataTitle) {
+            const title = [data.label, data.period_label].filter(Boolean).join(' - ');
+            html += `<div class="small text-muted text-truncate" title="${title}">${title}</div>`;
+        }
+        html += `<div class="dashboard-kpi-value fw-bold">${formatValue(data.value)}</div>`;
+
+        if (data.compare) {
+            const delta = data.compare.delta_percent;
+            let deltaHtml = '<span class="text-muted">-</span>';
+            if (delta !== null && delta !== undefined) {
+                const deltaClass = delta >= 0 ? 'text-success' : 'text-danger';
+                const arrow = delta >= 0 ? 'fa-arrow-up' : 'fa-arrow-down';
+                deltaHtml = `<span class="${deltaClass}"><i class="fa ${arrow}"></i> ${Math.abs(delta).toLocaleString('fr-FR', { maximumFractionDigits: 1 })} %</span>`;
+            }
+            html += `<div class="small">${deltaHtml} <span class="text-muted">vs ${data.compare.label} (${formatValue(data.compare.value)})</span></div>`;
+        }
+
+        const values = data.sparkline?.values || [];
+        if (values.length > 1) {
+            const min = Math.min(...values);
+            const range = (Math.max(...values) - min) || 1;
+            const points = values.map((v, i) => {
+                const x = (i / (values.length - 1)) * 100;
+                const y = 28 - ((v - min) / range) * 26;
+                return `${x.toFixed(2)},${y.toFixed(2)}`;
+            }).join(' ');
+            const labels = data.sparkline.labels || [];
+            const title = labels.map((l, i) => `${l} : ${formatValue(values[i])}`).join('\n');
+            html += `<svg class="dashboard-kpi-sparkline mt-2" viewBox="0 0 100 30" preserveAspectRatio="none"><title>${title}</title>`;
+            html += `<polyline points="${points}" fill="none" stroke="#1f77b4" stroke-width="1.5" vector-effect="non-scaling-stroke"/></svg>`;
+        }
+        html += '</div>';
+
+        container.innerHTML = html;
+        container.className = "dashboard-item h-100";
+    }
+
     formatNumber(value) {
-        if (value === null || value === undefined) return '0';
-        // Formater avec séparateur de milliers en nombres entiers uniquement
-        const num = parseFloat(value);
-        if (isNaN(num)) return value;
-        // Arrondir à l'entier le plus proche
-        const rounded = Math.round(num);
-        return rounded.toLocaleString('fr-FR');
+        return formatNumberFr(value);
     }
 
-    renderPivotData(container, data) {
-        // Support 2D matrix: data.data = { columns: [{label}], rows: [{row, values:[]}], measure_label, row_label, col_label }
-        if (data.data && data.data.columns && data.data.rows) {
-            const cols = data.data.columns;
-            const rows = data.data.rows;
-            const measureLabel = data.data.measure_label || 'Total';
-            const rowLabel = data.data.row_label || 'Lignes';
-            const colLabel = data.data.col_label || 'Colonnes';
-            const colTotals = data.data.col_totals || null;
-            const grandTotal = data.data.grand_total || null;
-            const showRowTotals = rows.length > 0 && rows[0].hasOwnProperty('row_total');
-            const showColTotals = colTotals !== null;
-            const showDataTitle = data.show_data_title !== undefined ? data.show_data_title : true;
-            
-            let html = '<div class="h-100 d-flex flex-column">';
-            if (showDataTitle) {
-                html += '<div class="px-2 pt-2"><small class="text-muted">Mesure: <strong>' + measureLabel + '</strong></small></div>';
-            }
-            html += '<div class="table-responsive flex-grow-1 px-2"><table class="table table-sm table-hover mb-0" style="font-size: 0.9rem;">';
-            
-            // header avec libellés améliorés
-            html += '<thead class="table-light"><tr>';
-            html += '<th class="border-end" style="background-color: #f8f9fa;">' + rowLabel + '</th>';
-            for (const c of cols) html += '<th class="text-end">' + c.label + '</th>';
-            if (showRowTotals) {
-                html += '<th class="text-end border-start fw-bold" style="background-color: #e9ecef;">Total</th>';
-            }
-            html += '</tr></thead>';
-            
-            // body
-            html += '<tbody>';
-            for (const r of rows) {
-                html += '<tr><td class="border-end fw-bold" style="background-color: #fafbfc;">' + r.row + '</td>';
-                for (const v of (r.values || [])) {
-                    const formattedValue = this.formatNumber(v);
-                    html += '<td class="text-end">' + formattedValue + '</td>';
-                }
-                if (showRowTotals) {
-                    const total = r.row_total !== undefined ? r.row_total : (r.values || []).reduce((a, b) => a + (b || 0), 0);
-                    const formattedTotal = this.formatNumber(total);
-                    html += '<td class="text-end border-start fw-bold" style="background-color: #f8f9fa;">' + formattedTotal + '</td>';
-                }
-                html += '</tr>';
-            }
-            
-            // footer totals by column
-            if (showColTotals) {
-                html += '<tr class="table-secondary border-top border-2"><td class="border-end fw-bold">Total</td>';
-                for (const t of colTotals) {
-                    const formattedValue = this.formatNumber(t);
-                    html += '<td class="text-end fw-bold">' + formattedValue + '</td>';
-                }
-                if (showRowTotals && grandTotal !== null) {
-                    const formattedGrand = this.formatNumber(grandTotal);
-                    html += '<td class="text-end border-start fw-bold">' + formattedGrand + '</td>';
-                } else if (showRowTotals) {
-                    // Calculer le grand total si pas fourni
-                    const grand = colTotals.reduce((a, b) => a + b, 0);
-                    const formattedGrand = this.formatNumber(grand);
-                    html += '<td class="text-end border-start fw-bold">' + formattedGrand + '</td>';
-                }
-                html += '</tr>';
-            }
-            html += '</tbody></table></div></div>';
-            container.innerHTML = html;
-            container.className = "dashboard-item h-100";
+    async renderPivotData(container, data) {
+        // HTML construit dans le Web Worker : le fil principal ne fait que l'insérer
+        const token = container.dataset.renderToken;
+        const built = await tileWorker.run('pivot', {
+            data: data.data,
+            show_data_title: data.show_data_title,
+            clickable: Boolean(data.cube),
+        });
+        if (container.dataset.renderToken !== token) {
             return;
         }
+        patchHtml(container, built.html);
+        container.className = "dashboard-item h-100";
 
-        // 1D list fallback avec libellés améliorés
-        const measureLabel = data.measure_label || 'Valeur';
-        const rowLabel = data.row_label || 'Lignes';
-        const showTotal = data.total !== undefined;
-        const showDataTitle = data.show_data_title !== undefined ? data.show_data_title : true;
-        
-        let html = '<div class="h-100 d-flex flex-column">';
-        if (showDataTitle) {
-            html += '<div class="px-2 pt-2"><small class="text-muted">Mesure: <strong>' + measureLabel + '</strong></small></div>';
-        }
-        html += '<div class="table-responsive flex-grow-1 px-2"><table class="table table-sm table-hover mb-0" style="font-size: 0.9rem;">';
-        html += '<thead class="table-light"><tr><th>' + rowLabel + '</th><th class="text-end">' + measureLabel + '</th></tr></thead>';
-        html += '<tbody>';
-        
-        for (const row of (data.data || [])) {
-            const formattedValue = this.formatNumber(row.value);
-            html += '<tr><td>' + row.row + '</td><td class="text-end fw-bold">' + formattedValue + '</td></tr>';
+        // Cube client : un clic sur un libellé de ligne filtre les autres éléments du même modèle
+        // (écouteur unique sur l'élément, les cellules conservées d'un rendu à l'autre n'en portent pas)
+        container.pivotData = data;
+        if (!container.dataset.crossFilterBound) {
+            container.dataset.crossFilterBound = '1';
+            container.addEventListener('click', (ev) => {
+                const cell = ev.target.closest('td[data-row-index]');
+                const current = container.pivotData;
+                if (!cell || !current?.cube) {
+                    return;
+                }
+                const row = current.data?.rows?.[parseInt(cell.dataset.rowIndex, 10)];
+                if (row?.path) {
+                    this.applyCrossFilter(container.id.replace('dashboard_item_', ''), current.cube.model, row.path);
+                }
+            });
         }
-        
-        // Ajouter une ligne de total UNIQUEMENT si fourni par le backend
-        if (showTotal) {
-            const formattedTotal = this.formatNumber(data.total);
-            html += '<tr class="table-secondary border-top border-2"><td class="fw-bold">Total</td><td class="text-end fw-bold">' + formattedTotal + '</td></tr>';
+    }
+
+    renderTimeout(lineId, data) {
+        const container = document.getElementById(`dashboard_item_${lineId}`);
+        if (container) {
+            container.innerHTML = `<div class="alert alert-secondary dashboard-timeout m-2 h-100 d-flex flex-column align-items-center justify-content-center text-center">
+                <i class="fa fa-hourglass-end fa-2x mb-2"></i>
+                <div>${data.error}</div>
+                <small class="text-muted">Réduisez la période ou les regroupements de cet élément, ou utilisez un instantané.</small>
+            </div>`;
+            container.className = "dashboard-item h-100";
         }
-        
-        html += '</tbody></table></div></div>';
-        container.innerHTML = html;
-        container.className = "dashboard-item h-100";
     }
 
     renderError(lineId, message) {
@@ -989,15 +1867,15 @@ registry.category("views").add("form", {
         }
         
         // Déléguer les autres méthodes si nécessaire
-        async checkUserPermissions() {
+        async setupDashboard() {
             if (this.isDashboard()) {
-                return DashboardFormController.prototype.checkUserPermissions.call(this);
+                return DashboardFormController.prototype.setupDashboard.call(this);
             }
         }
         
-        async setupDashboard() {
+        async loadBootstrap() {
             if (this.isDashboard()) {
-                return DashboardFormController.prototype.setupDashboard.call(this);
+                return DashboardFormController.prototype.loadBootstrap.call(this);
             }
         }
         
@@ -1019,12 +1897,6 @@ registry.category("views").add("form", {
             }
         }
         
-        async loadSavedFilters() {
-            if (this.isDashboard()) {
-                return DashboardFormController.prototype.loadSavedFilters.call(this);
-            }
-        }
-        
         async saveFilters(filtersDict) {
             if (this.isDashboard()) {
                 return DashboardFormController.prototype.saveFilters.call(this, filtersDict);
@@ -1050,19 +1922,103 @@ registry.category("views").add("form", {
             }
         }
         
-        async loadFilterData(lineId, filterId, backendLineId, overrides) {
+        async finishProfile() {
+            if (this.isDashboard()) {
+                return DashboardFormController.prototype.finishProfile.call(this);
+            }
+        }
+        
+        async loadFullResolution(lineId) {
+            if (this.isDashboard()) {
+                return DashboardFormController.prototype.loadFullResolution.call(this, lineId);
+            }
+        }
+        
+        async renderCubeTile(lineId, payload) {
             if (this.isDashboard()) {
-                return DashboardFormController.prototype.loadFilterData.call(this, lineId, filterId, backendLineId, overrides);
+                return DashboardFormController.prototype.renderCubeTile.call(this, lineId, payload);
             }
         }
         
-        renderFilterData(lineId, data) {
+        renderCubeToolbar(lineId, data) {
+            if (this.isDashboard()) {
+                return DashboardFormController.prototype.renderCubeToolbar.call(this, lineId, data);
+            }
+        }
+        
+        localCrossFilters(lineId) {
+            if (this.isDashboard()) {
+                return DashboardFormController.prototype.localCrossFilters.call(this, lineId);
+            }
+        }
+        
+        async applyCrossFilter(sourceLineId, model, conditions) {
+            if (this.isDashboard()) {
+                return DashboardFormController.prototype.applyCrossFilter.call(this, sourceLineId, model, conditions);
+            }
+        }
+        
+        renderCrossFilterBar() {
+            if (this.isDashboard()) {
+                return DashboardFormController.prototype.renderCrossFilterBar.call(this);
+            }
+        }
+        
+        tileCacheKey(backendLineId, filtersValues) {
+            if (this.isDashboard()) {
+                return DashboardFormController.prototype.tileCacheKey.call(this, backendLineId, filtersValues);
+            }
+        }
+        
+        async paintCachedTiles(tiles) {
+            if (this.isDashboard()) {
+                return DashboardFormController.prototype.paintCachedTiles.call(this, tiles);
+            }
+        }
+        
+        storeTilePerf(lineId, data) {
+            if (this.isDashboard()) {
+                return DashboardFormController.prototype.storeTilePerf.call(this, lineId, data);
+            }
+        }
+        
+        startAutoRefresh(tiles) {
+            if (this.isDashboard()) {
+                return DashboardFormController.prototype.startAutoRefresh.call(this, tiles);
+            }
+        }
+        
+        stopAutoRefresh() {
+            if (this.isDashboard()) {
+                return DashboardFormController.prototype.stopAutoRefresh.call(this);
+            }
+        }
+        
+        async refreshChangedTiles() {
+            if (this.isDashboard()) {
+                return DashboardFormController.prototype.refreshChangedTiles.call(this);
+            }
+        }
+        
+        abortTileRequests() {
+            if (this.isDashboard()) {
+                return DashboardFormController.prototype.abortTileRequests.call(this);
+            }
+        }
+        
+        async loadFilterData(lineId, filterId, backendLineId, overrides, signal, inlineData) {
+            if (this.isDashboard()) {
+                return DashboardFormController.prototype.loadFilterData.call(this, lineId, filterId, backendLineId, overrides, signal, inlineData);
+            }
+        }
+        
+        async renderFilterData(lineId, data) {
             if (this.isDashboard()) {
                 return DashboardFormController.prototype.renderFilterData.call(this, lineId, data);
             }
         }
         
-        renderListData(container, data) {
+        async renderListData(container, data) {
             if (this.isDashboard()) {
                 return DashboardFormController.prototype.renderListData.call(this, container, data);
             }
@@ -1074,12 +2030,36 @@ registry.category("views").add("form", {
             }
         }
         
-        renderPivotData(container, data) {
+        async renderPivotData(container, data) {
             if (this.isDashboard()) {
                 return DashboardFormController.prototype.renderPivotData.call(this, container, data);
             }
         }
         
+        renderKpiData(container, data) {
+            if (this.isDashboard()) {
+                return DashboardFormController.prototype.renderKpiData.call(this, container, data);
+            }
+        }
+        
+        togglePerfOverlay() {
+            if (this.isDashboard()) {
+                return DashboardFormController.prototype.togglePerfOverlay.call(this);
+            }
+        }
+        
+        renderPerfOverlay(lineId) {
+            if (this.isDashboard()) {
+                return DashboardFormController.prototype.renderPerfOverlay.call(this, lineId);
+            }
+        }
+        
+        renderTimeout(lineId, data) {
+            if (this.isDashboard()) {
+                return DashboardFormController.prototype.renderTimeout.call(this, lineId, data);
+            }
+        }
+        
         renderError(lineId, message) {
             if (this.isDashboard()) {
                 return DashboardFormController.prototype.renderError.call(this, lineId, message);
@@ -1092,6 +2072,18 @@ registry.category("views").add("form", {
             }
         }
         
+        attachExportLinks() {
+            if (this.isDashboard()) {
+                return DashboardFormController.prototype.attachExportLinks.call(this);
+            }
+        }
+        
+        exportLine(serverLineId, format) {
+            if (this.isDashboard()) {
+                return DashboardFormController.prototype.exportLine.call(this, serverLineId, format);
+            }
+        }
+        
         attachEditFilterLinks() {
             if (this.isDashboard()) {
                 return DashboardFormController.prototype.attachEditFilterLinks.call(this);
@@ -1137,3 +2129,20 @@ registry.category("views").add("form", {
         }
     }
 }, { force: true });
+
+// Déconnexion : purger les résultats mis en cache dans le navigateur avant de quitter la session
+const userMenuItems = registry.category("user_menuitems");
+const logOutItem = userMenuItems.get("log_out", null);
+if (logOutItem) {
+    userMenuItems.add("log_out", (env) => {
+        const item = logOutItem(env);
+        return {
+            ...item,
+            callback: async () => {
+                await tileCache.clear();
+                window.localStorage.removeItem(TILE_CACHE_USER_KEY);
+                item.callback();
+            },
+        };
+    }, { force: true });
+}
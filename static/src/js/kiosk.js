@@ -0,0 +1,198 @@
+/** @odoo-module **/
+
+import { buildListHtml, buildPivotHtml, escapeAttr, CHART_PALETTE } from "@is_tableau_de_bord18/js/dashboard_render";
+
+// Écran kiosque : page autonome (sans client web) qui affiche en rotation les tableaux de bord
+// d'un écran, à partir des résultats partagés calculés par le serveur pour l'utilisateur technique
+
+// Délai avant une nouvelle tentative après une erreur de chargement (secondes)
+const KIOSK_RETRY_SECONDS = 30;
+
+const kiosk = {
+    root: null,
+    token: null,
+    payload: null,
+    slideIndex: -1,
+    slideTimer: null,
+    charts: [],
+
+    async start(root) {
+        this.root = root;
+        this.token = root.dataset.token;
+        this.startClock();
+        await this.refresh();
+    },
+
+    async fetchData() {
+        const response = await fetch(`/tableau_de_bord/kiosk/${encodeURIComponent(this.token)}/data`, {
+            method: "POST",
+            headers: { "Content-Type": "application/json" },
+            body: JSON.stringify({ jsonrpc: "2.0", method: "call", params: {} }),
+        });
+        const result = await response.json();
+        if (result.error) {
+            throw new Error(result.error.data?.message || result.error.message);
+        }
+        if (result.result?.error) {
+            throw new Error(result.result.error);
+        }
+        return result.result;
+    },
+
+    async refresh() {
+        // Nouvelles données au rythme du recalcul serveur ; la rotation en cours continue
+        let delay = KIOSK_RETRY_SECONDS;
+        try {
+            this.payload = await this.fetchData();
+            delay = Math.max(this.payload.refresh_seconds || 0, KIOSK_RETRY_SECONDS);
+            if (this.slideIndex < 0) {
+                this.nextSlide();
+            }
+        } catch (error) {
+            console.warn("[TDB] Écran kiosque : chargement impossible", error);
+            if (!this.payload) {
+                this.renderMessage("Écran indisponible, nouvelle tentative dans quelques instants");
+            }
+        }
+        setTimeout(() => this.refresh(), delay * 1000);
+    },
+
+    nextSlide() {
+        clearTimeout(this.slideTimer);
+        const slides = this.payload?.slides || [];
+        if (!slides.length) {
+            this.renderMessage("Aucun tableau de bord à afficher");
+            this.slideIndex = -1;
+            return;
+        }
+        this.slideIndex = (this.slideIndex + 1) % slides.length;
+        const slide = slides[this.slideIndex];
+        this.renderSlide(slide);
+        // Un seul tableau de bord : il est redessiné à chaque passage avec les dernières données
+        this.slideTimer = setTimeout(() => this.nextSlide(), Math.max(slide.duration || 0, 5) * 1000);
+    },
+
+    startClock() {
+        const clock = this.root.querySelector(".kiosk-clock");
+        const tick = () => {
+            clock.textContent = new Date().toLocaleString("fr-FR", { dateStyle: "short", timeStyle: "short" });
+        };
+        tick();
+        setInterval(tick, 30000);
+    },
+
+    renderMessage(message) {
+        this.destroyCharts();
+        this.root.querySelector(".kiosk-slide").innerHTML = `<div class="kiosk-message">${escapeAttr(message)}</div>`;
+    },
+
+    destroyCharts() {
+        for (const chart of this.charts) {
+            chart.destroy();
+        }
+        this.charts = [];
+    },
+
+    renderSlide(slide) {
+        this.destroyCharts();
+        this.root.querySelector(".kiosk-title").textContent = slide.name;
+        const container = this.root.querySelector(".kiosk-slide");
+        container.innerHTML = slide.tiles.map((tile, index) => `
+            <div class="kiosk-tile" style="grid-column: span ${tile.width === '20' ? 12 : (parseInt(tile.width, 10) || 6) * 5}; height: ${parseInt(tile.height, 10) || 400}px;">
+                <div class="kiosk-tile-title">${escapeAttr(tile.name)}</div>
+                <div class="kiosk-tile-body dashboard-item" data-index="${index}"></div>
+            </div>`).join("");
+        slide.tiles.forEach((tile, index) => {
+            this.renderTile(container.querySelector(`.kiosk-tile-body[data-index="${index}"]`), tile.data);
+        });
+    },
+
+    renderTile(body, data) {
+        if (!data) {
+            body.innerHTML = '<div class="kiosk-message">Aucun filtre sélectionné</div>';
+            return;
+        }
+        if (data.error) {
+            body.innerHTML = `<div class="alert alert-warning m-2">${escapeAttr(data.error)}</div>`;
+            return;
+        }
+        switch (data.type) {
+            case "list":
+                body.innerHTML = buildListHtml({
+                    data: data.data,
+                    fields: data.fields,
+                    is_grouped: data.is_grouped,
+                    show_record_count: data.show_record_count,
+                    count: data.count,
+                }).html;
+                break;
+            case "pivot":
+                body.innerHTML = buildPivotHtml({ data: data.data, show_data_title: data.show_data_title }).html;
+                break;
+            case "graph":
+                this.renderGraph(body, data);
+                break;
+            case "kpi":
+                this.renderKpi(body, data);
+                break;
+        }
+    },
+
+    renderGraph(body, data) {
+        body.innerHTML = '<div class="kiosk-chart"><canvas></canvas></div>';
+        if (!window.Chart || !data.data?.datasets?.length) {
+            return;
+        }
+        const chartType = data.chart_type || "bar";
+        const datasets = data.data.datasets.map((dataset, index) => ({
+            ...dataset,
+            backgroundColor: chartType === "pie" || index ? dataset.backgroundColor : CHART_PALETTE[0],
+            borderColor: chartType === "line" ? CHART_PALETTE[index % CHART_PALETTE.length] : undefined,
+        }));
+        this.charts.push(new window.Chart(body.querySelector("canvas"), {
+            type: chartType,
+            data: { labels: data.data.labels, datasets },
+            options: {
+                responsive: true,
+                maintainAspectRatio: false,
+                animation: false,
+                plugins: {
+                    legend: { display: data.show_legend !== false, position: chartType === "pie" ? "right" : "top" },
+                },
+            },
+        }));
+    },
+
+    renderKpi(body, data) {
+        const digits = data.digits || 0;
+        const format = (v) => parseFloat(v || 0).toLocaleString("fr-FR", {
+            minimumFractionDigits: digits,
+            maximumFractionDigits: digits,
+        });
+        let html = '<div class="kiosk-kpi">';
+        html += `<div class="kiosk-kpi-label">${escapeAttr([data.label, data.period_label].filter(Boolean).join(" - "))}</div>`;
+        html += `<div class="kiosk-kpi-value">${format(data.value)}</div>`;
+        if (data.compare) {
+            const delta = data.compare.delta_percent;
+            const deltaText = delta === null || delta === undefined
+                ? "-"
+                : `${delta >= 0 ? "+" : ""}${delta.toLocaleString("fr-FR", { maximumFractionDigits: 1 })} %`;
+            html += `<div class="kiosk-kpi-compare ${delta >= 0 ? "text-success" : "text-danger"}">${deltaText}
+                <span class="text-muted">vs ${escapeAttr(data.compare.label)} (${format(data.compare.value)})</span></div>`;
+        }
+        body.innerHTML = html + "</div>";
+    },
+};
+
+function startKiosk() {
+    const root = document.getElementById("kiosk_root");
+    if (root) {
+        kiosk.start(root);
+    }
+}
+
+if (document.readyState === "loading") {
+    document.addEventListener("DOMContentLoaded", startKiosk);
+} else {
+    startKiosk();
+}
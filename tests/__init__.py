@@ -0,0 +1,4 @@
+# -*- coding: utf-8 -*-
+
+from . import test_rollup
+from . import test_sampling
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+
+from contextlib import closing
+from datetime import date
+from unittest.mock import patch
+
+from odoo import sql_db
+from odoo.tests import TransactionCase, tagged
+from odoo.tools import SQL
+
+from odoo.addons.is_tableau_de_bord18.controllers.main import TableauDeBordController
+from odoo.addons.is_tableau_de_bord18.models.is_tableau_de_bord_rollup import ROLLUP_LOCK_CLASS
+
+# Groupements et mesures comparés entre la table d'agrégats et le calcul direct
+GROUPBYS = [
+    ['name:day', 'currency_id'],
+    ['name:month'],
+    ['name:year', 'company_id'],
+    ['currency_id', 'company_id'],
+]
+MEASURES = [('__count', 'count'), ('rate', 'sum'), ('rate', 'avg')]
+
+
+@tagged('post_install', '-at_install')
+class TestRollup(TransactionCase):
+    """Agrégats journaliers : résultats identiques au calcul direct après chaque modification
+
+    Le modèle res.currency.rate (module base) sert de table source : champ date
+    (name), regroupement (currency_id), mesure (rate) et société (company_id).
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.controller = TableauDeBordController()
+        cls.Rate = cls.env['res.currency.rate']
+        cls.company_a = cls.env.company
+        cls.company_b = cls.env['res.company'].create({'name': 'Société B (agrégats)'})
+        cls.eur = cls.env.ref('base.EUR')
+        cls.usd = cls.env.ref('base.USD')
+        cls.chf = cls.env.ref('base.CHF')
+        cls.rates = cls.Rate.create([
+            {'name': date(2030, 1, 5), 'currency_id': cls.eur.id, 'rate': 1.10, 'company_id': cls.company_a.id},
+            {'name': date(2030, 1, 5), 'currency_id': cls.usd.id, 'rate': 1.25, 'company_id': cls.company_a.id},
+            {'name': date(2030, 1, 20), 'currency_id': cls.eur.id, 'rate': 1.12, 'company_id': cls.company_b.id},
+            {'name': date(2030, 2, 3), 'currency_id': cls.usd.id, 'rate': 1.30, 'company_id': cls.company_b.id},
+        ])
+        cls.rollup = cls.env['is.tableau.de.bord.rollup'].create({
+            'name': 'Taux de change (test)',
+            'model_id': cls.env['ir.model']._get_id('res.currency.rate'),
+            'date_field': 'name',
+            'groupby_field': 'currency_id',
+            'measure_field': 'rate',
+        })
+
+    def _read(self, model, groupbys, domain=None, use_rollup=False):
+        """Résultat trié de _read_grouped, en direct ou forcé sur la table d'agrégats"""
+        if use_rollup:
+            self.assertTrue(self.rollup._rollup_try_refresh())
+            with patch.object(type(self.env['is.tableau.de.bord.rollup']), '_find_rollup',
+                              lambda *args, **kwargs: self.rollup):
+                info = {}
+                rows = self.controller._read_grouped(model, domain or [], groupbys, MEASURES, info=info)
+                self.assertEqual(info.get('source'), f"rollup:{self.rollup.name}")
+        else:
+            rows = self.controller._read_grouped(model, domain or [], groupbys, MEASURES)
+        ngroups = len(groupbys)
+        return sorted(
+            (tuple(row[:ngroups]), tuple(float(value or 0) for value in row[ngroups:]))
+            for row in rows
+        )
+
+    def assertRollupMatches(self, model=None, domain=None):
+        model = model or self.Rate
+        for groupbys in GROUPBYS:
+            live = self._read(model, groupbys, domain)
+            stored = self._read(model, groupbys, domain, use_rollup=True)
+            self.assertEqual([key for key, _values in live], [key for key, _values in stored], groupbys)
+            for (key, live_values), (_key, stored_values) in zip(live, stored):
+                for live_value, stored_value in zip(live_values, stored_values):
+                    self.assertAlmostEqual(live_value, stored_value, places=6, msg=f"{groupbys} {key}")
+
+    def test_initial_load(self):
+        self.assertRollupMatches()
+        self.assertRollupMatches(domain=[('currency_id', '=', self.eur.id), ('name', '>=', '2030-01-10')])
+
+    def test_insert(self):
+        self.Rate.create([
+            {'name': date(2030, 1, 5), 'currency_id': self.chf.id, 'rate': 0.95, 'company_id': self.company_a.id},
+            {'name': date(2030, 3, 1), 'currency_id': self.eur.id, 'rate': 1.15, 'company_id': self.company_b.id},
+        ])
+        self.assertRollupMatches()
+
+    def test_update(self):
+        self.rates[0].rate = 2.5
+        self.rates[1].name = date(2030, 2, 14)
+        self.assertRollupMatches()
+
+    def test_update_outside_orm(self):
+        self.env.cr.execute(SQL(
+            "UPDATE res_currency_rate SET rate = rate * 2, name = name + 1 WHERE id = ANY(%s)", self.rates.ids,
+        ))
+        self.Rate.invalidate_model()
+        self.assertRollupMatches()
+
+    def test_delete(self):
+        self.rates[2].unlink()
+        self.assertRollupMatches()
+
+    def test_currency_and_company_change(self):
+        self.rates[0].currency_id = self.chf
+        self.rates[3].company_id = self.company_a
+        self.assertRollupMatches()
+        self.assertRollupMatches(domain=[('company_id', '=', self.company_a.id)])
+
+    def test_stamp(self):
+        """Empreinte de l'agrégat : change à chaque modification de la source et à chaque recalcul"""
+        self.rollup._rollup_apply_pending()
+        stamp = self.rollup._rollup_stamp()
+        self.assertEqual(self.rollup._rollup_stamp(), stamp)
+        self.rates[0].rate = 6.0
+        written = self.rollup._rollup_stamp()
+        self.assertNotEqual(written, stamp)
+        self.rollup._rollup_apply_pending()
+        applied = self.rollup._rollup_stamp()
+        self.assertNotIn(applied, (stamp, written))
+
+    def test_verify(self):
+        self.rates[1].rate = 4.0
+        self.rollup.action_verify()
+        self.assertTrue(self.rollup.verification_result.startswith('OK'), self.rollup.verification_result)
+
+    def test_refresh_skipped_when_locked(self):
+        """Mise à jour déjà en cours dans une autre transaction : la tuile est calculée en direct"""
+        self.rates[0].rate = 5.0
+        self.Rate.flush_model()
+        with closing(sql_db.db_connect(self.env.cr.dbname).cursor()) as other:
+            other.execute(SQL("SELECT pg_advisory_xact_lock(%s, %s)", ROLLUP_LOCK_CLASS, self.rollup.id))
+            try:
+                self.assertFalse(self.rollup._rollup_try_refresh())
+            finally:
+                other.rollback()
+        self.assertTrue(self.rollup._rollup_try_refresh())
+
+    def test_company_rule(self):
+        """Règle multi-société : appliquée à la table d'agrégats ; règle sur un autre champ : calcul direct"""
+        user = self.env['res.users'].create({
+            'name': 'Utilisateur agrégats',
+            'login': 'tdb_rollup_user',
+            'company_id': self.company_a.id,
+            'company_ids': [(6, 0, (self.company_a | self.company_b).ids)],
+            'groups_id': [(6, 0, [self.env.ref('base.group_system').id])],
+        })
+        Rule = type(self.env['ir.rule'])
+        compute_domain = Rule._compute_domain
+
+        def rule_domain(domain):
+            def _compute_domain(rule, model_name, mode='read'):
+                if model_name == 'res.currency.rate':
+                    return domain
+                return compute_domain(rule, model_name, mode)
+            return patch.object(Rule, '_compute_domain', _compute_domain)
+
+        model = self.Rate.with_user(user)
+        with rule_domain([('company_id', 'in', [self.company_a.id])]):
+            found = self.env['is.tableau.de.bord.rollup']._find_rollup(model, [], ['currency_id'], [('rate', 'sum')])
+            self.assertEqual(found, self.rollup)
+            self.assertRollupMatches(model)
+        with rule_domain([('rate', '>', 0)]):
+            found = self.env['is.tableau.de.bord.rollup']._find_rollup(model, [], ['currency_id'], [('rate', 'sum')])
+            self.assertFalse(found)
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+
+from datetime import date
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from odoo.tests import TransactionCase, tagged
+from odoo.tools import SQL
+
+from odoo.addons.is_tableau_de_bord18.controllers.main import TableauDeBordController
+
+GROUPBYS = ['name:month', 'currency_id']
+MEASURES = [('__count', 'count'), ('rate', 'sum'), ('rate', 'avg')]
+
+
+def _plan_nodes(node):
+    yield node
+    for child in node.get('Plans', []):
+        yield from _plan_nodes(child)
+
+
+@tagged('post_install', '-at_install')
+class TestSampling(TransactionCase):
+    """Échantillonnage : clause FROM TABLESAMPLE écrite dans la requête exécutée"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.controller = TableauDeBordController()
+        cls.Rate = cls.env['res.currency.rate']
+        cls.eur = cls.env.ref('base.EUR')
+        cls.usd = cls.env.ref('base.USD')
+        cls.Rate.create([
+            {'name': date(2031, month, 1), 'currency_id': currency.id, 'rate': 1.0 + month / 10}
+            for month in range(1, 7)
+            for currency in (cls.eur, cls.usd)
+        ])
+        cls.domain = [('name', '>=', '2031-01-01'), ('name', '<', '2032-01-01')]
+
+    def _sampled(self, percent=100.0):
+        """Force un échantillon de percent % quelle que soit la sélectivité du domaine"""
+        plan = {'percent': percent, 'rows': 0, 'error_percent': 0.0}
+        return patch.object(TableauDeBordController, '_sampling_plan', lambda *args, **kwargs: plan)
+
+    def test_full_sample_matches_exact(self):
+        """Échantillon de 100 % : résultat identique au calcul exact, facteur 1"""
+        exact = self.controller._read_grouped(self.Rate, self.domain, GROUPBYS, MEASURES)
+        info = {}
+        with self._sampled():
+            sampled = self.controller._read_grouped(self.Rate, self.domain, GROUPBYS, MEASURES, info=info)
+        self.assertEqual(info.get('source'), 'sample:100.0%')
+        self.assertEqual(len(exact), 12)
+        key = lambda row: (str(row[0]), row[1])
+        for exact_row, sampled_row in zip(sorted(exact, key=key), sorted(sampled, key=key)):
+            self.assertEqual(exact_row[:2], sampled_row[:2])
+            for exact_value, sampled_value in zip(exact_row[2:], sampled_row[2:]):
+                self.assertAlmostEqual(float(exact_value), float(sampled_value), places=6)
+
+    def test_sample_scan_in_plan(self):
+        """La requête exécutée lit la table par un parcours d'échantillon"""
+        info = {}
+        model = self.Rate.with_context(tdb_explain=True)
+        with self._sampled(10.0):
+            self.controller._read_grouped(model, self.domain, GROUPBYS, MEASURES, info=info)
+        node_types = [node.get('Node Type') for node in _plan_nodes(info['explain'][0]['Plan'])]
+        self.assertIn('Sample Scan', node_types)
+
+    def test_query_left_unchanged(self):
+        """La requête ORM n'est pas modifiée : seul le SQL produit porte TABLESAMPLE"""
+        query = self.Rate._search(self.domain)
+        select = [SQL("COUNT(*)")]
+        sampled = self.controller._sampled_select(query, select, 10.0)
+        self.assertIn('TABLESAMPLE SYSTEM', sampled.code)
+        self.assertNotIn('TABLESAMPLE', query.select(*select).code)
+        self.assertEqual(list(sampled.params), [10.0, *query.where_clause.params])
+
+    def test_selective_domain_exact(self):
+        """Domaine sélectif : l'échantillon serait trop petit, le calcul reste exact"""
+        line = SimpleNamespace(sampling=True, sampling_percent=10.0)
+        query = self.Rate._search(self.domain)
+        self.assertIsNone(self.controller._sampling_plan(self.Rate, query, MEASURES, line))